@@ -0,0 +1,82 @@
+"""
+Benchmark the embedding backends on the validated reference claims.
+
+Reports per backend: single-query latency (p50/p95), batch throughput and
+recall@k parity against the PyTorch backend on the existing faiss_index.
+
+Run from the repository root:
+    python Evaluation/benchmark_embeddings.py --backends torch onnx onnx-int8 --k 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+import pandas as pd
+
+# location for src files
+sys.path.append(os.path.abspath("./src"))
+
+from embedding_backends import load_embeddings
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--claims", default="Evaluation/Validated_reference_data.csv")
+    parser.add_argument("--index", default="faiss_index/index.faiss")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    claims = pd.read_csv(args.claims)["claim"].dropna().astype(str).tolist()
+    index = faiss.read_index(args.index)
+
+    # Reference neighbours come from the backend the index was built with
+    reference = load_embeddings("torch")
+    ref_vectors = np.asarray(reference.embed_documents(claims), dtype=np.float32)
+    _, ref_ids = index.search(ref_vectors, args.k)
+
+    rows = []
+    for backend in args.backends:
+        emb = load_embeddings(backend)
+
+        # Warm up once so lazy initialisation is not measured
+        emb.embed_query("warm up")
+
+        # Single-query latency, the interactive case
+        latencies = []
+        for claim in claims:
+            start = time.perf_counter()
+            emb.embed_query(claim)
+            latencies.append(time.perf_counter() - start)
+
+        # Batch throughput, the index-build and batched-retrieval case
+        start = time.perf_counter()
+        vectors = []
+        for i in range(0, len(claims), args.batch_size):
+            vectors.extend(emb.embed_documents(claims[i:i + args.batch_size]))
+        elapsed = time.perf_counter() - start
+
+        # Recall@k parity: overlap with the neighbours of the reference backend
+        _, ids = index.search(np.asarray(vectors, dtype=np.float32), args.k)
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, ref_ids)])
+
+        rows.append({
+            "backend": backend,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "throughput_per_s": round(len(claims) / elapsed, 1),
+            f"recall@{args.k}": round(float(recall), 4),
+        })
+
+    print(f"{len(claims)} claims, index with {index.ntotal} vectors")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark hybrid (BM25 + dense, reciprocal rank fusion) against dense-only retrieval.
+
+Every validated reference claim has the URL of its EUfactcheck fact-check. A claim
+counts as recalled when that URL is among the top-k retrieved documents, so the
+index must contain the EUfactcheck posts (src/ingest.py --schema eufactcheck).
+Query embeddings are cached before timing, so the latency difference is the
+added cost of BM25 and fusion.
+
+Run from the repository root:
+    python Evaluation/benchmark_hybrid.py --k 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# location for src files
+sys.path.append(os.path.abspath("./src"))
+
+from bm25 import BM25_FILE, BM25Index
+from docstore import load_vectorstore
+from embedding_backends import DEFAULT_MODEL, load_embeddings
+from embedding_cache import CachedQueryEmbeddings, QueryEmbeddingCache
+from retrieval import ClaimRetriever
+
+def normalize_url(url: str) -> str:
+    return (url or "").strip().rstrip("/").lower()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--claims", default="Evaluation/Validated_reference_data.csv")
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    reference = pd.read_csv(args.claims).dropna(subset=["claim", "url"])
+    claims = reference["claim"].astype(str).tolist()
+    urls = [normalize_url(u) for u in reference["url"]]
+
+    cache = QueryEmbeddingCache(os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+    embeddings = CachedQueryEmbeddings(load_embeddings(), DEFAULT_MODEL, cache)
+    vectorstore = load_vectorstore(args.index_dir, embeddings)
+    retriever = ClaimRetriever(vectorstore, embeddings, bm25=BM25Index(os.path.join(args.index_dir, BM25_FILE)))
+
+    # Warm the query cache, the encoder cost is the same for both modes
+    embeddings.embed_queries(claims)
+
+    rows = []
+    for mode in ("dense", "hybrid"):
+        latencies, recalled = [], []
+        for claim, url in zip(claims, urls):
+            start = time.perf_counter()
+            positions = retriever.search_positions([claim], args.k, mode=mode)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            found = {normalize_url(d.metadata.get("url", "")) for d in retriever.documents(positions)}
+            recalled.append(url in found)
+
+        rows.append({
+            "mode": mode,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            f"recall@{args.k}": round(float(np.mean(recalled)), 4),
+        })
+
+    print(f"{len(claims)} reference claims")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark approximate and reduced-precision index types against the exact flat index.
+
+The vectors are read back from the flat faiss_index, each index type is built
+in memory and queried with the validated reference claims. Reports build time,
+index memory, per-query latency (p50/p95) and recall@k against the flat index,
+for a sweep of nprobe / efSearch / k_factor values.
+
+memory_mb is the serialized size. For binary indexes first_pass_mb is the part
+that must stay in RAM: the float vectors used for rescoring are memory-mapped
+at load time, and only the shortlisted rows are read.
+
+Run from the repository root:
+    python Evaluation/benchmark_index_types.py --k 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+import pandas as pd
+
+# location for src files
+sys.path.append(os.path.abspath("./src"))
+
+from embedding_backends import load_embeddings
+from index_factory import build_index, search_parameters
+
+# Query-time settings to sweep per index type
+SWEEPS = {
+    "flat": [{}],
+    "ivf_flat": [{"nprobe": n} for n in (4, 16, 64)],
+    "hnsw": [{"ef_search": e} for e in (16, 64, 256)],
+    "ivf_pq": [{"nprobe": n} for n in (8, 32, 128)],
+    "fp16": [{}],
+    "sq8": [{}],
+    "pca": [{}],
+    "binary": [{"k_factor": f} for f in (2, 8, 32)],
+}
+
+def time_queries(index, queries, k, params):
+    """ Search one query at a time, like the app does, and return latencies and ids. """
+    latencies, ids = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, row = index.search(q[None, :], k, params=params)
+        latencies.append(time.perf_counter() - start)
+        ids.append(row[0])
+    return np.asarray(latencies) * 1000, np.asarray(ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default="faiss_index/index.faiss")
+    parser.add_argument("--claims", default="Evaluation/Validated_reference_data.csv")
+    parser.add_argument("--types", nargs="+", default=list(SWEEPS))
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    flat = faiss.read_index(args.index)
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+
+    claims = pd.read_csv(args.claims)["claim"].dropna().astype(str).tolist()
+    queries = np.asarray(load_embeddings().embed_documents(claims), dtype=np.float32)
+
+    # Exact neighbours are the ground truth
+    _, truth = flat.search(queries, args.k)
+
+    rows = []
+    for index_type in args.types:
+        start = time.perf_counter()
+        index, params = build_index(vectors, index_type)
+        build_s = time.perf_counter() - start
+        memory_mb = faiss.serialize_index(index).nbytes / 1e6
+        refine = faiss.downcast_index(index)
+        first_pass_mb = (
+            faiss.serialize_index(refine.base_index).nbytes / 1e6 if isinstance(refine, faiss.IndexRefine) else memory_mb
+        )
+
+        for sweep in SWEEPS[index_type]:
+            search_params = search_parameters(index, **sweep)
+            latencies, ids = time_queries(index, queries, args.k, search_params)
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, truth)])
+
+            rows.append({
+                "index_type": index_type,
+                "search": ", ".join(f"{k}={v}" for k, v in sweep.items()) or "-",
+                "build_s": round(build_s, 1),
+                "memory_mb": round(memory_mb, 1),
+                "first_pass_mb": round(first_pass_mb, 1),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                f"recall@{args.k}": round(float(recall), 4),
+            })
+
+    print(f"{flat.ntotal} vectors, {len(claims)} reference claims")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
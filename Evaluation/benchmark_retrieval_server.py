@@ -0,0 +1,77 @@
+"""
+Benchmark the shared retrieval server with N concurrent clients.
+
+Each client is a thread with its own kept-alive connection that sends the
+validated reference claims one request at a time, like one app session.
+Reports requests per second and latency percentiles per number of clients.
+
+Start the server first, from the repository root:
+    python src/retrieval_server.py --address unix:/tmp/checkmate-retrieval.sock
+    python Evaluation/benchmark_retrieval_server.py --address unix:/tmp/checkmate-retrieval.sock --clients 1 2 4 8 16
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# location for src files
+sys.path.append(os.path.abspath("./src"))
+
+from retrieval_server import RetrievalClient
+
+def run_clients(address: str, claims, n_clients: int, requests_per_client: int):
+    """ Latencies (ms) of every request and the wall time of the whole run. """
+    latencies = [[] for _ in range(n_clients)]
+    barrier = threading.Barrier(n_clients + 1)
+
+    def client(i):
+        conn = RetrievalClient(address)
+        conn.retrieve_batch([claims[i % len(claims)]])  # connect before the clock starts
+        barrier.wait()
+        for r in range(requests_per_client):
+            query = claims[(i * requests_per_client + r) % len(claims)]
+            start = time.perf_counter()
+            conn.retrieve_batch([query])
+            latencies[i].append((time.perf_counter() - start) * 1000)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return [l for per_client in latencies for l in per_client], time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=os.getenv("RETRIEVAL_SERVER", "unix:/tmp/checkmate-retrieval.sock"))
+    parser.add_argument("--claims", default="Evaluation/Validated_reference_data.csv")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+    args = parser.parse_args()
+
+    claims = pd.read_csv(args.claims).dropna(subset=["claim"])["claim"].astype(str).tolist()
+
+    rows = []
+    for n_clients in args.clients:
+        latencies, wall = run_clients(args.address, claims, n_clients, args.requests)
+        rows.append({
+            "clients": n_clients,
+            "requests": len(latencies),
+            "req_per_s": round(len(latencies) / wall, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        })
+
+    print(f"server {args.address}, {len(claims)} reference claims")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
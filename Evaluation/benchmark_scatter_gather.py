@@ -0,0 +1,103 @@
+"""
+Benchmark scatter-gather search as the number of partitions grows from 1 to N.
+
+The vectors are read back from the flat faiss_index and split into n partitions
+(position % n) in a temporary folder, each served by its own worker process with
+one FAISS thread. The validated reference claims are searched one at a time,
+then from --clients threads at once. Reports latency (p50/p95), throughput,
+recall@k against the flat index and the number of partition timeouts.
+
+Run from the repository root:
+    python Evaluation/benchmark_scatter_gather.py --max-shards 8 --index-type flat
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+import pandas as pd
+
+# location for src files
+sys.path.append(os.path.abspath("./src"))
+
+from embedding_backends import load_embeddings
+from index_factory import INDEX_TYPES
+from scatter_gather import ScatterGatherSearcher, build_partitions
+
+def time_queries(searcher, queries, k):
+    """ Search one query at a time, like a single session does. """
+    latencies, ids = [], []
+    for q in queries:
+        start = time.perf_counter()
+        row = searcher.search(q[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        ids.append(row[0])
+    return np.asarray(latencies) * 1000, np.asarray(ids)
+
+def throughput(searcher, queries, k, clients, rounds):
+    """ Queries per second with clients threads searching concurrently. """
+    work = [q for _ in range(rounds) for q in queries]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(lambda q: searcher.search(q[None, :], k), work))
+    return len(work) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default="faiss_index/index.faiss")
+    parser.add_argument("--claims", default="Evaluation/Validated_reference_data.csv")
+    parser.add_argument("--index-type", choices=list(INDEX_TYPES), default="flat")
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--timeout-ms", type=float, default=1000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    flat = faiss.read_index(args.index)
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+
+    claims = pd.read_csv(args.claims)["claim"].dropna().astype(str).tolist()
+    queries = np.asarray(load_embeddings().embed_documents(claims), dtype=np.float32)
+
+    # Exact neighbours are the ground truth
+    _, truth = flat.search(queries, args.k)
+
+    rows = []
+    for n in range(1, args.max_shards + 1):
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            table = build_partitions(folder, vectors, n, args.index_type)
+            build_s = time.perf_counter() - start
+
+            searcher = ScatterGatherSearcher(folder, table, workers=n, timeout_ms=args.timeout_ms)
+            try:
+                # The first search starts the worker processes and loads their partitions
+                searcher.search(queries[:1], args.k)
+                latencies, ids = time_queries(searcher, queries, args.k)
+                qps = throughput(searcher, queries, args.k, args.clients, args.rounds)
+                stats = searcher.stats()
+            finally:
+                searcher.close()
+
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, truth)])
+        rows.append({
+            "shards": n,
+            "build_s": round(build_s, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "qps": round(qps, 1),
+            f"recall@{args.k}": round(float(recall), 4),
+            "timeouts": stats["timeouts"],
+        })
+
+    print(f"{flat.ntotal} vectors ({args.index_type}), {len(claims)} reference claims, {args.clients} clients")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
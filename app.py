@@ -41,6 +41,8 @@ from state_scope import AgentStateClaim
 from langgraph.types import Command
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.checkpoint.memory import MemorySaver
+from streaming import stream_graph
+from tooling import start_index_watcher
 import asyncio
 import sys
 
@@ -115,7 +117,6 @@ if "compiled_graph" not in st.session_state:
     workflow.add_edge(START, "checkable_fact")
     workflow.add_edge("checkable_fact", "critical_question")
     workflow.add_edge("checkable_fact", "checkable_confirmation")
-    workflow.add_edge("identify_url", "retrieve_information")
     workflow.add_edge("retrieve_information", "clarify_information")
     workflow.add_edge("produce_summary", "get_confirmation")
 
@@ -145,33 +146,52 @@ if "compiled_graph" not in st.session_state:
 # Use the persistent version
 claim_flow = st.session_state.compiled_graph
 
+# Swap to newly published index versions while the app runs (once per process, reruns are no-ops)
+start_index_watcher()
+
 # ───────────────────────────────────────────────────────────────────────
 # HELPER FUNCTIONS
 # ───────────────────────────────────────────────────────────────────────
 
-def flush_new_ai_messages():
-    """
-    Take new AI messages from claim_state["messages"]) and render them as assistant messages
-    """
-    final_messages = st.session_state.claim_state.get("messages", [])
-    start_idx = st.session_state.graph_cursor
-
-    new_texts = []
-    for m in final_messages[start_idx:]:
-        if isinstance(m, AIMessage):
-            st.session_state.messages.append(
-                {"role": "assistant", "content": m.content}
-            )
-            new_texts.append(m.content)
-
-    # Update cursor so we don't re-render old messages
-    st.session_state.graph_cursor = len(final_messages)
-
-    # Render just the new ones
-    for text in new_texts:
+def show_assistant(slot, text):
+    """ Replace the content of a placeholder with one assistant chat message """
+    with slot.container():
         with st.chat_message("assistant"):
             st.write(text)
 
+def stream_turn(payload):
+    """
+    Run one graph turn and render while it runs: tokens of the streamed nodes as they arrive,
+    and every AI message as soon as its node has finished
+    """
+    # One placeholder per node that is streaming tokens, critical_question streams into the sidebar
+    slots = {}
+
+    def area(node):
+        return critical_live if node == "critical_question" else main_live
+
+    async def consume():
+        async for kind, node, text in stream_graph(claim_flow, payload, st.session_state.graph_config):
+            if kind == "partial":
+                if not text:
+                    # The node started over, clear what it streamed so far
+                    if node in slots:
+                        slots.pop(node).empty()
+                    continue
+                if node not in slots:
+                    slots[node] = area(node).empty()
+                show_assistant(slots[node], text)
+            elif kind in ("message", "critical"):
+                # The final message takes the place of the streamed tokens
+                show_assistant(slots.pop(node, None) or area(node).empty(), text)
+                if kind == "message":
+                    st.session_state.messages.append({"role": "assistant", "content": text})
+            elif kind == "done" and node in slots:
+                # Finished without a message (e.g. an error fallback), drop the partial text
+                slots.pop(node).empty()
+
+    run(consume())
+
 def handle_graph_output(claim_out):
     """Update local session state with the new graph state."""
     st.session_state.claim_state = claim_out
@@ -232,6 +252,25 @@ for m in st.session_state.messages:
         st.write(m["content"])
 
 
+# ───────────────────────────────────────────────────────────────────────
+# CRITICAL THINKING SIDEBAR CHAT
+# ───────────────────────────────────────────────────────────────────────
+with st.sidebar:
+    st.subheader("Critical thinking chat")
+    st.caption(
+        "Socratic helper — keeps you doing the thinking. "
+        "It will nudge with open questions instead of giving answers."
+    )
+
+    # Only show AI messages from messages_critical
+    for msg in st.session_state.claim_state.get("messages_critical", []):
+        if isinstance(msg, AIMessage):
+            with st.chat_message("assistant"):
+                st.write(msg.content)
+
+    # Messages of the current turn are added here while the graph runs
+    critical_live = st.container()
+
 # ───────────────────────────────────────────────────────────────────────
 # GLOBAL MAIN CHAT INPUT (single chat_input, pinned at bottom)
 # ───────────────────────────────────────────────────────────────────────
@@ -251,6 +290,9 @@ if main_prompt:
         st.write(main_prompt)
     st.session_state.messages.append({"role": "user", "content": main_prompt})
 
+    # Node messages of this turn are rendered here while the graph runs
+    main_live = st.container()
+
     # Get the latest state from the persistent memory
     snapshot = claim_flow.get_state(st.session_state.graph_config)
     
@@ -258,10 +300,7 @@ if main_prompt:
         # Check if the graph is waiting at an interrupt
         if snapshot.next:
             # RESUME
-            claim_out = run(claim_flow.ainvoke(
-                Command(resume=main_prompt), 
-                config=st.session_state.graph_config
-            ))
+            stream_turn(Command(resume=main_prompt))
         else:
             # START FRESH
             # Only send the state the first time
@@ -269,14 +308,11 @@ if main_prompt:
                 "messages": [HumanMessage(content=main_prompt)],
                 "claim": main_prompt
             }
-            claim_out = run(claim_flow.ainvoke(
-                initial_state, 
-                config=st.session_state.graph_config
-            ))
+            stream_turn(initial_state)
 
-    # 3. Process output
-    handle_graph_output(claim_out)
-    flush_new_ai_messages()
+    # 3. Process output, the new AI messages were already rendered while streaming
+    handle_graph_output(claim_flow.get_state(st.session_state.graph_config).values)
+    st.session_state.graph_cursor = len(st.session_state.claim_state.get("messages", []))
 
     # Check if the graph is currently paused and display the question it's waiting on
     snapshot = claim_flow.get_state(st.session_state.graph_config)
@@ -291,19 +327,3 @@ if main_prompt:
                     st.session_state.messages.append({"role": "assistant", "content": interrupt_msg})
                     with st.chat_message("assistant"):
                         st.write(interrupt_msg)
-
-# ───────────────────────────────────────────────────────────────────────
-# CRITICAL THINKING SIDEBAR CHAT
-# ───────────────────────────────────────────────────────────────────────
-with st.sidebar:
-    st.subheader("Critical thinking chat")
-    st.caption(
-        "Socratic helper — keeps you doing the thinking. "
-        "It will nudge with open questions instead of giving answers."
-    )
-
-    # Only show AI messages from messages_critical
-    for msg in st.session_state.claim_state.get("messages_critical", []):
-        if isinstance(msg, AIMessage):
-            with st.chat_message("assistant"):
-                st.write(msg.content)
@@ -0,0 +1,152 @@
+""" BM25 inverted index on SQLite, built from the docstore, plus reciprocal rank fusion. """
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_FILE = "bm25.sqlite"
+
+# Words and numbers, so "2.3%" or "2019" stay searchable tokens
+TOKEN_RE = re.compile(r"\w+(?:[.,]\w+)*", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall((text or "").casefold())
+
+# ────────────────────────────────────────────────────────────
+# BUILD / APPEND
+# ────────────────────────────────────────────────────────────
+def _encode_postings(ids: np.ndarray, tfs: np.ndarray) -> bytes:
+    return ids.astype(np.int32).tobytes() + tfs.astype(np.float32).tobytes()
+
+def _decode_postings(blob: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    half = len(blob) // 2
+    return np.frombuffer(blob[:half], dtype=np.int32), np.frombuffer(blob[half:], dtype=np.float32)
+
+def add_to_bm25(path: str, docs: Iterable[Tuple[int, str]]) -> int:
+    """ Append (position, text) documents to the BM25 index at path, creating it if needed.
+
+    Positions must continue the index, exactly like the FAISS positions they mirror.
+    Returns the number of documents added.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL, postings BLOB NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS doc_lengths (position INTEGER PRIMARY KEY, length INTEGER NOT NULL)")
+
+    # Collect postings for the new documents only
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    lengths = []
+    for position, text in docs:
+        tokens = tokenize(text)
+        lengths.append((int(position), len(tokens)))
+        for term, tf in Counter(tokens).items():
+            postings[term].append((int(position), tf))
+
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO doc_lengths (position, length) VALUES (?, ?)", lengths)
+        for term, items in postings.items():
+            ids = np.fromiter((p for p, _ in items), dtype=np.int32, count=len(items))
+            tfs = np.fromiter((tf for _, tf in items), dtype=np.float32, count=len(items))
+
+            # Merge with the existing posting list of this term
+            row = conn.execute("SELECT postings FROM terms WHERE term = ?", (term,)).fetchone()
+            if row is not None:
+                old_ids, old_tfs = _decode_postings(row[0])
+                ids, tfs = np.concatenate([old_ids, ids]), np.concatenate([old_tfs, tfs])
+            conn.execute(
+                "INSERT OR REPLACE INTO terms (term, df, postings) VALUES (?, ?, ?)",
+                (term, len(ids), _encode_postings(ids, tfs)),
+            )
+    conn.close()
+    return len(lengths)
+
+def bm25_doc_count(path: str) -> int:
+    """ Number of documents in the BM25 index, 0 if it does not exist. """
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    count = conn.execute("SELECT COUNT(*) FROM doc_lengths").fetchone()[0]
+    conn.close()
+    return count
+
+def build_bm25_from_docstore(docstore_path: str, out_path: str, batch_size: int = 10_000) -> int:
+    """ (Re)build the BM25 index from every document in a SQLite docstore. """
+    if os.path.exists(out_path):
+        os.remove(out_path)
+
+    source = sqlite3.connect(f"file:{docstore_path}?mode=ro", uri=True)
+    cursor = source.execute("SELECT position, page_content FROM docs ORDER BY position")
+    total = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        total += add_to_bm25(out_path, rows)
+    source.close()
+    return total
+
+# ────────────────────────────────────────────────────────────
+# SEARCH
+# ────────────────────────────────────────────────────────────
+class BM25Index:
+    """ Read-only BM25 search, only the posting lists of the query terms are read. """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        # Document lengths are the only per-document data kept in memory
+        rows = self._conn.execute("SELECT position, length FROM doc_lengths ORDER BY position").fetchall()
+        self.n_docs = len(rows)
+        self.doc_lengths = np.zeros(rows[-1][0] + 1 if rows else 0, dtype=np.float32)
+        for position, length in rows:
+            self.doc_lengths[position] = length
+        self.avg_length = float(self.doc_lengths.sum() / max(self.n_docs, 1))
+
+    def search(self, query: str, k: int = 10, candidates: Optional[np.ndarray] = None) -> List[int]:
+        """ Return the positions of the k best-scoring documents, optionally only among candidates. """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.n_docs:
+            return []
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT df, postings FROM terms WHERE term IN ({','.join('?' * len(terms))})", terms
+            ).fetchall()
+
+        scores = np.zeros_like(self.doc_lengths)
+        for df, blob in rows:
+            ids, tfs = _decode_postings(blob)
+            idf = math.log((self.n_docs - df + 0.5) / (df + 0.5) + 1.0)
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[ids] / self.avg_length)
+            np.add.at(scores, ids, idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        if candidates is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            allowed[candidates[candidates < len(scores)]] = True
+            scores[~allowed] = 0.0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        return hits[np.argsort(-scores[hits])].tolist()
+
+# ────────────────────────────────────────────────────────────
+# RECIPROCAL RANK FUSION
+# ────────────────────────────────────────────────────────────
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60, limit: int = 4) -> List[int]:
+    """ Merge ranked id lists, each id scores sum(1 / (k + rank)). -1 (no hit) is ignored. """
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            if doc_id != -1:
+                scores[int(doc_id)] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
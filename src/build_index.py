@@ -0,0 +1,435 @@
+"""
+Streaming, resumable builder for the verified-claims vector store.
+
+Replaces Create-faiss.ipynb. The CSV is read in chunks, chunks are embedded in
+fixed-size batches and appended to disk, so peak memory does not grow with the
+corpus. Progress is checkpointed after every CSV chunk: rerunning the same
+command after a crash resumes where it stopped. Chunk embeddings are cached by
+content hash, so rebuilding with new metadata or splitter settings only
+re-embeds chunks whose text changed. The row hashes of everything indexed are
+kept in the docstore manifest, which src/ingest.py uses to append new rows.
+A BM25 index and per-metadata-value id lists over the same documents are
+written next to the FAISS index. The whole folder is assembled in the work
+folder and only swapped into --out once it is complete.
+
+Run from the repository root:
+    python src/build_index.py --csv Data/FACTors.csv --out faiss_index --index-type hnsw
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from tqdm import tqdm
+
+from bm25 import BM25_FILE, build_bm25_from_docstore
+from docstore import DOCSTORE_FILE, INDEX_FILE, DocstoreWriter
+from embedding_backends import DEFAULT_MODEL, load_embeddings, resolve_backend
+from index_factory import INDEX_TYPES, build_index, write_index_config
+from index_versions import VERSIONS_FILE
+from exact_match import EXACT_MATCH_FILE, build_exact_match_from_docstore
+from metadata_filter import METADATA_FILE, build_metadata_index_from_docstore
+from near_duplicates import NEAR_DUP_FILE, build_near_duplicates_from_docstore
+from scatter_gather import build_partitions
+from shards import SHARD_FIELDS, build_shards
+
+# ────────────────────────────────────────────────────────────
+# CSV ROW TO DOCUMENT
+# ────────────────────────────────────────────────────────────
+def factors_row_to_document(row: dict) -> Document:
+    """ One FACTors row as a Document. The URL stays out of page_content. """
+    page = (
+        f"Title: {row['title']}\n"
+        f"Claim: {row['claim']}\n"
+        f"Date published: {row['date_published']}\n"
+        f"Author: {row['author']}\n"
+        f"Organisation: {row['organisation']}\n"
+        f"Original Verdict: {row['original_verdict']}\n"
+        f"Normalized Rating: {row['normalised_rating']}"
+    )
+    return Document(
+        page_content=page,
+        metadata={
+            # keep url authoritative in metadata only
+            "url": str(row.get("url", "")).strip(),
+            "title": str(row.get("title", "")).strip(),
+            "date_published": str(row.get("date_published", "")).strip(),
+            "organisation": str(row.get("organisation", "")).strip(),
+            "verdict": str(row.get("original_verdict", "")).strip(),
+            "rating": str(row.get("normalised_rating", "")).strip(),
+        },
+    )
+
+def eufactcheck_row_to_document(row: dict) -> Document:
+    """ One row of EUfactcheckData/eufactcheck_posts_2019_2025.csv (url, title, rating, year). """
+    page = (
+        f"Title: {row['title']}\n"
+        f"Claim: {row['title']}\n"
+        f"Date published: {row['year']}\n"
+        f"Organisation: EUfactcheck\n"
+        f"Original Verdict: {row['rating']}"
+    )
+    return Document(
+        page_content=page,
+        metadata={
+            "url": str(row.get("url", "")).strip(),
+            "title": str(row.get("title", "")).strip(),
+            "date_published": str(row.get("year", "")).strip(),
+            "organisation": "EUfactcheck",
+            "verdict": str(row.get("rating", "")).strip(),
+            "rating": str(row.get("rating", "")).strip(),
+        },
+    )
+
+# Supported CSV layouts
+SCHEMAS: Dict[str, Callable[[dict], Document]] = {
+    "factors": factors_row_to_document,
+    "eufactcheck": eufactcheck_row_to_document,
+}
+
+def row_hash(schema: str, row: dict) -> str:
+    """ Content hash of a source row, the unit the manifest de-duplicates on. """
+    payload = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{schema}\n{payload}".encode("utf-8")).hexdigest()
+
+def split_new_rows(records: List[dict], schema: str, splitter, known: set) -> List[Tuple[Document, Optional[str]]]:
+    """ Split rows whose hash is not in known into chunks.
+
+    Returns (chunk, row hash) pairs. The hash is only set on the first chunk of a row,
+    which is the position the manifest records for it. known is updated in place.
+    """
+    to_document = SCHEMAS[schema]
+    chunks = []
+    for record in records:
+        h = row_hash(schema, record)
+        if h in known:
+            continue
+        known.add(h)
+        for i, chunk in enumerate(splitter.split_documents([to_document(record)])):
+            chunks.append((chunk, h if i == 0 else None))
+    return chunks
+
+# ────────────────────────────────────────────────────────────
+# CONTENT-HASH EMBEDDING CACHE
+# ────────────────────────────────────────────────────────────
+def content_hash(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+
+class ChunkEmbeddingCache:
+    """ Chunk vectors keyed by sha256(model, chunk text), kept across builds. """
+
+    def __init__(self, path: str):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS chunk_embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        # SQLite limits the number of bound parameters, so look up in slices
+        for start in range(0, len(hashes), 500):
+            part = hashes[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, vector FROM chunk_embeddings WHERE hash IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            found.update({h: np.frombuffer(v, dtype=np.float32) for h, v in rows})
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chunk_embeddings (hash, vector) VALUES (?, ?)",
+            ((h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items.items()),
+        )
+        self.conn.commit()
+
+def embed_with_cache(texts: List[str], embeddings, cache: ChunkEmbeddingCache, model_key: str):
+    """ Embed texts, reusing cached vectors. Returns (float32 matrix, number of cache hits). """
+    hashes = [content_hash(model_key, t) for t in texts]
+    cached = cache.get_many(hashes)
+
+    missing = {h: t for h, t in zip(hashes, texts) if h not in cached}
+    if missing:
+        fresh = embeddings.embed_documents(list(missing.values()))
+        fresh = dict(zip(missing.keys(), np.asarray(fresh, dtype=np.float32)))
+        cache.put_many(fresh)
+        cached.update(fresh)
+
+    return np.stack([cached[h] for h in hashes]), len(texts) - len(missing)
+
+# ────────────────────────────────────────────────────────────
+# CHECKPOINTING
+# ────────────────────────────────────────────────────────────
+# The finished index folder is assembled here and swapped into out_dir at the end
+STAGING_DIR = "index"
+
+def read_progress(work_dir: str) -> dict:
+    path = os.path.join(work_dir, "progress.json")
+    if not os.path.exists(path):
+        return {"rows_done": 0, "chunks_done": 0, "dim": None, "csv_chunksize": None, "settings": None}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def check_settings(progress: dict, settings: dict, work_dir: str) -> None:
+    """ Record the settings the checkpointed chunks were made with, refuse to resume with others. """
+    saved = progress.get("settings")
+    if progress["chunks_done"] and saved is not None and saved != settings:
+        changed = ", ".join(
+            f"{key} {saved.get(key)!r} -> {settings.get(key)!r}"
+            for key in sorted(set(saved) | set(settings)) if saved.get(key) != settings.get(key)
+        )
+        raise ValueError(
+            f"{work_dir} holds a build made with other settings ({changed}), "
+            f"rerun with the same settings or delete it to start over"
+        )
+    progress["settings"] = settings
+
+def write_progress(work_dir: str, progress: dict) -> None:
+    """ Write the checkpoint atomically, a crash leaves either the old or the new one. """
+    tmp = os.path.join(work_dir, "progress.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(work_dir, "progress.json"))
+
+# ────────────────────────────────────────────────────────────
+# BUILD
+# ────────────────────────────────────────────────────────────
+def build(
+    csv_path: str,
+    out_dir: str,
+    schema: str = "factors",
+    index_type: str = "flat",
+    index_params: Optional[dict] = None,
+    backend: str = "auto",
+    model_name: str = DEFAULT_MODEL,
+    csv_chunksize: int = 5_000,
+    batch_size: int = 256,
+    chunk_size: int = 700,
+    chunk_overlap: int = 100,
+    work_dir: Optional[str] = None,
+    cache_path: str = "cache/chunk_embeddings.sqlite",
+    shard_by: Optional[str] = None,
+    partitions: int = 0,
+) -> None:
+    """ Stream csv_path into a vector store at out_dir, resuming from work_dir if a build was interrupted.
+
+    shard_by ('year' or 'organisation') also writes one index per value, searched for filtered queries.
+    partitions > 0 also splits the index into that many parts for scatter-gather search (src/scatter_gather.py).
+    """
+    if schema not in SCHEMAS:
+        raise ValueError(f"Unknown schema {schema!r}, expected one of {list(SCHEMAS)}")
+    if os.path.exists(os.path.join(out_dir, VERSIONS_FILE)):
+        # The final swap would replace every version, including the one being served
+        raise ValueError(
+            f"{out_dir} is a versioned index root, build into a new folder and publish it: "
+            f"python src/index_versions.py publish <folder> --root {out_dir}"
+        )
+    work_dir = work_dir or f"{out_dir.rstrip('/')}.build"
+    staging = os.path.join(work_dir, STAGING_DIR)
+
+    progress = read_progress(work_dir)
+    if progress.get("complete"):
+        # Crashed after the index was finished: at most the swap into out_dir is left
+        if os.path.exists(staging):
+            _swap_in(staging, out_dir)
+        shutil.rmtree(work_dir)
+        print(f"Finished the interrupted build of {out_dir}")
+        return
+
+    # Builds from before the staging folder kept the docstore directly in work_dir
+    os.makedirs(staging, exist_ok=True)
+    if os.path.exists(os.path.join(work_dir, DOCSTORE_FILE)):
+        os.replace(os.path.join(work_dir, DOCSTORE_FILE), os.path.join(staging, DOCSTORE_FILE))
+    if progress["chunks_done"] and not os.path.exists(os.path.join(staging, DOCSTORE_FILE)):
+        # Resuming would index the checkpointed vectors against an empty docstore
+        raise RuntimeError(
+            f"{work_dir} has a checkpoint of {progress['chunks_done']} chunks but no docstore, "
+            f"delete it to build {out_dir} from scratch"
+        )
+
+    # Chunks embedded with another model, backend or splitter would not fit with the new ones
+    backend = resolve_backend(backend)
+    check_settings(progress, {
+        "schema": schema,
+        "model_name": model_name,
+        "backend": backend,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }, work_dir)
+    embeddings = load_embeddings(backend, model_name=model_name)
+    model_key = f"{model_name}@{backend}"
+    cache = ChunkEmbeddingCache(cache_path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    # Roll the staging files back to the last checkpoint, dropping any half-written chunk
+    vectors_path = os.path.join(work_dir, "vectors.f32")
+    docs = DocstoreWriter(os.path.join(staging, DOCSTORE_FILE))
+    docs.truncate(progress["chunks_done"])
+    with open(vectors_path, "ab") as f:
+        f.truncate(progress["chunks_done"] * (progress["dim"] or 0) * 4)
+    if progress["rows_done"]:
+        print(f"Resuming after {progress['rows_done']} rows / {progress['chunks_done']} chunks")
+
+    # Checkpoints fall on CSV chunk boundaries, so a resumed build must keep the chunk size
+    csv_chunksize = progress["csv_chunksize"] or csv_chunksize
+    progress["csv_chunksize"] = csv_chunksize
+    reader = pd.read_csv(csv_path, chunksize=csv_chunksize, dtype=str, keep_default_na=False)
+    bar = tqdm(initial=progress["chunks_done"], unit="chunk", desc="embedded")
+
+    rows_seen = 0
+    with open(vectors_path, "ab") as vectors_file:
+        for frame in reader:
+            # Skip the chunks that were finished before the crash (parsing is cheap, embedding is not)
+            rows_seen += len(frame)
+            if rows_seen <= progress["rows_done"]:
+                continue
+
+            # Exact duplicate rows are indexed once
+            records = frame.to_dict("records")
+            known = docs.known_hashes([row_hash(schema, r) for r in records])
+            split_docs = split_new_rows(records, schema, splitter, known)
+
+            # Embed in fixed-size batches and append straight to disk
+            for start in range(0, len(split_docs), batch_size):
+                batch = split_docs[start:start + batch_size]
+                vectors, hits = embed_with_cache([d.page_content for d, _ in batch], embeddings, cache, model_key)
+                vectors_file.write(vectors.tobytes())
+
+                first = progress["chunks_done"] + start
+                docs.add(
+                    ((first + i, str(uuid.uuid4()), d) for i, (d, _) in enumerate(batch)),
+                    row_hashes=[(h, first + i) for i, (_, h) in enumerate(batch) if h],
+                )
+                progress["dim"] = int(vectors.shape[1])
+                bar.update(len(batch))
+                bar.set_postfix(cached=hits, rows=progress["rows_done"])
+
+            # Checkpoint once the whole CSV chunk is on disk
+            vectors_file.flush()
+            os.fsync(vectors_file.fileno())
+            progress["rows_done"] += len(frame)
+            progress["chunks_done"] += len(split_docs)
+            write_progress(work_dir, progress)
+    bar.close()
+    docs.close()
+
+    if not progress["chunks_done"]:
+        raise ValueError(f"No documents found in {csv_path}")
+
+    # Index from a memory map, the vectors are never all in RAM at once
+    vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(progress["chunks_done"], progress["dim"]))
+    index, params = build_index(vectors, index_type, index_params)
+
+    # Everything is written to the staging folder, out_dir only changes in the final swap
+    faiss.write_index(index, os.path.join(staging, INDEX_FILE))
+    docstore_path = os.path.join(staging, DOCSTORE_FILE)
+
+    # Lexical index over the same documents, for hybrid retrieval
+    build_bm25_from_docstore(docstore_path, os.path.join(staging, BM25_FILE))
+
+    # Id lists per year / organisation / rating, for filtered search
+    build_metadata_index_from_docstore(docstore_path, os.path.join(staging, METADATA_FILE))
+
+    # Near-duplicate clusters, retrieval shows one document per cluster
+    build_near_duplicates_from_docstore(docstore_path, os.path.join(staging, NEAR_DUP_FILE))
+
+    # Hash index over claim texts and URLs, for the exact-match fast path
+    build_exact_match_from_docstore(docstore_path, os.path.join(staging, EXACT_MATCH_FILE))
+
+    # Optional shards per year / organisation, the full index stays for unfiltered queries
+    if shard_by:
+        routing = build_shards(staging, vectors, docstore_path, shard_by, index_type, index_params)
+        print(f"Wrote {len(routing['shards'])} shards by {shard_by}")
+
+    # Optional position % N partitions, searched in parallel by SHARD_WORKERS processes
+    if partitions:
+        build_partitions(staging, vectors, partitions, index_type, index_params)
+        print(f"Wrote {partitions} partitions")
+    write_index_config(staging, {
+        "index_type": index_type,
+        "params": params,
+        "model_name": model_name,
+        "backend": backend,
+        "ntotal": int(index.ntotal),
+        "source": os.path.basename(csv_path),
+        "schema": schema,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "shard_by": shard_by,
+        "partitions": partitions,
+    })
+
+    # The build is complete: mark it so a crash from here on only repeats the swap,
+    # then only the embedding cache is kept for the next run
+    del vectors
+    progress["complete"] = True
+    write_progress(work_dir, progress)
+    _swap_in(staging, out_dir)
+    shutil.rmtree(work_dir)
+    print(f"Wrote {index.ntotal} vectors ({index_type}) to {out_dir}")
+
+def _swap_in(staging: str, out_dir: str) -> None:
+    """ Replace out_dir by the finished staging folder.
+
+    A new out_dir appears in one rename. An existing one is renamed aside first and
+    deleted after the swap, a crash in between leaves it as out_dir.old.
+    """
+    old = f"{out_dir.rstrip('/')}.old"
+    if os.path.exists(out_dir):
+        if os.path.exists(old):
+            shutil.rmtree(old)
+        os.replace(out_dir, old)
+    shutil.move(staging, out_dir)
+    if os.path.exists(old):
+        shutil.rmtree(old)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="Data/FACTors.csv")
+    parser.add_argument("--out", default="faiss_index")
+    parser.add_argument("--schema", choices=list(SCHEMAS), default="factors")
+    parser.add_argument("--index-type", choices=list(INDEX_TYPES), default="flat")
+    parser.add_argument("--index-params", type=json.loads, default=None, help='JSON, e.g. \'{"nlist": 1024}\'')
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--csv-chunksize", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=700)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--work-dir", default=None)
+    parser.add_argument("--cache", default="cache/chunk_embeddings.sqlite")
+    parser.add_argument("--shard-by", choices=list(SHARD_FIELDS), default=None)
+    parser.add_argument("--partitions", type=int, default=0, help="split the index for scatter-gather search")
+    args = parser.parse_args()
+
+    build(
+        csv_path=args.csv,
+        out_dir=args.out,
+        schema=args.schema,
+        index_type=args.index_type,
+        index_params=args.index_params,
+        backend=args.backend,
+        csv_chunksize=args.csv_chunksize,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        work_dir=args.work_dir,
+        cache_path=args.cache,
+        shard_by=args.shard_by,
+        partitions=args.partitions,
+    )
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,6 +26,7 @@ from state_scope import (
     SummaryOutput, 
     ConfirmationMatch,
     ClaimMatchingOutput,
+    TopClaim,
     SourceOutput,
     GetSearchQueries,
     SearchSynthesis,
@@ -33,11 +34,12 @@ from state_scope import (
 from langgraph.types import Overwrite, interrupt
 from langchain_core.messages import HumanMessage,AIMessage, get_buffer_string
 from typing import Dict, Any, Literal
+import asyncio
 from langgraph.graph import END
 from langgraph.graph.message import add_messages
 from langgraph.types import Command, Send
 from utils import get_new_user_reply,_domain
-from tooling import llm, llm_tuned, tools_dict, tavily_client
+from tooling import chat_model, tools_dict, tavily_client, aretrieve_batch, find_exact_match, structured_output
 
 # Maximum number of messages to send to the prompt
 MAX_HISTORY_MESSAGES = 6
@@ -69,7 +71,7 @@ async def critical_question(state: AgentStateClaim):
     )
     try:
         #invoke the LLM and store the output
-        result = await llm_tuned.ainvoke([HumanMessage(content=prompt)])
+        result = await chat_model("llm_tuned").ainvoke([HumanMessage(content=prompt)])
         content = result.content
     except Exception as e:
         # Graceful fallback question
@@ -104,7 +106,7 @@ async def checkable_fact(state: AgentStateClaim):
     messages_str = get_buffer_string(recent_messages)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(CheckableOutput, method="json_mode")
+    structured_llm = structured_output(CheckableOutput, node="checkable_fact")
 
     # Create a prompt
     prompt = checkable_check_prompt.format(
@@ -173,7 +175,7 @@ async def checkable_confirmation(state: AgentStateClaim) -> Command[Literal["ide
     user_answer = interrupt(state.get("question", "Is the information correct?"))
 
     # Use structured output
-    structured_llm = llm.with_structured_output(ConfirmationOutput, method="json_mode")
+    structured_llm = structured_output(ConfirmationOutput, node="checkable_confirmation")
 
     # Create a prompt
     prompt = confirmation_prompt.format(
@@ -247,7 +249,7 @@ import re
 
 URL_RE = re.compile(r"(https?://[^\s)>\]]+|www\.[^\s)>\]]+)", re.IGNORECASE)
 
-def identify_url(state: AgentStateClaim):
+def identify_url(state: AgentStateClaim) -> Command[Literal["retrieve_information", "match_or_continue"]]:
     """Ask once, extract everything, and route the research path."""
     
     # Get an answer from the user
@@ -255,15 +257,19 @@ def identify_url(state: AgentStateClaim):
 
     m = URL_RE.search(user_answer or "")
     if not m:
-        return {"claim_url": None}
+        return Command(goto="retrieve_information", update={"claim_url": None})
 
     url = m.group(0)
     if url.lower().startswith("www."):
         url = "https://" + url
 
-    return {
-        "claim_url": url
-    }
+    # Fast path: a URL that is already in the fact-check database has a known verdict.
+    # A row without a rating has nothing to show yet, the claim goes through retrieval
+    hit = find_exact_match(url=url)
+    if hit and hit.get("rating"):
+        return exact_match_command(hit, "The URL is an already fact-checked source.", {"claim_url": url})
+
+    return Command(goto="retrieve_information", update={"claim_url": url})
 
 # ───────────────────────────────────────────────────────────────────────
 # RETRIEVE_INFORMATION NODE
@@ -292,7 +298,7 @@ async def retrieve_information(state: AgentStateClaim):
     messages_str = get_buffer_string(recent_messages)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(MoreInfoOutput, method="json_mode")
+    structured_llm = structured_output(MoreInfoOutput, node="retrieve_information")
 
     # Create a prompt
     prompt = retrieve_info_prompt.format(
@@ -363,7 +369,7 @@ async def clarify_information(state: AgentStateClaim) -> Command[Literal["produc
     user_answer = interrupt(state.get("question", "Is the information correct?"))
 
     # Use structured output
-    structured_llm = llm.with_structured_output(ConfirmationOutput, method="json_mode")
+    structured_llm = structured_output(ConfirmationOutput, node="clarify_information")
 
     # Create a prompt
     prompt  =  confirmation_prompt.format(
@@ -454,7 +460,7 @@ async def produce_summary(state: AgentStateClaim):
     messages_str = get_buffer_string(recent_messages)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(SummaryOutput, method="json_mode")
+    structured_llm = structured_output(SummaryOutput, node="produce_summary")
 
     # Create a prompt
     prompt = get_summary_prompt.format(
@@ -519,7 +525,7 @@ async def produce_summary(state: AgentStateClaim):
 # GET_CONFIRMATION NODE
 # ───────────────────────────────────────────────────────────────────────
    
-async def get_confirmation(state: AgentStateClaim) -> Command[Literal["produce_summary", "get_rag_queries"]]:
+async def get_confirmation(state: AgentStateClaim) -> Command[Literal["produce_summary", "get_rag_queries", "match_or_continue"]]:
 
     """ Get confirmation from user on the gathered information."""
 
@@ -527,7 +533,7 @@ async def get_confirmation(state: AgentStateClaim) -> Command[Literal["produce_s
     user_answer = interrupt(state.get("question", "Is the information correct?"))
 
     # Use structured output
-    structured_llm = llm.with_structured_output(ConfirmationOutput, method="json_mode")
+    structured_llm = structured_output(ConfirmationOutput, node="get_confirmation")
 
     # Create a prompt
     prompt  =  confirmation_prompt.format(
@@ -564,6 +570,15 @@ async def get_confirmation(state: AgentStateClaim) -> Command[Literal["produce_s
 
     ai_chat_msg = AIMessage(content=confirm_text)
 
+    # Fast path: a claim that was fact-checked verbatim skips query generation, retrieval and matching.
+    # Not when an exact match was already shown and the student chose to research further.
+    if confirmed and not state.get("claim_matching_result"):
+        hit = find_exact_match(claim=state.get("claim", ""))
+        if hit and hit.get("rating"):
+            return exact_match_command(
+                hit, "The claim text is identical to an already fact-checked claim.", {"additional_context": None}
+            )
+
     # Goto next node and update State
     if confirmed:
         return Command(
@@ -598,7 +613,7 @@ async def get_rag_queries(state: AgentStateClaim):
     messages_str = get_buffer_string(recent_messages)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(GetSearchQueries, method="json_mode")
+    structured_llm = structured_output(GetSearchQueries, node="get_rag_queries")
 
     # Create a prompt
     prompt  = rag_queries_prompt.format(
@@ -665,7 +680,7 @@ async def confirm_rag_queries(state: AgentStateClaim) -> dict:
     search_queries_str = "\n".join(f"- {q}" for q in search_queries)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(GetSearchQueries, method="json_mode")
+    structured_llm = structured_output(GetSearchQueries, node="confirm_rag_queries")
 
     # Create a prompt
     prompt  =  confirm_queries_prompt.format(
@@ -732,40 +747,43 @@ def route_rag_confirm(state: AgentStateClaim):
     if not search_queries:
         return "confirm_rag_queries"
 
-    # If confirmed, proceed to retrieval
-    return [
-        Send("rag_retrieve_worker", {"current_query": q})
-        for q in search_queries if q
-    ]
+    # If confirmed, proceed to retrieval, all queries go to one batched worker
+    return Send("rag_retrieve_worker", {
+        "search_queries": [q for q in search_queries if q],
+        "details_claim": state.get("details_claim"),
+        "summary": state.get("summary", ""),
+    })
 
 # ───────────────────────────────────────────────────────────────────────
 # WORKER CLAIM MATCHING NODE
 # ───────────────────────────────────────────────────────────────────────
 
 async def rag_retrieve_worker(state: AgentStateClaim) -> Dict[str, Any]:
-    """ Perform retrieval for a given query. """
+    """ Perform batched retrieval for all confirmed queries. """
 
-    # Get the current query from state
-    q = state["current_query"]
+    # Get the confirmed queries from state
+    queries = state.get("search_queries", [])
 
-    # Pass the subject as a safety net
+    # Pass the subject as a safety net, time period and geography narrow the search
     details = state.get("details_claim")
     subject=details.subject if details else ""
+    scope = {
+        "time_period": details.time_period if details else "",
+        "geography": details.geography if details else "",
+        # The claim summary re-ranks the candidates (when RERANK_ENABLED), so the reducer sees only the best ones
+        "rerank_claim": state.get("summary", ""),
+    }
 
-    # Call the retriever tool
-    retriever_tool = tools_dict["retriever_tool"] 
-    
     try:
-        #invoke the LLM and store the output
-        out = await retriever_tool.ainvoke({"query": q, "subject": subject})  
+        # One encode and one index search for all queries, shared with concurrent sessions
+        outputs = await aretrieve_batch(queries, subject, **scope)
     
     except Exception as first_error:
         # fallback: try once more
         print("rag_retrieve_worker first attempt failed:", repr(first_error))
 
         try:
-            #invoke the LLM and store the output
-            out = await retriever_tool.ainvoke({"query": q, "subject": subject})
+            outputs = await aretrieve_batch(queries, subject, **scope)
 
         except Exception as second_error:
             # fallback: just continue
@@ -776,24 +794,24 @@ async def rag_retrieve_worker(state: AgentStateClaim) -> Dict[str, Any]:
                     "tool_name": "retriever_tool",
                     "args": {"query": q, "subject": subject},
                     "error": str(second_error),
-                }],
+                } for q in queries],
                 "messages": [
                     AIMessage(
                         content=(
-                            "I ran into a technical issue while retrieving information for this query. "
-                            "I tried again but it still failed, so I’ll skip it and continue."
+                            "I ran into a technical issue while retrieving information for these queries. "
+                            "I tried again but it still failed, so I’ll skip them and continue."
                         )
                     )
                 ],
             }
     
-    # Return the RAG trace entry
+    # Return one RAG trace entry per query
     return {
         "rag_trace": [{
             "tool_name": "retriever_tool",
             "args": {"query": q, "subject": subject},
             "output": out,
-        }]
+        } for q, out in zip(queries, outputs)]
     }
 
 # ───────────────────────────────────────────────────────────────────────
@@ -812,7 +830,7 @@ async def reduce_claim_matching(state: AgentStateClaim) -> Command[Literal["matc
         formatted_trace += f"\nQuery: {entry['args'].get('query')}\nOutput: {entry['output']}\n{'-'*20}"
 
     # Use structured output
-    structured_llm = llm.with_structured_output(ClaimMatchingOutput,method="json_mode")
+    structured_llm = structured_output(ClaimMatchingOutput, node="reduce_claim_matching")
 
     # Create a prompt
     prompt = structure_claim_prompt.format(
@@ -843,6 +861,23 @@ async def reduce_claim_matching(state: AgentStateClaim) -> Command[Literal["matc
         )
     
     # human-readable assistant message for the chat
+    ai_chat_msg = AIMessage(content=format_claim_matching(result))
+
+    # Determine next node based on whether matches were found
+    goto_node = "match_or_continue" if result.top_claims else "primary_source"
+    
+    # Goto next node and update State
+    return Command(
+        goto=goto_node,
+        update={
+            "messages": [ai_chat_msg],
+            "claim_matching_result": result,
+            "queries_confirmed": False 
+        }
+    )
+
+def format_claim_matching(result: ClaimMatchingOutput) -> str:
+    """ Chat message for a claim matching result. """
     explanation_lines = ["### Claim Matching Analysis\n", f"{result.explanation}\n"]
     
     if result.top_claims:
@@ -854,25 +889,34 @@ async def reduce_claim_matching(state: AgentStateClaim) -> Command[Literal["matc
     else:
         explanation_lines.append("_No strong matching claims were found for this specific assertion._")
 
-    ai_chat_msg = AIMessage(content="\n".join(explanation_lines))
-
-    # Determine next node based on whether matches were found
-    goto_node = "match_or_continue" if result.top_claims else "primary_source"
-    
-    # Goto next node and update State
+    return "\n".join(explanation_lines)
+
+def exact_match_command(hit: dict, rationale: str, update: Dict[str, Any]) -> Command:
+    """ Skip straight to match_or_continue with the known verdict of an exact match (one with a rating). """
+    verdict = hit.get("verdict") or hit["rating"]
+    result = ClaimMatchingOutput(
+        top_claims=[TopClaim(
+            short_summary=f"{hit.get('claim') or hit.get('title')} ({hit.get('organisation')}, verdict: {verdict})",
+            allowed_url=hit.get("url") or None,
+            alignment_rationale=rationale,
+        )],
+        explanation=f"This claim was already fact-checked by {hit.get('organisation')}, the verdict was **{verdict}**.",
+    )
     return Command(
-        goto=goto_node,
+        goto="match_or_continue",
         update={
-            "messages": [ai_chat_msg],
+            **update,
+            "messages": [AIMessage(content=format_claim_matching(result))],
             "claim_matching_result": result,
-            "queries_confirmed": False 
-        }
+            "queries_confirmed": False,
+        },
     )
+
 # ───────────────────────────────────────────────────────────────────────
 # MATCHED OR CONTUE RESEARCH NODE
 # ───────────────────────────────────────────────────────────────────────
 
-async def match_or_continue(state: AgentStateClaim) -> Command[Literal["primary_source", "__end__"]]:
+async def match_or_continue(state: AgentStateClaim) -> Command[Literal["primary_source", "retrieve_information", "__end__"]]:
 
     """ Decide whether to continue researching or end the process if a matching claim was found."""
 
@@ -888,7 +932,7 @@ async def match_or_continue(state: AgentStateClaim) -> Command[Literal["primary_
     messages_str = get_buffer_string(recent_messages)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(ConfirmationMatch, method="json_mode")
+    structured_llm = structured_output(ConfirmationMatch, node="match_or_continue")
 
     # Create a prompt
     prompt =  match_check_prompt.format(
@@ -941,6 +985,14 @@ async def match_or_continue(state: AgentStateClaim) -> Command[Literal["primary_
                     "messages": [ai_chat_msg], 
                 }
         )       
+    elif not state.get("summary"):
+        # The exact URL fast path skipped the claim details and summary, gather them before researching
+        return Command(
+                goto="retrieve_information",
+                update={
+                    "messages": [ai_chat_msg],
+                }
+        )
     else:
         return Command(
                 goto="primary_source", 
@@ -969,7 +1021,7 @@ async def primary_source(state: AgentStateClaim) -> Command[Literal["get_search_
     user_answer = interrupt(ask_msg)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(SourceOutput, method="json_mode")
+    structured_llm = structured_output(SourceOutput, node="primary_source")
     
     # Create a prompt
     prompt= source_prompt.format(
@@ -1032,7 +1084,7 @@ async def get_source_queries(state: AgentStateClaim):
     messages_str = get_buffer_string(recent_messages)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(GetSearchQueries, method="json_mode")
+    structured_llm = structured_output(GetSearchQueries, node="get_source_queries")
 
     # Create a prompt
     prompt  = source_queries_prompt.format(
@@ -1100,7 +1152,7 @@ async def confirm_search_queries(state: AgentStateClaim) -> dict:
     search_queries_str = "\n".join(f"- {q}" for q in search_queries)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(GetSearchQueries, method="json_mode")
+    structured_llm = structured_output(GetSearchQueries, node="confirm_search_queries")
 
     # Create a prompt
     prompt  =  confirm_queries_prompt.format(
@@ -1293,7 +1345,7 @@ async def reduce_sources(state: AgentStateClaim) -> Command[Literal["select_prim
         alerts_str= "\n".join(f"- {a}" for a in alerts)
 
         # Use structured output 
-        structured_llm = llm.with_structured_output(SearchSynthesis, method="json_mode")
+        structured_llm = structured_output(SearchSynthesis, node="reduce_sources")
         
         # Create a prompt
         prompt  = eval_search_prompt.format(
@@ -1374,7 +1426,7 @@ async def select_primary_source(state: AgentStateClaim):
     conversation_history = list(state.get("messages", []))
 
     # Use structured output 
-    structured_llm = llm.with_structured_output(SourceOutput, method="json_mode")
+    structured_llm = structured_output(SourceOutput, node="select_primary_source")
 
     # Add the last message into a string for the prompt
     recent_messages = conversation_history[-MAX_HISTORY_MESSAGES:]  # tune this number
@@ -1452,7 +1504,7 @@ async def get_search_queries(state: AgentStateClaim):
     alerts_str= "\n".join(f"- {a}" for a in alerts)
 
     # Use structured output
-    structured_llm = llm.with_structured_output(GetSearchQueries, method="json_mode")
+    structured_llm = structured_output(GetSearchQueries, node="get_search_queries")
 
     # Create a prompt
     prompt  = search_queries_prompt.format(
@@ -1526,7 +1578,7 @@ async def iterate_search(state: AgentStateClaim) -> Command[Literal["get_search_
     conversation_history = list(state.get("messages", []))
 
     # Use structured output 
-    structured_llm = llm.with_structured_output(ConfirmationOutput, method="json_mode")
+    structured_llm = structured_output(ConfirmationOutput, node="iterate_search")
 
     # Add the last message into a string for the prompt
     recent_messages = conversation_history[-MAX_HISTORY_MESSAGES:]  # tune this number
@@ -0,0 +1,223 @@
+""" Read-only SQLite docstore and memory-mapped FAISS loading (no pickle). """
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections.abc import Mapping
+from typing import Iterable, List, Optional, Tuple, Union
+
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+
+# ────────────────────────────────────────────────────────────
+# WRITE THE DOCSTORE
+# ────────────────────────────────────────────────────────────
+class DocstoreWriter:
+    """ Append-only writer for the docstore, used by the builders to stream documents to disk.
+
+    The manifest table records the content hash of every source row already indexed,
+    in the same transaction as its documents, so ingesting a row twice is a no-op.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " position INTEGER PRIMARY KEY,"
+            " doc_id TEXT NOT NULL UNIQUE,"
+            " page_content TEXT NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            " row_hash TEXT PRIMARY KEY,"
+            " position INTEGER NOT NULL)"
+        )
+
+    def add(self, rows: Iterable[Tuple[int, str, Document]], row_hashes: Iterable[Tuple[str, int]] = ()) -> None:
+        """ Append documents and the (row hash, first position) of the source rows they came from. """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO docs (position, doc_id, page_content, metadata) VALUES (?, ?, ?, ?)",
+                (
+                    (int(pos), str(doc_id), doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                    for pos, doc_id, doc in rows
+                ),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO manifest (row_hash, position) VALUES (?, ?)",
+                ((h, int(pos)) for h, pos in row_hashes),
+            )
+
+    def known_hashes(self, hashes: List[str]) -> set:
+        """ The subset of these row hashes that is already indexed. """
+        known = set()
+        for start in range(0, len(hashes), 500):
+            part = hashes[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT row_hash FROM manifest WHERE row_hash IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            known.update(r[0] for r in rows)
+        return known
+
+    def truncate(self, n_docs: int) -> None:
+        """ Drop every document at position >= n_docs (rolls back a half-written batch). """
+        with self.conn:
+            self.conn.execute("DELETE FROM docs WHERE position >= ?", (int(n_docs),))
+            self.conn.execute("DELETE FROM manifest WHERE position >= ?", (int(n_docs),))
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+def write_docstore(path: str, rows: Iterable[Tuple[int, str, Document]]) -> None:
+    """ Write (faiss position, docstore id, document) rows to a fresh SQLite docstore. """
+    if os.path.exists(path):
+        os.remove(path)
+
+    writer = DocstoreWriter(path)
+    writer.add(rows)
+    writer.close()
+
+def save_vectorstore(folder: str, index, documents: List[Document]) -> None:
+    """ Save a FAISS index with its documents (in index order) as index.faiss + docstore.sqlite. """
+    os.makedirs(folder, exist_ok=True)
+    faiss.write_index(index, os.path.join(folder, INDEX_FILE))
+    write_docstore(
+        os.path.join(folder, DOCSTORE_FILE),
+        ((pos, str(uuid.uuid4()), doc) for pos, doc in enumerate(documents)),
+    )
+
+# ────────────────────────────────────────────────────────────
+# READ-ONLY SQLITE DOCSTORE
+# ────────────────────────────────────────────────────────────
+class SqliteDocstore(Docstore):
+    """ Docstore that materializes Documents from SQLite only when they are hit. """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Read-only URI so a worker can never modify the shared file
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_document(row) -> Document:
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def search(self, search: str) -> Union[str, Document]:
+        """ Look up a document by docstore id, same contract as InMemoryDocstore. """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM docs WHERE doc_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._to_document(row)
+
+    def documents_at(self, positions: List[int]) -> List[Optional[Document]]:
+        """ Materialize the documents at these FAISS positions in one query, keeping the order. """
+        wanted = [int(p) for p in positions if p != -1]
+        if not wanted:
+            return []
+
+        placeholders = ",".join("?" * len(wanted))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT position, page_content, metadata FROM docs WHERE position IN ({placeholders})",
+                wanted,
+            ).fetchall()
+        found = {r[0]: self._to_document(r[1:]) for r in rows}
+        return [found.get(p) for p in wanted]
+
+    def doc_id_at(self, position: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT doc_id FROM docs WHERE position = ?", (int(position),)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+class SqliteIndexToDocstoreId(Mapping):
+    """ Lazy FAISS position -> docstore id mapping, so the whole id table is never loaded. """
+
+    def __init__(self, docstore: SqliteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        doc_id = self.docstore.doc_id_at(position)
+        if doc_id is None:
+            raise KeyError(position)
+        return doc_id
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+# ────────────────────────────────────────────────────────────
+# LOAD THE VECTORSTORE
+# ────────────────────────────────────────────────────────────
+def read_index(path: str, mmap: bool = True):
+    """ Read a FAISS index, memory-mapping the vectors so processes share page-cache pages. """
+    if not mmap:
+        return faiss.read_index(path)
+
+    # IO_FLAG_MMAP_IFC maps flat code arrays, older faiss builds lack it and read normally
+    flags = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    return faiss.read_index(path, flags)
+
+def load_vectorstore(folder: str, embeddings: Embeddings, mmap: bool = True) -> FAISS:
+    """ Load index.faiss (optionally memory-mapped) with the SQLite docstore next to it. """
+    docstore_path = os.path.join(folder, DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        raise FileNotFoundError(
+            f"{docstore_path} not found, convert the pickled docstore once with: python src/docstore.py {folder}"
+        )
+
+    index = read_index(os.path.join(folder, INDEX_FILE), mmap=mmap)
+    docstore = SqliteDocstore(docstore_path)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=SqliteIndexToDocstoreId(docstore),
+    )
+
+# ────────────────────────────────────────────────────────────
+# ONE-OFF CONVERSION FROM THE PICKLED DOCSTORE
+# ────────────────────────────────────────────────────────────
+def convert_pickle_docstore(folder: str) -> str:
+    """ Convert the index.pkl written by FAISS.save_local into docstore.sqlite. """
+
+    # Unpickling happens once here, on our own build output, never in the app
+    import pickle
+
+    with open(os.path.join(folder, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    path = os.path.join(folder, DOCSTORE_FILE)
+    write_docstore(
+        path,
+        ((pos, doc_id, docstore.search(doc_id)) for pos, doc_id in index_to_docstore_id.items()),
+    )
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a pickled FAISS docstore to SQLite.")
+    parser.add_argument("folder", nargs="?", default="faiss_index")
+    args = parser.parse_args()
+    print("Wrote", convert_pickle_docstore(args.folder))
@@ -0,0 +1,233 @@
+""" Embedding backends: PyTorch (CPU/GPU), ONNX Runtime and int8-quantized ONNX. """
+
+import json
+import os
+import shutil
+import tempfile
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MODEL = "sentence-transformers/all-mpnet-base-v2"
+BACKENDS = ("auto", "torch", "onnx", "onnx-int8")
+
+# all-mpnet-base-v2 truncates at 384 word pieces
+MAX_SEQ_LENGTH = 384
+
+# The sentence-transformers pipeline of a model (Transformer, Pooling, Normalize, ...)
+MODULES_FILE = "modules.json"
+NORMALIZE_MODULE = "sentence_transformers.models.Normalize"
+
+# ────────────────────────────────────────────────────────────
+# HELPER FUNCTION TO DETECT THE DEVICE
+# ────────────────────────────────────────────────────────────
+def detect_device() -> str:
+    """ Return 'cuda' when a GPU is usable, otherwise 'cpu'. """
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+def _onnxruntime_available() -> bool:
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+# ────────────────────────────────────────────────────────────
+# ONNX EXPORT AND QUANTIZATION
+# ────────────────────────────────────────────────────────────
+# Workers that start together may all export on first use. Each one writes into its own temp
+# file or folder and os.replace()s the results into place, so nobody reads a half-written file.
+def _temp_path(path: str) -> str:
+    """ A new, unique file name next to path with the same extension (same filesystem, so os.replace is atomic). """
+    stem, ext = os.path.splitext(os.path.basename(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{stem}-", suffix=f".tmp{ext}", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    return tmp
+
+def save_modules(model_name: str, out_dir: str) -> None:
+    """ Copy the model's modules.json next to the export, so the ONNX path applies the same Normalize step. """
+    if os.path.isdir(model_name):
+        source = os.path.join(model_name, MODULES_FILE)
+        if not os.path.exists(source):
+            return
+    else:
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.utils import EntryNotFoundError
+
+        try:
+            source = hf_hub_download(model_name, MODULES_FILE)
+        except EntryNotFoundError:
+            # A plain transformers model, no sentence-transformers pipeline
+            return
+    target = os.path.join(out_dir, MODULES_FILE)
+    tmp = _temp_path(target)
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+def has_normalize_module(model_dir: str) -> bool:
+    """ True if modules.json in model_dir lists a Normalize module. """
+    path = os.path.join(model_dir, MODULES_FILE)
+    if not os.path.exists(path):
+        return False
+    with open(path, encoding="utf-8") as f:
+        return any(module.get("type") == NORMALIZE_MODULE for module in json.load(f))
+
+def export_onnx(model_name: str, out_dir: str) -> str:
+    """ Export the transformer encoder to ONNX and save the tokenizer next to it.
+
+    Everything is written to a temp folder first and moved into out_dir file by file,
+    model.onnx last, since its presence tells load_embeddings the export is complete.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    onnx_path = os.path.join(out_dir, "model.onnx")
+    staging = tempfile.mkdtemp(prefix=".export-", dir=out_dir)
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        tokenizer.save_pretrained(staging)
+        save_modules(model_name, staging)
+
+        # Trace with a dummy batch, batch and sequence axes stay dynamic
+        dummy = tokenizer(["export"], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dummy["input_ids"], dummy["attention_mask"]),
+                os.path.join(staging, "model.onnx"),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=17,
+            )
+
+        for name in sorted(os.listdir(staging), key=lambda n: n == "model.onnx"):
+            os.replace(os.path.join(staging, name), os.path.join(out_dir, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return onnx_path
+
+def quantize_onnx(onnx_path: str, out_path: str) -> str:
+    """ Dynamically quantize the ONNX weights to int8, written to a temp file and renamed into place. """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp = _temp_path(out_path)
+    try:
+        quantize_dynamic(onnx_path, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out_path
+
+# ────────────────────────────────────────────────────────────
+# ONNX RUNTIME EMBEDDINGS
+# ────────────────────────────────────────────────────────────
+class OnnxEmbeddings(Embeddings):
+    """ Sentence embeddings from an exported ONNX encoder with mean pooling, like sentence-transformers.
+
+    Vectors are L2-normalized when normalize is set or the model's modules.json lists a Normalize module.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, normalize: bool = False, batch_size: int = 32):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        file_name = "model-int8.onnx" if quantized else "model.onnx"
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, file_name), options, providers=["CPUExecutionProvider"]
+        )
+        self.normalize = normalize or has_normalize_module(model_dir)
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            mask = batch["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                ["last_hidden_state"],
+                {"input_ids": batch["input_ids"].astype(np.int64), "attention_mask": mask},
+            )[0]
+
+            # Mean pooling over the real (non-padding) tokens
+            mask_f = mask[..., None].astype(np.float32)
+            pooled = (hidden * mask_f).sum(axis=1) / np.clip(mask_f.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled = pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+# ────────────────────────────────────────────────────────────
+# BACKEND FACTORY
+# ────────────────────────────────────────────────────────────
+def resolve_backend(backend: str = "auto") -> str:
+    """ Pick a concrete backend: GPU PyTorch if there is a GPU, ONNX on CPU if onnxruntime is installed. """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {BACKENDS}")
+    if backend != "auto":
+        return backend
+    if detect_device() == "cuda" or not _onnxruntime_available():
+        return "torch"
+    return "onnx"
+
+def load_embeddings(
+    backend: str = "auto",
+    model_name: str = DEFAULT_MODEL,
+    onnx_dir: str = "models/all-mpnet-base-v2-onnx",
+    normalize: bool = False,
+) -> Embeddings:
+    """ Build the embeddings object for the chosen backend, exporting the ONNX model on first use. """
+    backend = resolve_backend(backend)
+
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": detect_device()},
+            encode_kwargs={"normalize_embeddings": normalize},
+        )
+
+    # Export (and quantize) once, later processes reuse the files on disk
+    onnx_path = os.path.join(onnx_dir, "model.onnx")
+    if not os.path.exists(onnx_path):
+        export_onnx(model_name, onnx_dir)
+    elif not os.path.exists(os.path.join(onnx_dir, MODULES_FILE)):
+        # Exported before modules.json was copied along
+        save_modules(model_name, onnx_dir)
+
+    quantized = backend == "onnx-int8"
+    int8_path = os.path.join(onnx_dir, "model-int8.onnx")
+    if quantized and not os.path.exists(int8_path):
+        quantize_onnx(onnx_path, int8_path)
+
+    return OnnxEmbeddings(onnx_dir, quantized=quantized, normalize=normalize)
@@ -0,0 +1,144 @@
+""" Disk-backed LRU cache for query embeddings. """
+
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# ────────────────────────────────────────────────────────────
+# HELPER FUNCTION TO NORMALIZE QUERY TEXT
+# ────────────────────────────────────────────────────────────
+def normalize_query(text: str) -> str:
+    """ Normalize a query so trivially different spellings share one cache entry. """
+
+    # all-mpnet-base-v2 lowercases and ignores repeated whitespace, so this keeps the vector identical
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.casefold().split())
+
+# ────────────────────────────────────────────────────────────
+# SQLITE BACKED LRU CACHE
+# ────────────────────────────────────────────────────────────
+class QueryEmbeddingCache:
+    """ Size-bounded LRU cache of query vectors keyed by (model name, normalized query). """
+
+    def __init__(self, path: str, max_entries: int = 50_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # Create the cache folder and table on first use
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, query))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used ON query_embeddings(last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        """ Return the cached vector or None, and refresh its LRU position. """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?",
+                (model, query),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND query = ?",
+                (time.time(), model, query),
+            )
+            self._conn.commit()
+
+        return array("f", row[0]).tolist()
+
+    def put(self, model: str, query: str, vector: List[float]) -> None:
+        """ Store a vector and evict the least recently used entries above the size bound. """
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model, query, vector, last_used) VALUES (?, ?, ?, ?)",
+                (model, query, blob, time.time()),
+            )
+            overflow = self._size() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM query_embeddings WHERE rowid IN ("
+                    " SELECT rowid FROM query_embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        """ Hit/miss counters for this process plus the current number of stored vectors. """
+        with self._lock:
+            size = self._size()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+        }
+
+# ────────────────────────────────────────────────────────────
+# EMBEDDINGS WRAPPER
+# ────────────────────────────────────────────────────────────
+class CachedQueryEmbeddings(Embeddings):
+    """ Wrap an Embeddings object so embed_query is served from the cache when possible. """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: QueryEmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Documents are only embedded at index build time, so they bypass the cache
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        query = normalize_query(text)
+        vector = self.cache.get(self.model_name, query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.cache.put(self.model_name, query, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """ Embed several queries, encoding all cache misses in a single batch. """
+        queries = [normalize_query(t) for t in texts]
+        vectors = [self.cache.get(self.model_name, q) for q in queries]
+
+        # Encode the distinct misses together, one forward pass for the whole batch
+        missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for q, v in fresh.items():
+                self.cache.put(self.model_name, q, v)
+            vectors = [v if v is not None else fresh[q] for q, v in zip(queries, vectors)]
+
+        return vectors
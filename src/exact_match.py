@@ -0,0 +1,158 @@
+""" Hash index over normalized claim texts and canonical URLs, for claims that were fact-checked verbatim. """
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from bm25 import tokenize
+
+EXACT_MATCH_FILE = "exact_match.sqlite"
+
+CLAIM_LINE_RE = re.compile(r"^Claim:[ \t]*(.*)$", re.MULTILINE)
+
+# Stored in the index, files from another version (e.g. claim lines parsed differently) are rebuilt
+FORMAT_VERSION = 2
+
+# Query parameters that only track the visitor, they never change the page
+TRACKING_PARAM_RE = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|ref_src|igshid|si)$")
+
+# ────────────────────────────────────────────────────────────
+# NORMALIZATION
+# ────────────────────────────────────────────────────────────
+def normalize_claim(text: str) -> str:
+    """ Case, punctuation, quotes and whitespace removed, so copies of one claim share a key. """
+    return " ".join(tokenize(unicodedata.normalize("NFKC", text or "")))
+
+def claim_line(page_content: str) -> str:
+    """ The text of the 'Claim:' line of a page, empty for chunks without one. """
+    match = CLAIM_LINE_RE.search(page_content or "")
+    return match.group(1).strip() if match else ""
+
+def canonical_url(url: str) -> str:
+    """ Host without www, path without trailing slash, sorted query without tracking parameters. """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    if not re.match(r"^[a-z][a-z0-9+.-]*://", url, re.IGNORECASE):
+        url = "https://" + url
+
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAM_RE.match(k.lower())
+    )
+    canonical = host + parts.path.rstrip("/")
+    return canonical + ("?" + urlencode(query) if query else "")
+
+def _key(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+# ────────────────────────────────────────────────────────────
+# BUILD / APPEND
+# ────────────────────────────────────────────────────────────
+def add_to_exact_match(path: str, docs: Iterable[Tuple[int, str, dict]]) -> int:
+    """ Add (position, page_content, metadata) documents to the hash index, the first claim per key wins. """
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " kind TEXT NOT NULL, key TEXT NOT NULL, position INTEGER NOT NULL, match TEXT NOT NULL,"
+        " PRIMARY KEY (kind, key))"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('format_version', ?)", (FORMAT_VERSION,))
+
+    rows = []
+    count = 0
+    for position, page_content, metadata in docs:
+        count += 1
+        claim = claim_line(page_content)
+        match = json.dumps({
+            "claim": claim,
+            "title": metadata.get("title", ""),
+            "url": metadata.get("url", ""),
+            "organisation": metadata.get("organisation", ""),
+            "verdict": metadata.get("verdict", ""),
+            "rating": metadata.get("rating", ""),
+        }, ensure_ascii=False)
+
+        # Only the first chunk of a fact-check carries the claim line, every chunk carries the URL
+        for kind, value in (("claim", normalize_claim(claim)), ("url", canonical_url(metadata.get("url", "")))):
+            if value:
+                rows.append((kind, _key(value), int(position), match))
+
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO entries (kind, key, position, match) VALUES (?, ?, ?, ?)", rows)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('n_docs', ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (count,),
+        )
+    conn.close()
+    return count
+
+def exact_match_doc_count(path: str) -> int:
+    """ Number of documents in the hash index, 0 if it does not exist or has another format version. """
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    conn.close()
+    return meta.get("n_docs", 0) if meta.get("format_version") == FORMAT_VERSION else 0
+
+def build_exact_match_from_docstore(docstore_path: str, out_path: str, batch_size: int = 10_000) -> int:
+    """ (Re)build the hash index from every document in a SQLite docstore. """
+    if os.path.exists(out_path):
+        os.remove(out_path)
+
+    source = sqlite3.connect(f"file:{docstore_path}?mode=ro", uri=True)
+    cursor = source.execute("SELECT position, page_content, metadata FROM docs ORDER BY position")
+    total = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        total += add_to_exact_match(out_path, ((p, c, json.loads(m)) for p, c, m in rows))
+    source.close()
+    return total
+
+# ────────────────────────────────────────────────────────────
+# LOOKUP
+# ────────────────────────────────────────────────────────────
+class ExactMatchIndex:
+    """ Read-only lookups, one primary-key probe per claim or URL. """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, folder: str) -> Optional["ExactMatchIndex"]:
+        """ Open exact_match.sqlite in an index folder, None if it was not built. """
+        path = os.path.join(folder, EXACT_MATCH_FILE)
+        return cls(path) if os.path.exists(path) else None
+
+    def _get(self, kind: str, value: str) -> Optional[dict]:
+        if not value:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT match FROM entries WHERE kind = ? AND key = ?", (kind, _key(value))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def by_claim(self, claim: str) -> Optional[dict]:
+        return self._get("claim", normalize_claim(claim))
+
+    def by_url(self, url: str) -> Optional[dict]:
+        return self._get("url", canonical_url(url))
@@ -0,0 +1,207 @@
+""" Build flat, approximate (IVF-Flat, HNSW, IVF-PQ) or reduced-precision FAISS indexes and store their parameters. """
+
+import json
+import math
+import os
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+CONFIG_FILE = "index_config.json"
+
+# Default build and search parameters per index type, overridable per build
+INDEX_TYPES: Dict[str, Dict[str, Any]] = {
+    "flat": {},
+    "ivf_flat": {"nlist": "auto", "nprobe": 16},
+    "hnsw": {"M": 32, "ef_construction": 200, "ef_search": 64},
+    "ivf_pq": {"nlist": "auto", "m": 48, "nbits": 8, "nprobe": 32},
+    # Reduced precision: float16 or 8-bit scalar quantized vectors, PCA to fewer dimensions,
+    # or 1 bit per dimension as a Hamming first pass with float rescoring of k_factor * k candidates
+    "fp16": {},
+    "sq8": {},
+    "pca": {"out_dim": 256},
+    "binary": {"k_factor": 8, "refine": "flat"},
+}
+
+# Precision of the vectors the binary first pass is rescored with
+REFINE_TYPES = ("flat", "fp16")
+
+# FAISS wants roughly 39 training points per IVF centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# ────────────────────────────────────────────────────────────
+# HELPER FUNCTION TO RESOLVE PARAMETERS
+# ────────────────────────────────────────────────────────────
+def resolve_params(index_type: str, n_vectors: int, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """ Merge the user parameters over the defaults and fix 'auto' values for this corpus size. """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {list(INDEX_TYPES)}")
+
+    resolved = {**INDEX_TYPES[index_type], **(params or {})}
+    if "nlist" in resolved:
+        nlist = resolved["nlist"]
+        if nlist == "auto":
+            nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+
+        # Never ask for more centroids than the corpus can train
+        resolved["nlist"] = max(1, min(int(nlist), n_vectors // MIN_POINTS_PER_CENTROID))
+    return resolved
+
+def min_training_points(index_type: str, params: Optional[Dict[str, Any]] = None) -> int:
+    """ Vectors needed to train this index type, 0 for types without a clustering step. """
+    if index_type == "ivf_flat":
+        return MIN_POINTS_PER_CENTROID
+    if index_type == "ivf_pq":
+        # Every PQ sub-quantizer clusters the sample into 2^nbits centroids
+        nbits = {**INDEX_TYPES[index_type], **(params or {})}["nbits"]
+        return max(MIN_POINTS_PER_CENTROID, 2 ** int(nbits))
+    return 0
+
+# ────────────────────────────────────────────────────────────
+# BUILD THE INDEX
+# ────────────────────────────────────────────────────────────
+def create_index(dim: int, index_type: str, params: Dict[str, Any]):
+    """ Create an empty (untrained) L2 index of the requested type from resolved parameters. """
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    if index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatL2(dim)
+        return faiss.IndexIVFFlat(quantizer, dim, params["nlist"], faiss.METRIC_L2)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"], faiss.METRIC_L2)
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+
+    if index_type == "pca":
+        if params["out_dim"] > dim:
+            raise ValueError(f"PCA out_dim must not exceed the dimension {dim}, got {params['out_dim']}")
+        return faiss.IndexPreTransform(faiss.PCAMatrix(dim, params["out_dim"]), faiss.IndexFlatL2(params["out_dim"]))
+
+    if index_type == "binary":
+        if params["refine"] not in REFINE_TYPES:
+            raise ValueError(f"Unknown refine type {params['refine']!r}, expected one of {REFINE_TYPES}")
+
+        # One bit per dimension against a threshold trained on the corpus, compared by Hamming distance
+        base = faiss.IndexLSH(dim, dim, False, True)
+        if params["refine"] == "flat":
+            refine = faiss.IndexFlatL2(dim)
+        else:
+            refine = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+        index = faiss.IndexRefine(base, refine)
+        index.k_factor = float(params["k_factor"])
+        return index
+
+    # ivf_pq
+    if dim % params["m"] != 0:
+        raise ValueError(f"IVF-PQ needs m to divide the dimension {dim}, got m={params['m']}")
+    quantizer = faiss.IndexFlatL2(dim)
+    return faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["m"], params["nbits"])
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    params: Optional[Dict[str, Any]] = None,
+    add_batch_size: int = 65_536,
+    train_size: int = 262_144,
+):
+    """ Create, train and fill an L2 index of the requested type. Returns (index, resolved params).
+
+    vectors may be a np.memmap, it is only read in slices so memory stays bounded.
+    """
+    n, dim = vectors.shape
+    params = resolve_params(index_type, n, params)
+    index = create_index(dim, index_type, params)
+
+    # Train IVF on an evenly spaced sample instead of the whole corpus
+    if not index.is_trained:
+        step = max(1, n // train_size)
+        index.train(np.ascontiguousarray(vectors[::step][:train_size], dtype=np.float32))
+
+    for start in range(0, n, add_batch_size):
+        index.add(np.ascontiguousarray(vectors[start:start + add_batch_size], dtype=np.float32))
+
+    apply_search_defaults(index, params)
+    return index, params
+
+# ────────────────────────────────────────────────────────────
+# QUERY-TIME PARAMETERS
+# ────────────────────────────────────────────────────────────
+def apply_search_defaults(index, params: Dict[str, Any]) -> None:
+    """ Set the index-wide nprobe / efSearch, used by searches that pass no SearchParameters. """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and params.get("nprobe"):
+        ivf.nprobe = int(params["nprobe"])
+
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None and params.get("ef_search"):
+        hnsw.efSearch = int(params["ef_search"])
+
+    refine = faiss.downcast_index(index)
+    if isinstance(refine, faiss.IndexRefine) and params.get("k_factor"):
+        refine.k_factor = float(params["k_factor"])
+
+def has_exact_vectors(index) -> bool:
+    """ True if reconstruct returns the stored float vectors (flat, or the rescoring side of binary). """
+    return isinstance(faiss.downcast_index(index), (faiss.IndexFlat, faiss.IndexRefine))
+
+def search_parameters(
+    index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    sel=None,
+    k_factor: Optional[float] = None,
+):
+    """ Per-query search parameters, thread-safe unlike changing the index attributes.
+
+    sel is an optional faiss.IDSelector restricting the candidates (metadata filters).
+    k_factor sets the rescoring shortlist of binary indexes to k_factor * k.
+    """
+    refine = faiss.downcast_index(index)
+    if isinstance(refine, faiss.IndexRefine):
+        # IndexRefine only reads k_factor, the shortlist search takes the base index's own parameters
+        if sel is not None and isinstance(faiss.downcast_index(refine.base_index), faiss.IndexLSH):
+            raise ValueError("The binary first pass cannot take a selector, search refine_index instead")
+        base_params = search_parameters(refine.base_index, nprobe=nprobe, ef_search=ef_search, sel=sel)
+        if not k_factor and base_params is None:
+            return None
+        return faiss.IndexRefineSearchParameters(
+            k_factor=float(k_factor or refine.k_factor), base_index_params=base_params
+        )
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and (nprobe or sel is not None):
+        # SearchParametersIVF defaults to nprobe=1, keep the index setting unless overridden
+        return faiss.SearchParametersIVF(sel=sel, nprobe=int(nprobe or ivf.nprobe))
+
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None and (ef_search or sel is not None):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=int(ef_search or hnsw.efSearch))
+
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+# ────────────────────────────────────────────────────────────
+# INDEX CONFIG NEXT TO THE INDEX
+# ────────────────────────────────────────────────────────────
+def write_index_config(folder: str, config: Dict[str, Any]) -> None:
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+def read_index_config(folder: str) -> Dict[str, Any]:
+    """ Read index_config.json, indexes built before it existed are flat. """
+    path = os.path.join(folder, CONFIG_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "params": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,249 @@
+"""
+Versioned index snapshots under one root folder, hot-swapped in running processes.
+
+    faiss_index/
+        versions.json                   {"current": "20260301-120000", "versions": {...}}
+        versions/20260301-120000/       index.faiss, docstore.sqlite, bm25.sqlite, ...
+
+Build a new index into its own folder, then publish it: the folder is moved
+under versions/ and becomes current in one atomic write of versions.json.
+Running processes (tooling.py) notice the change, load the new version on a
+background thread and flip to it between requests. Searches that started on
+the old version finish on it, and it is closed once the last one returns.
+A root without versions.json is a plain index folder and is used as is.
+src/ingest.py never appends to a live version: it ingests into a copy of the
+current version and publishes that.
+
+Run from the repository root:
+    python src/build_index.py --out faiss_index.new
+    python src/index_versions.py publish faiss_index.new --root faiss_index
+    python src/index_versions.py activate 20260301-120000 --root faiss_index
+    python src/index_versions.py list --root faiss_index
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+VERSIONS_FILE = "versions.json"
+VERSION_DIR = "versions"
+INITIAL_VERSION = "initial"
+
+# ────────────────────────────────────────────────────────────
+# VERSION MANIFEST
+# ────────────────────────────────────────────────────────────
+def read_versions(root: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(root, VERSIONS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_versions(root: str, table: Dict[str, Any]) -> None:
+    tmp = os.path.join(root, VERSIONS_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table, f, indent=2)
+    os.replace(tmp, os.path.join(root, VERSIONS_FILE))
+
+def resolve_index_dir(root: str) -> Tuple[Optional[str], str]:
+    """ (current version, its folder), or (None, root) for a plain index folder. """
+    table = read_versions(root)
+    if table is None:
+        return None, root
+    return table["current"], os.path.join(root, VERSION_DIR, table["current"])
+
+def _describe(folder: str) -> Dict[str, Any]:
+    config_path = os.path.join(folder, "index_config.json")
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ntotal": config.get("ntotal"),
+        "index_type": config.get("index_type"),
+        "source": config.get("source"),
+    }
+
+def publish_version(root: str, folder: str, version: Optional[str] = None, activate: bool = True) -> str:
+    """ Move a built index folder under root/versions and (by default) make it current.
+
+    A root that still is a plain index folder is first moved to the 'initial' version,
+    so the first publish keeps the index the app was started with.
+    """
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    table = read_versions(root)
+    if table is None:
+        table = {"current": None, "versions": {}}
+        os.makedirs(os.path.join(root, VERSION_DIR), exist_ok=True)
+        if os.path.exists(os.path.join(root, "index.faiss")):
+            initial = os.path.join(root, VERSION_DIR, INITIAL_VERSION)
+            os.makedirs(initial)
+            for name in os.listdir(root):
+                if name != VERSION_DIR:
+                    shutil.move(os.path.join(root, name), os.path.join(initial, name))
+            table["current"] = INITIAL_VERSION
+            table["versions"][INITIAL_VERSION] = _describe(initial)
+            _write_versions(root, table)
+
+    target = os.path.join(root, VERSION_DIR, version)
+    if version in table["versions"] or os.path.exists(target):
+        raise ValueError(f"Version {version!r} already exists in {root}")
+    shutil.move(folder, target)
+
+    table["versions"][version] = _describe(target)
+    if activate or table["current"] is None:
+        table["current"] = version
+    _write_versions(root, table)
+    return version
+
+def activate_version(root: str, version: str) -> None:
+    """ Make an existing version current, e.g. to roll back. """
+    table = read_versions(root)
+    if table is None or version not in table["versions"]:
+        raise ValueError(f"Unknown index version {version!r} in {root}")
+    table["current"] = version
+    _write_versions(root, table)
+
+def prune_versions(root: str, keep: int = 2) -> list:
+    """ Delete all but the newest keep versions, never the current one. Returns the deleted versions.
+
+    Processes still serving a deleted version keep their open files until they swap.
+    """
+    table = read_versions(root)
+    if table is None:
+        return []
+    # Versions are recorded in publish order
+    old = [v for v in table["versions"] if v != table["current"]]
+    deleted = old[:max(0, len(old) - max(0, keep - 1))]
+    for version in deleted:
+        shutil.rmtree(os.path.join(root, VERSION_DIR, version), ignore_errors=True)
+        del table["versions"][version]
+    _write_versions(root, table)
+    return deleted
+
+# ────────────────────────────────────────────────────────────
+# HOT SWAP
+# ────────────────────────────────────────────────────────────
+class _Snapshot:
+    def __init__(self, version: Optional[str], retriever):
+        self.version = version
+        self.retriever = retriever
+        self.readers = 0
+        self.retired = False
+
+class VersionedRetriever:
+    """ The ClaimRetriever of the live index version, replaced atomically by swap().
+
+    Callers hold a version for the length of a search with acquire(); a retired version
+    is closed when its last reader returns. Other attributes (embeddings, metadata, ...)
+    are read from the live retriever.
+    """
+
+    def __init__(self, version: Optional[str], retriever):
+        self._lock = threading.Lock()
+        self._live = _Snapshot(version, retriever)
+        self._retired: Dict[int, _Snapshot] = {}
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._live.version
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        with self._lock:
+            snapshot = self._live
+            snapshot.readers += 1
+        try:
+            yield snapshot.retriever
+        finally:
+            with self._lock:
+                snapshot.readers -= 1
+                free = snapshot.retired and snapshot.readers == 0
+                if free:
+                    self._retired.pop(id(snapshot), None)
+            if free:
+                self._close(snapshot)
+
+    def swap(self, version: Optional[str], retriever) -> None:
+        """ Make retriever (already loaded and warmed up) the live version. """
+        with self._lock:
+            old, self._live = self._live, _Snapshot(version, retriever)
+            old.retired = True
+            free = old.readers == 0
+            if not free:
+                self._retired[id(old)] = old
+
+        # Rankings cached for the old version point at its positions. They are keyed per retriever,
+        # so writes from searches still running on the old version are never read by the new one;
+        # clearing only frees their slots
+        retriever.invalidate_caches()
+        if free:
+            self._close(old)
+        print(f"Index version {old.version} -> {version}")
+
+    @staticmethod
+    def _close(snapshot: _Snapshot) -> None:
+        close = getattr(snapshot.retriever, "close", None)
+        if close is not None:
+            close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self._live.version,
+                "readers": self._live.readers,
+                "retired": {s.version: s.readers for s in self._retired.values()},
+            }
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self._live.retriever, attr)
+
+# ────────────────────────────────────────────────────────────
+# CLI
+# ────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=os.getenv("INDEX_DIR", "faiss_index"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="move a built index folder in as a new version")
+    publish.add_argument("folder")
+    publish.add_argument("--version", default=None)
+    publish.add_argument("--no-activate", action="store_true")
+
+    activate = commands.add_parser("activate", help="make an existing version current")
+    activate.add_argument("version")
+
+    commands.add_parser("list", help="show the versions and which one is current")
+
+    prune = commands.add_parser("prune", help="delete old versions")
+    prune.add_argument("--keep", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        version = publish_version(args.root, args.folder, args.version, activate=not args.no_activate)
+        print(f"Published {args.folder} as version {version}")
+    elif args.command == "activate":
+        activate_version(args.root, args.version)
+        print(f"Version {args.version} is current")
+    elif args.command == "prune":
+        print("Deleted versions:", ", ".join(prune_versions(args.root, args.keep)) or "none")
+    else:
+        table = read_versions(args.root)
+        if table is None:
+            print(f"{args.root} is a plain index folder without versions")
+            return
+        for version, entry in table["versions"].items():
+            marker = "*" if version == table["current"] else " "
+            print(f"{marker} {version:<20} {entry.get('created', '')}  {entry.get('ntotal')} vectors  {entry.get('index_type')}")
+
+if __name__ == "__main__":
+    main()
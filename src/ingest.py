@@ -0,0 +1,284 @@
+"""
+Incremental, append-only ingest of new fact-checks into an existing vector store.
+
+Rows whose content hash is already in the docstore manifest are skipped, only
+the new rows are split, embedded and appended to the index, docstore, BM25
+index, metadata id lists, near-duplicate clusters and exact-match hashes.
+Running the same ingest twice is therefore a no-op, apart from rebuilding side
+indexes an interrupted run left behind. Works for the FACTors CSV schema and
+the EUfactcheck posts schema.
+
+An index that is being served is never changed in place: the current version
+is copied, the new rows go into the copy, and the copy is published as the new
+current version (src/index_versions.py), which running processes swap to. The
+first ingest into a plain index folder turns it into a versioned root whose
+'initial' version is the folder as it was.
+
+Run from the repository root:
+    python src/ingest.py --csv EUfactcheckData/eufactcheck_posts_2019_2025.csv --schema eufactcheck
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from typing import Callable, Optional, Tuple
+
+import faiss
+import numpy as np
+import pandas as pd
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from bm25 import BM25_FILE, add_to_bm25, bm25_doc_count, build_bm25_from_docstore
+from build_index import SCHEMAS, ChunkEmbeddingCache, embed_with_cache, row_hash, split_new_rows
+from docstore import DOCSTORE_FILE, INDEX_FILE, DocstoreWriter
+from embedding_backends import DEFAULT_MODEL, load_embeddings, resolve_backend
+from exact_match import EXACT_MATCH_FILE, add_to_exact_match, build_exact_match_from_docstore, exact_match_doc_count
+from index_factory import read_index_config, write_index_config
+from index_versions import publish_version, resolve_index_dir
+from metadata_filter import (
+    METADATA_FILE,
+    add_to_metadata_index,
+    build_metadata_index_from_docstore,
+    metadata_doc_count,
+)
+from near_duplicates import (
+    NEAR_DUP_FILE,
+    add_to_near_duplicates,
+    build_near_duplicates_from_docstore,
+    near_duplicate_doc_count,
+)
+from scatter_gather import add_to_partitions, partition_doc_count
+from shards import add_to_shards, shard_doc_count
+
+MANIFEST_FILE = "manifest.json"
+
+# ────────────────────────────────────────────────────────────
+# HELPER FUNCTION TO RECORD AN INGEST
+# ────────────────────────────────────────────────────────────
+def append_manifest(folder: str, entry: dict, ntotal: int) -> None:
+    """ Keep a short, human-readable log of ingests next to the index. """
+    path = os.path.join(folder, MANIFEST_FILE)
+    manifest = {"ntotal": 0, "ingests": []}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    manifest["ntotal"] = ntotal
+    manifest["ingests"].append(entry)
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+# ────────────────────────────────────────────────────────────
+# INGEST
+# ────────────────────────────────────────────────────────────
+def ingest(
+    csv_path: str,
+    index_dir: str = "faiss_index",
+    schema: str = "factors",
+    batch_size: int = 256,
+    cache_path: str = "cache/chunk_embeddings.sqlite",
+) -> int:
+    """ Append the rows of csv_path that are not indexed yet. Returns the number of chunks added. """
+    if schema not in SCHEMAS:
+        raise ValueError(f"Unknown schema {schema!r}, expected one of {list(SCHEMAS)}")
+
+    # Running processes have the current version open, ingest into a copy and publish that.
+    # A plain folder is staged next to it, publishing moves everything inside it to 'initial'
+    version, current = resolve_index_dir(index_dir)
+    if version is None:
+        staging = f"{index_dir.rstrip(os.sep)}.ingest-{uuid.uuid4().hex[:8]}"
+    else:
+        staging = os.path.join(index_dir, f".ingest-{uuid.uuid4().hex[:8]}")
+    shutil.copytree(current, staging)
+    try:
+        added, repaired = _ingest_folder(csv_path, staging, schema, batch_size, cache_path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if not added and not repaired:
+        shutil.rmtree(staging, ignore_errors=True)
+        return 0
+
+    new_version = publish_version(index_dir, staging)
+    print(f"Published index version {new_version} (was {version or 'the plain folder'})")
+    return added
+
+def _ingest_folder(csv_path: str, index_dir: str, schema: str, batch_size: int, cache_path: str) -> Tuple[int, bool]:
+    """ Ingest into an unserved index folder in place. Returns (chunks added, whether any index was rebuilt). """
+    # Embed and split exactly like the build did, or the new vectors would not be comparable
+    config = read_index_config(index_dir)
+    model_name = config.get("model_name", DEFAULT_MODEL)
+    backend = resolve_backend(config.get("backend", "auto"))
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.get("chunk_size", 700), chunk_overlap=config.get("chunk_overlap", 100)
+    )
+    embed = _embed_function(model_name, backend, cache_path, batch_size)
+
+    index_path = os.path.join(index_dir, INDEX_FILE)
+    index = faiss.read_index(index_path)
+    docs = DocstoreWriter(os.path.join(index_dir, DOCSTORE_FILE))
+
+    # A crash after the docstore commit but before the index write leaves extra rows, drop them
+    docs.truncate(index.ntotal)
+
+    # Stream the CSV, only the new rows are kept in memory
+    rows_seen = 0
+    new_chunks = []
+    for frame in pd.read_csv(csv_path, chunksize=5_000, dtype=str, keep_default_na=False):
+        records = frame.to_dict("records")
+        known = docs.known_hashes([row_hash(schema, r) for r in records])
+        known.update(h for _, h in new_chunks if h)
+        new_chunks.extend(split_new_rows(records, schema, splitter, known))
+        rows_seen += len(records)
+
+    if not new_chunks:
+        docs.close()
+        print(f"Nothing new in {csv_path}, {rows_seen} rows already indexed")
+        # An earlier run may have stopped after the index write, before the other indexes caught up
+        repaired = _update_vector_indexes(index_dir, index, index.ntotal, None, embed)
+        return 0, _update_side_indexes(index_dir, index.ntotal, []) or repaired
+
+    vectors = embed([d.page_content for d, _ in new_chunks])
+
+    # Docstore and manifest first (one transaction), then swap in the new index file atomically
+    first = index.ntotal
+    docs.add(
+        ((first + i, str(uuid.uuid4()), d) for i, (d, _) in enumerate(new_chunks)),
+        row_hashes=[(h, first + i) for i, (_, h) in enumerate(new_chunks) if h],
+    )
+    docs.close()
+
+    index.add(vectors)
+    tmp = index_path + ".tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, index_path)
+
+    _update_vector_indexes(index_dir, index, first, vectors, embed)
+    _update_side_indexes(index_dir, first, new_chunks)
+
+    config["ntotal"] = int(index.ntotal)
+    write_index_config(index_dir, config)
+    append_manifest(index_dir, {
+        "source": os.path.basename(csv_path),
+        "schema": schema,
+        "rows_seen": rows_seen,
+        "rows_added": sum(1 for _, h in new_chunks if h),
+        "chunks_added": len(new_chunks),
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }, ntotal=int(index.ntotal))
+
+    print(f"Appended {len(new_chunks)} chunks, index now holds {index.ntotal} vectors")
+    return len(new_chunks), False
+
+def _embed_function(model_name: str, backend: str, cache_path: str, batch_size: int) -> Callable[[list], np.ndarray]:
+    """ Embed texts in batches through the chunk cache, loading the model on first use. """
+    loaded = {}
+
+    def embed(texts: list) -> np.ndarray:
+        if not loaded:
+            loaded["embeddings"] = load_embeddings(backend, model_name=model_name)
+            loaded["cache"] = ChunkEmbeddingCache(cache_path)
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            batch_vectors, _ = embed_with_cache(
+                texts[start:start + batch_size], loaded["embeddings"], loaded["cache"], f"{model_name}@{backend}"
+            )
+            vectors.append(batch_vectors)
+        return np.vstack(vectors)
+    return embed
+
+def _vectors_from(index_dir: str, index, start: int, embed: Callable[[list], np.ndarray]) -> np.ndarray:
+    """ The vectors at positions start.. of the index, exact copies from a flat index, re-embedded otherwise. """
+    if isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+        return index.reconstruct_n(start, index.ntotal - start)
+
+    conn = sqlite3.connect(os.path.join(index_dir, DOCSTORE_FILE))
+    try:
+        rows = conn.execute(
+            "SELECT page_content FROM docs WHERE position >= ? ORDER BY position", (start,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return embed([r[0] for r in rows])
+
+def _update_vector_indexes(
+    index_dir: str, index, first: int, vectors: Optional[np.ndarray], embed: Callable[[list], np.ndarray]
+) -> bool:
+    """ Append vectors (positions from first on) to the shards and partitions, if the index has them.
+
+    Shards or partitions that do not cover exactly the first positions, because an earlier
+    run stopped before it caught up, get the vectors they miss. Returns whether any had to.
+    """
+    docstore_path = os.path.join(index_dir, DOCSTORE_FILE)
+    vector_indexes = [
+        ("shards", shard_doc_count, lambda v, at: add_to_shards(index_dir, v, at, docstore_path)),
+        ("partitions", partition_doc_count, lambda v, at: add_to_partitions(index_dir, v, at)),
+    ]
+
+    caught_up = False
+    for name, doc_count, add in vector_indexes:
+        count = doc_count(index_dir)
+        if count is None or count >= index.ntotal:
+            continue
+        if vectors is not None and count == first:
+            add(vectors, first)
+        else:
+            print(f"The {name} hold {count} of {index.ntotal} vectors, catching them up")
+            add(_vectors_from(index_dir, index, count, embed), count)
+            caught_up = True
+    return caught_up
+
+def _update_side_indexes(index_dir: str, first: int, new_chunks: list) -> bool:
+    """ Append new_chunks (positions from first on) to the BM25, metadata, near-duplicate and exact-match indexes.
+
+    An index that does not hold exactly the first documents, because an earlier run stopped
+    before it caught up, is rebuilt from the docstore instead. Returns whether any was rebuilt.
+    """
+    docstore_path = os.path.join(index_dir, DOCSTORE_FILE)
+    ntotal = first + len(new_chunks)
+    side_indexes = [
+        (BM25_FILE, bm25_doc_count, build_bm25_from_docstore,
+         lambda path: add_to_bm25(path, ((first + i, d.page_content) for i, (d, _) in enumerate(new_chunks)))),
+        # Metadata id lists used by filtered search
+        (METADATA_FILE, metadata_doc_count, build_metadata_index_from_docstore,
+         lambda path: add_to_metadata_index(path, ((first + i, d.metadata) for i, (d, _) in enumerate(new_chunks)))),
+        # Near-duplicate clusters, new documents join the clusters of the indexed ones
+        (NEAR_DUP_FILE, near_duplicate_doc_count, build_near_duplicates_from_docstore,
+         lambda path: add_to_near_duplicates(
+             path, docstore_path, ((first + i, d.page_content) for i, (d, _) in enumerate(new_chunks)))),
+        (EXACT_MATCH_FILE, exact_match_doc_count, build_exact_match_from_docstore,
+         lambda path: add_to_exact_match(path, ((first + i, d.page_content, d.metadata) for i, (d, _) in enumerate(new_chunks)))),
+    ]
+
+    rebuilt = False
+    for name, doc_count, build, add in side_indexes:
+        path = os.path.join(index_dir, name)
+        count = doc_count(path)
+        if new_chunks and count == first:
+            add(path)
+        elif count != ntotal:
+            print(f"{name} holds {count} of {ntotal} documents, rebuilding it")
+            build(docstore_path, path)
+            rebuilt = True
+    return rebuilt
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--schema", choices=list(SCHEMAS), default="factors")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--cache", default="cache/chunk_embeddings.sqlite")
+    args = parser.parse_args()
+
+    ingest(args.csv, args.index_dir, args.schema, args.batch_size, args.cache)
+
+if __name__ == "__main__":
+    main()
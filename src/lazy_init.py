@@ -0,0 +1,108 @@
+""" Load heavy clients and models on background threads, blocking only at first use. """
+
+import importlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+# Seconds spent on the first import of each heavy dependency, filled by timed_import
+IMPORT_SECONDS: Dict[str, float] = {}
+
+# Last failure of each long-running background task (e.g. the index watcher), filled by report_background_error
+BACKGROUND_ERRORS: Dict[str, str] = {}
+
+def timed_import(module: str):
+    """ Import a module and record how long its first import took. """
+    start = time.perf_counter()
+    imported = importlib.import_module(module)
+    IMPORT_SECONDS.setdefault(module, time.perf_counter() - start)
+    return imported
+
+class LazyResource:
+    """ A value built by factory on a daemon thread as soon as start() is called.
+
+    get() blocks until the value exists (re-raising a load error), ready() never blocks.
+    Attribute access is forwarded to the value, so the resource can stand in for it.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], start: bool = True):
+        self.name = name
+        self.load_seconds = None
+        self._factory = factory
+        self._future: Future = Future()
+        self._started = False
+        self._lock = threading.Lock()
+        if start:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True).start()
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        try:
+            value = self._factory()
+        except BaseException as e:
+            print(f"{self.name}: background load failed:", repr(e))
+            self._future.set_exception(e)
+            return
+        self.load_seconds = time.perf_counter() - start
+        self._future.set_result(value)
+
+    def get(self) -> Any:
+        self.start()
+        return self._future.result()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ Wait for the load to finish, True if the value is available. """
+        self.start()
+        try:
+            self._future.result(timeout)
+        except Exception:
+            return False
+        return True
+
+    def ready(self) -> bool:
+        return self._future.done() and self._future.exception() is None
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only reached for attributes the resource itself does not have
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+def report_background_error(task: str, error: Optional[BaseException]) -> None:
+    """ Record (or with None clear) the failure of a background task for the startup report.
+
+    A task that keeps failing the same way is printed once, not on every retry.
+    """
+    if error is None:
+        BACKGROUND_ERRORS.pop(task, None)
+        return
+    message = repr(error)
+    if BACKGROUND_ERRORS.get(task) != message:
+        print(f"{task}: {message}")
+    BACKGROUND_ERRORS[task] = message
+
+def startup_report(resources: Dict[str, LazyResource]) -> str:
+    """ Seconds per heavy import and per loaded resource, slowest first. """
+    lines = ["imports:"]
+    for module, seconds in sorted(IMPORT_SECONDS.items(), key=lambda x: -x[1]):
+        lines.append(f"  {module:<40} {seconds:7.2f}s")
+    lines.append("resources:")
+    for name, resource in resources.items():
+        if resource.ready():
+            status = f"{resource.load_seconds:7.2f}s"
+        else:
+            status = "failed" if resource._future.done() else "loading"
+        lines.append(f"  {name:<40} {status}")
+    if BACKGROUND_ERRORS:
+        lines.append("background errors:")
+        for task, message in BACKGROUND_ERRORS.items():
+            lines.append(f"  {task:<40} {message}")
+    return "\n".join(lines)
@@ -0,0 +1,224 @@
+""" Disk-backed LRU cache for structured LLM responses, with a TTL and single-flight de-duplication. """
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+# ────────────────────────────────────────────────────────────
+# CACHE KEY
+# ────────────────────────────────────────────────────────────
+def prompt_text(prompt: Any) -> str:
+    """ A stable text form of a prompt string or message list. """
+    if isinstance(prompt, str):
+        return prompt
+    return json.dumps([[m.type, m.content] for m in prompt], ensure_ascii=False)
+
+def cache_key(model: str, temperature: Optional[float], schema: Type[BaseModel], method: str, prompt: Any) -> str:
+    """ sha256 over everything that changes the response: model, temperature, output schema and prompt. """
+    payload = json.dumps({
+        "model": model,
+        "temperature": temperature,
+        "method": method,
+        "schema": schema.model_json_schema(),
+        "prompt": hashlib.sha256(prompt_text(prompt).encode("utf-8")).hexdigest(),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ────────────────────────────────────────────────────────────
+# SQLITE BACKED LRU CACHE
+# ────────────────────────────────────────────────────────────
+class _LeaderCancelled(Exception):
+    """ Raised in followers when the request computing their response was cancelled. """
+
+class LLMResponseCache:
+    """ Size-bounded LRU cache of JSON responses keyed by cache_key, entries expire after ttl_seconds. """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 20_000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+
+        # Requests being computed right now, followers wait on the leader's future (any event loop)
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+        # Create the cache folder and table on first use
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """ Return the cached response or None, dropping it if it expired, and refresh its LRU position. """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """ Store a response and evict the least recently used entries above the size bound. """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            overflow = self._size() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE rowid IN ("
+                    " SELECT rowid FROM llm_responses ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Tuple[str, bool]]]) -> str:
+        """ Cached response, or compute it once: concurrent identical requests share one call.
+
+        compute returns (response, store); a response with store False is shared but not cached.
+        """
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+            with self._inflight_lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+                    # Running: a follower that is cancelled cannot cancel the shared future
+                    future.set_running_or_notify_cancel()
+            if leader:
+                break
+
+            self.shared += 1
+            try:
+                return await asyncio.wrap_future(future)
+            except _LeaderCancelled:
+                # The leader's session went away, one of the followers computes it instead
+                continue
+
+        try:
+            response, store = await compute()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            raise
+        # Failed calls are never cached, the next request tries again
+        if store:
+            self.put(key, response)
+        self._finish(key)
+        future.set_result(response)
+        return response
+
+    def _finish(self, key: str) -> None:
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def stats(self) -> dict:
+        """ Hit/miss/shared counters for this process plus the current number of stored responses. """
+        with self._lock:
+            size = self._size()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+        }
+
+# ────────────────────────────────────────────────────────────
+# STRUCTURED OUTPUT WRAPPER
+# ────────────────────────────────────────────────────────────
+class CachedStructuredLLM:
+    """ llm.with_structured_output(schema) whose responses are served from the cache when possible.
+
+    bypass (or no cache) always calls the model, for nodes whose answer must stay fresh.
+    runnable is a prebuilt structured runnable, otherwise one is built from llm on first use.
+    """
+
+    def __init__(
+        self,
+        llm,
+        schema: Type[BaseModel],
+        cache: Optional[LLMResponseCache] = None,
+        node: str = "",
+        bypass: bool = False,
+        method: str = "json_mode",
+        runnable=None,
+    ):
+        self.llm = llm
+        self.schema = schema
+        self.cache = cache
+        self.node = node
+        self.bypass = bypass
+        self.method = method
+        self._runnable = runnable
+
+    @property
+    def runnable(self):
+        if self._runnable is None:
+            self._runnable = self.llm.with_structured_output(self.schema, method=self.method)
+        return self._runnable
+
+    async def ainvoke(self, prompt: Any, **kwargs) -> BaseModel:
+        if self.cache is None or self.bypass:
+            return await self.runnable.ainvoke(prompt, **kwargs)
+
+        key = cache_key(
+            getattr(self.llm, "model_name", None) or getattr(self.llm, "model", ""),
+            getattr(self.llm, "temperature", None),
+            self.schema,
+            self.method,
+            prompt,
+        )
+
+        async def compute() -> Tuple[str, bool]:
+            # The key names the primary model, an answer from its fallback is not stored under it
+            tracked = getattr(self.runnable, "ainvoke_tracked", None)
+            if tracked is not None:
+                result, from_fallback = await tracked(prompt, **kwargs)
+            else:
+                result, from_fallback = await self.runnable.ainvoke(prompt, **kwargs), False
+            return result.model_dump_json(), not from_fallback
+
+        return self.schema.model_validate_json(await self.cache.get_or_compute(key, compute))
@@ -0,0 +1,270 @@
+""" Central registry of chat models: prebuilt structured runnables, pooled HTTP connections and per-provider limits. """
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from lazy_init import timed_import
+from llm_resilience import ProviderHealth, ResilientRunnable
+from rate_limiter import RateLimitScheduler, ScheduledRunnable
+
+# Per-provider limits in one place, LLM_<PROVIDER>_TIMEOUT / _MAX_CONCURRENCY / _MAX_CONNECTIONS / _RPM / _TPM override them.
+# failure_threshold consecutive errors open the provider's circuit for reset_seconds.
+# A provider with rpm/tpm goes through a RateLimitScheduler: set them to the limits of your account,
+# expected_output_tokens is reserved per request until the real usage is known (groq-logs.csv: median 124, p95 573).
+LLM_PROVIDERS: Dict[str, Dict[str, Any]] = {
+    "groq": {
+        "timeout": 60.0, "max_concurrency": 8, "max_connections": 16, "max_retries": 2,
+        "failure_threshold": 5, "reset_seconds": 30.0,
+        "rpm": 1000, "tpm": 300_000, "expected_output_tokens": 300,
+    },
+    "ollama": {
+        "timeout": 120.0, "max_concurrency": 2, "max_connections": 4,
+        "failure_threshold": 3, "reset_seconds": 60.0,
+    },
+}
+
+# Hedge a call once it runs longer than its provider's p95 (learned from the last calls, at least
+# LLM_HEDGE_MIN_SAMPLES of them, never before LLM_HEDGE_FLOOR seconds); LLM_FALLBACK=0 disables failover
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_FLOOR = float(os.getenv("LLM_HEDGE_FLOOR", "1.0"))
+LLM_FALLBACK = os.getenv("LLM_FALLBACK", "1") == "1"
+
+# The models the nodes use, by the name tooling exposes them under
+LLM_MODELS: Dict[str, Dict[str, Any]] = {
+    "llm": {"provider": "groq", "model": "qwen/qwen3-32b", "temperature": 0.1, "fallback": "llm_fallback"},
+    # qwen3:1.7b was also tested, but did not provide explanation in the retrieve information node
+    "llm_fallback": {"provider": "ollama", "model": "qwen3:4b", "temperature": 0.3, "base_url": "http://localhost:11434"},
+    "llm_tuned": {
+        "provider": "ollama", "model": "mistral7b-q4km:latest", "temperature": 0.5, "base_url": "http://localhost:11434",
+    },
+}
+
+def provider_config(provider: str) -> Dict[str, Any]:
+    config = dict(LLM_PROVIDERS[provider])
+    for key in ("timeout", "max_concurrency", "max_connections", "rpm", "tpm"):
+        value = os.getenv(f"LLM_{provider.upper()}_{key.upper()}")
+        if value and key in config:
+            config[key] = type(config[key])(value)
+    return config
+
+# ────────────────────────────────────────────────────────────
+# CONCURRENCY LIMIT
+# ────────────────────────────────────────────────────────────
+class ProviderLimiter:
+    """ At most max_concurrency calls in flight per provider, shared by every session's event loop. """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        with self._lock:
+            if self.active < self.max_concurrency:
+                self.active += 1
+                return
+            waiter = Future()
+            self._waiters.append(waiter)
+        await asyncio.wrap_future(waiter)
+
+    def release(self) -> None:
+        with self._lock:
+            # Hand the slot straight to the oldest waiter that is still waiting
+            while self._waiters:
+                waiter = self._waiters.pop(0)
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self.active -= 1
+
+    def throttled(self) -> bool:
+        """ Calls are waiting for a slot. """
+        with self._lock:
+            return bool(self._waiters)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+class LimitedRunnable:
+    """ A runnable whose async calls wait for a provider slot; other attributes are the runnable's. """
+
+    def __init__(self, runnable, limiter: ProviderLimiter):
+        self.runnable = runnable
+        self.limiter = limiter
+
+    async def ainvoke(self, *args, **kwargs):
+        return (await self.ainvoke_timed(*args, **kwargs))[0]
+
+    async def ainvoke_timed(self, *args, **kwargs) -> Tuple[Any, float]:
+        """ (result, seconds) where seconds leaves out the wait for a slot. """
+        async with self.limiter:
+            start = time.perf_counter()
+            result = await self.runnable.ainvoke(*args, **kwargs)
+            return result, time.perf_counter() - start
+
+    def throttled(self) -> bool:
+        return self.limiter.throttled()
+
+    async def astream(self, *args, **kwargs):
+        async with self.limiter:
+            async for chunk in self.runnable.astream(*args, **kwargs):
+                yield chunk
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.runnable, attr)
+
+# ────────────────────────────────────────────────────────────
+# REGISTRY
+# ────────────────────────────────────────────────────────────
+class LLMRegistry:
+    """ Builds every chat model and (model, schema) structured runnable once.
+
+    Async HTTP connections belong to the event loop that opened them, and every Streamlit
+    session runs its own loop, so models are kept per loop: each loop gets one keep-alive
+    pool per provider, reused by all its calls. The sync pool is shared process-wide.
+    """
+
+    def __init__(self, models: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.models = models or LLM_MODELS
+        self._lock = threading.RLock()
+        self._limiters: Dict[str, Any] = {}
+        self._health: Dict[str, ProviderHealth] = {}
+        self._sync_clients: Dict[str, Any] = {}
+        self._per_loop = weakref.WeakKeyDictionary()
+        self._no_loop: Dict[Tuple, Any] = {}
+
+    def _cache(self) -> Dict[Tuple, Any]:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._no_loop
+        with self._lock:
+            return self._per_loop.setdefault(loop, {})
+
+    def limiter(self, provider: str):
+        """ The provider's RateLimitScheduler when it has rpm/tpm limits, else its ProviderLimiter. """
+        with self._lock:
+            if provider not in self._limiters:
+                config = provider_config(provider)
+                if "rpm" in config:
+                    self._limiters[provider] = RateLimitScheduler(config["rpm"], config["tpm"], config["max_concurrency"])
+                else:
+                    self._limiters[provider] = ProviderLimiter(config["max_concurrency"])
+            return self._limiters[provider]
+
+    def _gate(self, name: str, runnable):
+        """ runnable behind its provider's scheduler or concurrency limit. """
+        provider = self.models[name]["provider"]
+        limiter = self.limiter(provider)
+        if isinstance(limiter, RateLimitScheduler):
+            config = provider_config(provider)
+            return ScheduledRunnable(runnable, limiter, config["expected_output_tokens"], config.get("max_retries", 2))
+        return LimitedRunnable(runnable, limiter)
+
+    def health(self, provider: str) -> ProviderHealth:
+        """ Latency statistics and circuit breaker of a provider, shared process-wide. """
+        with self._lock:
+            if provider not in self._health:
+                config = provider_config(provider)
+                self._health[provider] = ProviderHealth(config["failure_threshold"], config["reset_seconds"])
+            return self._health[provider]
+
+    def health_report(self) -> Dict[str, Dict[str, Any]]:
+        """ Per-provider latency percentiles, hedge/failover counters, circuit state and rate limit scheduling. """
+        with self._lock:
+            health = dict(self._health)
+            schedulers = {p: l for p, l in self._limiters.items() if isinstance(l, RateLimitScheduler)}
+        report = {p: {**h.latency.stats(), "circuit": h.breaker.state} for p, h in health.items()}
+        for provider, scheduler in schedulers.items():
+            report.setdefault(provider, {})["rate_limit"] = scheduler.stats()
+        return report
+
+    def _resilient(self, name: str, build) -> ResilientRunnable:
+        """ build(model name) behind its provider limit, hedged, failing over to the model's fallback. """
+        spec = self.models[name]
+        fallback = spec.get("fallback") if LLM_FALLBACK else None
+        return ResilientRunnable(
+            self._gate(name, build(name)),
+            self.health(spec["provider"]),
+            fallback=self._gate(fallback, build(fallback)) if fallback else None,
+            fallback_health=self.health(self.models[fallback]["provider"]) if fallback else None,
+            hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+            hedge_floor=LLM_HEDGE_FLOOR,
+        )
+
+    def _limits(self, config: Dict[str, Any]):
+        httpx = timed_import("httpx")
+        n = config["max_connections"]
+        return httpx.Limits(max_connections=n, max_keepalive_connections=n, keepalive_expiry=30.0)
+
+    def _sync_client(self, provider: str):
+        with self._lock:
+            if provider not in self._sync_clients:
+                config = provider_config(provider)
+                httpx = timed_import("httpx")
+                self._sync_clients[provider] = httpx.Client(timeout=config["timeout"], limits=self._limits(config))
+            return self._sync_clients[provider]
+
+    def _build_chat(self, name: str):
+        spec = self.models[name]
+        config = provider_config(spec["provider"])
+        if spec["provider"] == "groq":
+            httpx = timed_import("httpx")
+            ChatGroq = timed_import("langchain_groq").ChatGroq
+            return ChatGroq(
+                model_name=spec["model"],
+                temperature=spec["temperature"],
+                request_timeout=config["timeout"],
+                # 429s are retried by the rate limit scheduler, which has to see them to back off
+                max_retries=0 if "rpm" in config else config.get("max_retries", 2),
+                http_client=self._sync_client("groq"),
+                http_async_client=httpx.AsyncClient(timeout=config["timeout"], limits=self._limits(config)),
+            )
+        if spec["provider"] == "ollama":
+            ChatOllama = timed_import("langchain_ollama").ChatOllama
+            return ChatOllama(
+                model=spec["model"],
+                temperature=spec["temperature"],
+                base_url=spec.get("base_url"),
+                client_kwargs={"timeout": config["timeout"], "limits": self._limits(config)},
+            )
+        raise ValueError(f"Unknown LLM provider {spec['provider']!r}, expected one of {list(LLM_PROVIDERS)}")
+
+    def chat(self, name: str):
+        """ The chat model called name, built once per event loop. """
+        cache = self._cache()
+        key = ("chat", name)
+        with self._lock:
+            if key not in cache:
+                cache[key] = self._build_chat(name)
+            return cache[key]
+
+    def limited(self, name: str) -> ResilientRunnable:
+        """ The chat model called name behind its provider's rate limits, with hedging and failover. """
+        cache = self._cache()
+        key = ("limited", name)
+        with self._lock:
+            if key not in cache:
+                cache[key] = self._resilient(name, self.chat)
+            return cache[key]
+
+    def structured(self, name: str, schema, method: str = "json_mode") -> ResilientRunnable:
+        """ chat(name).with_structured_output(schema), built once, behind the provider's rate limits, with hedging and failover. """
+        cache = self._cache()
+        key = ("structured", name, schema, method)
+        with self._lock:
+            if key not in cache:
+                cache[key] = self._resilient(name, lambda n: self.chat(n).with_structured_output(schema, method=method))
+            return cache[key]
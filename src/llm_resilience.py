@@ -0,0 +1,260 @@
+""" Hedged requests, circuit breaking and failover for LLM calls, driven by per-provider latency statistics. """
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+# ────────────────────────────────────────────────────────────
+# LATENCY STATISTICS
+# ────────────────────────────────────────────────────────────
+class LatencyStats:
+    """ Latencies of the last window successful calls of one provider, plus error counters. """
+
+    def __init__(self, window: int = 200):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(seconds)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+
+    def count(self, counter: str) -> None:
+        """ Increment hedges, hedge_wins or failovers. """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """ q-th percentile of the recent latencies, None with fewer than min_samples. """
+        with self._lock:
+            if len(self.latencies) < max(1, min_samples):
+                return None
+            return _percentile(list(self.latencies), q)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = list(self.latencies)
+            counters = {
+                "calls": self.calls, "errors": self.errors, "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins, "failovers": self.failovers,
+            }
+        if latencies:
+            counters["p50_s"] = round(_percentile(latencies, 50), 3)
+            counters["p95_s"] = round(_percentile(latencies, 95), 3)
+        return counters
+
+# ────────────────────────────────────────────────────────────
+# CIRCUIT BREAKER
+# ────────────────────────────────────────────────────────────
+class CircuitOpenError(RuntimeError):
+    pass
+
+class CircuitBreaker:
+    """ Open after failure_threshold consecutive errors, let one trial call through after reset_seconds. """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial:
+                return False
+            # Half-open: a single trial call decides whether the circuit closes again
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def cancel_trial(self) -> None:
+        """ A cancelled call says nothing about the provider: let the next call be the trial. """
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+# ────────────────────────────────────────────────────────────
+# RESILIENT RUNNABLE
+# ────────────────────────────────────────────────────────────
+class ProviderHealth:
+    """ Latency statistics and circuit breaker of one provider, shared by all its runnables. """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, window: int = 200):
+        self.latency = LatencyStats(window)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+
+class ResilientRunnable:
+    """ Call primary, hedge it once it runs longer than its provider's p95, fail over to fallback.
+
+    A hedge is a duplicate of the primary request started at the p95 latency (once
+    hedge_min_samples calls were measured, never before hedge_floor seconds); the first
+    answer wins and the other request is cancelled. While the primary's circuit is open,
+    or when the primary fails, the fallback answers instead.
+
+    primary and fallback may be gated runnables (LimitedRunnable, ScheduledRunnable):
+    their ainvoke_timed() reports the provider time without the wait for a slot, no
+    hedge is sent while throttled() says the gate is queueing, and errors for which
+    is_throttled_error() holds (429s) do not count against the provider's health.
+    """
+
+    def __init__(
+        self,
+        primary,
+        health: ProviderHealth,
+        fallback=None,
+        fallback_health: Optional[ProviderHealth] = None,
+        hedge_min_samples: int = 20,
+        hedge_floor: float = 1.0,
+    ):
+        self.primary = primary
+        self.health = health
+        self.fallback = fallback
+        self.fallback_health = fallback_health
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_floor = hedge_floor
+
+    async def _timed(self, runnable, health: ProviderHealth, *args, **kwargs):
+        timed = getattr(runnable, "ainvoke_timed", None)
+        start = time.perf_counter()
+        try:
+            if timed is not None:
+                result, seconds = await timed(*args, **kwargs)
+            else:
+                result = await runnable.ainvoke(*args, **kwargs)
+                seconds = time.perf_counter() - start
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_error(runnable, health, e)
+            raise
+        health.latency.record(seconds)
+        health.breaker.record_success()
+        return result
+
+    @staticmethod
+    def _record_error(runnable, health: ProviderHealth, error: Exception) -> None:
+        is_throttled_error = getattr(runnable, "is_throttled_error", None)
+        if is_throttled_error is not None and is_throttled_error(error):
+            # Rate limited: says nothing about the provider's health
+            health.breaker.cancel_trial()
+            return
+        health.latency.record_error()
+        health.breaker.record_failure()
+
+    def _throttled(self) -> bool:
+        throttled = getattr(self.primary, "throttled", None)
+        return throttled is not None and throttled()
+
+    async def _hedged(self, *args, **kwargs):
+        first = asyncio.ensure_future(self._timed(self.primary, self.health, *args, **kwargs))
+        tasks = {first}
+        try:
+            p95 = self.health.latency.percentile(95, self.hedge_min_samples)
+            if p95 is None:
+                return await first
+
+            done, _ = await asyncio.wait({first}, timeout=max(p95, self.hedge_floor))
+            if done:
+                return first.result()
+            if self._throttled():
+                # A duplicate would only queue behind the rate limit and add to the load
+                return await first
+
+            # The duplicate runs without the caller's callbacks, so streamed tokens stay those of one request
+            self.health.latency.count("hedges")
+            hedge_kwargs = {**kwargs, "config": {**(kwargs.get("config") or {}), "callbacks": []}}
+            second = asyncio.ensure_future(self._timed(self.primary, self.health, *args, **hedge_kwargs))
+            tasks.add(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.health.latency.count("hedge_wins")
+                        return task.result()
+            # Both failed, report the original request's error
+            return first.result()
+        finally:
+            # Also when the caller is cancelled: no request outlives it
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def ainvoke(self, *args, **kwargs):
+        return (await self.ainvoke_tracked(*args, **kwargs))[0]
+
+    async def ainvoke_tracked(self, *args, **kwargs) -> Tuple[Any, bool]:
+        """ (result, whether the fallback answered), e.g. to keep fallback answers out of a cache. """
+        if self.health.breaker.allow():
+            try:
+                return await self._hedged(*args, **kwargs), False
+            except asyncio.CancelledError:
+                self.health.breaker.cancel_trial()
+                raise
+            except Exception as e:
+                if self.fallback is None:
+                    raise
+                print("LLM primary failed, failing over:", repr(e))
+        elif self.fallback is None:
+            raise CircuitOpenError("LLM provider circuit is open after repeated errors")
+
+        self.health.latency.count("failovers")
+        return await self._timed(self.fallback, self.fallback_health, *args, **kwargs), True
+
+    async def astream(self, *args, **kwargs):
+        # Streams are not hedged, the fallback only takes over while the primary's circuit is open
+        use_primary = self.health.breaker.allow() or self.fallback is None
+        runnable, health = (self.primary, self.health) if use_primary else (self.fallback, self.fallback_health)
+        try:
+            async for chunk in runnable.astream(*args, **kwargs):
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            health.breaker.cancel_trial()
+            raise
+        except Exception as e:
+            self._record_error(runnable, health, e)
+            raise
+        health.breaker.record_success()
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.primary, attr)
@@ -0,0 +1,221 @@
+""" Precomputed id lists per metadata value (year, organisation, rating) for filtered vector search. """
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from metadata_schema import MetadataFilter
+
+METADATA_FILE = "metadata.sqlite"
+ORG_REGIONS_FILE = "org_regions.json"
+
+YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+# Fact-checks are usually published after the claim, so a claim period also matches the next year
+PUBLICATION_LAG_YEARS = 1
+
+# Distinct filters whose candidate sets each MetadataIndex keeps
+CANDIDATE_CACHE_SIZE = 256
+
+# ────────────────────────────────────────────────────────────
+# FILTER VALUES
+# ────────────────────────────────────────────────────────────
+def _norm(value: str) -> str:
+    return " ".join(str(value or "").casefold().split())
+
+def metadata_values(metadata: dict) -> Dict[str, str]:
+    """ The filterable values of one document, normalized like the filters. """
+    year = YEAR_RE.search(str(metadata.get("date_published", "")))
+    return {
+        "year": year.group(1) if year else "",
+        "organisation": _norm(metadata.get("organisation", "")),
+        "rating": _norm(metadata.get("rating") or metadata.get("verdict") or ""),
+    }
+
+def years_from_time_period(time_period: str) -> List[int]:
+    """ '2019', 'between 2018 and 2020' or '2020-2021' to the list of matching publication years. """
+    years = sorted(int(y) for y in YEAR_RE.findall(time_period or ""))
+    if not years:
+        return []
+    return list(range(years[0], years[-1] + PUBLICATION_LAG_YEARS + 1))
+
+# ────────────────────────────────────────────────────────────
+# BUILD / APPEND
+# ────────────────────────────────────────────────────────────
+def add_to_metadata_index(path: str, docs: Iterable[Tuple[int, dict]]) -> int:
+    """ Append (position, metadata) documents to the id lists at path, creating it if needed. """
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS postings ("
+        " field TEXT NOT NULL, value TEXT NOT NULL, ids BLOB NOT NULL,"
+        " PRIMARY KEY (field, value))"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    new_ids: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    count = 0
+    for position, metadata in docs:
+        count += 1
+        for field, value in metadata_values(metadata).items():
+            if value:
+                new_ids[(field, value)].append(int(position))
+
+    with conn:
+        for (field, value), ids in new_ids.items():
+            row = conn.execute("SELECT ids FROM postings WHERE field = ? AND value = ?", (field, value)).fetchone()
+            merged = np.asarray(ids, dtype=np.int64)
+            if row is not None:
+                merged = np.concatenate([np.frombuffer(row[0], dtype=np.int64), merged])
+            conn.execute(
+                "INSERT OR REPLACE INTO postings (field, value, ids) VALUES (?, ?, ?)",
+                (field, value, merged.tobytes()),
+            )
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('n_docs', ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (count,),
+        )
+    conn.close()
+    return count
+
+def metadata_doc_count(path: str) -> int:
+    """ Number of documents in the metadata index, 0 if it does not exist. """
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    row = conn.execute("SELECT value FROM meta WHERE key = 'n_docs'").fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def build_metadata_index_from_docstore(docstore_path: str, out_path: str, batch_size: int = 10_000) -> int:
+    """ (Re)build the metadata id lists from every document in a SQLite docstore. """
+    if os.path.exists(out_path):
+        os.remove(out_path)
+
+    source = sqlite3.connect(f"file:{docstore_path}?mode=ro", uri=True)
+    cursor = source.execute("SELECT position, metadata FROM docs ORDER BY position")
+    total = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        total += add_to_metadata_index(out_path, ((p, json.loads(m)) for p, m in rows))
+    source.close()
+    return total
+
+# ────────────────────────────────────────────────────────────
+# QUERY
+# ────────────────────────────────────────────────────────────
+class MetadataIndex:
+    """ In-memory id lists per metadata value, combined into candidate sets and FAISS selectors. """
+
+    def __init__(self, path: str, org_regions: Optional[Dict[str, List[str]]] = None):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self.postings: Dict[str, Dict[str, np.ndarray]] = defaultdict(dict)
+        for field, value, ids in conn.execute("SELECT field, value, ids FROM postings"):
+            self.postings[field][value] = np.frombuffer(ids, dtype=np.int64)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'n_docs'").fetchone()
+        self.n_docs = row[0] if row else 0
+        conn.close()
+
+        # Optional organisation -> regions/countries map, the only way geography can scope the corpus
+        self.org_regions = {_norm(o): [_norm(r) for r in regions] for o, regions in (org_regions or {}).items()}
+
+        # Candidate sets per normalised filter, kept per instance so a retired index version can be freed.
+        # Their packed bitmaps (by id() of the cached array) live and are evicted with them
+        self._candidates: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._bitmaps: Dict[int, Tuple[np.ndarray, int, np.ndarray]] = {}
+        self._candidates_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, folder: str) -> Optional["MetadataIndex"]:
+        """ Load metadata.sqlite (+ org_regions.json) from an index folder, None if it was not built. """
+        path = os.path.join(folder, METADATA_FILE)
+        if not os.path.exists(path):
+            return None
+        regions_path = os.path.join(folder, ORG_REGIONS_FILE)
+        org_regions = None
+        if os.path.exists(regions_path):
+            with open(regions_path, encoding="utf-8") as f:
+                org_regions = json.load(f)
+        return cls(path, org_regions)
+
+    def filter_from_claim(self, time_period: str = "", geography: str = "") -> MetadataFilter:
+        """ A soft filter from DetailsClaim.time_period and .geography. """
+        organisations = []
+        geo = _norm(geography)
+        if geo and self.org_regions:
+            geo_tokens = set(re.findall(r"\w+", geo))
+            organisations = [
+                org for org, regions in self.org_regions.items()
+                if any(r in geo or r in geo_tokens for r in regions)
+            ]
+        return MetadataFilter(years=years_from_time_period(time_period), organisations=organisations)
+
+    def candidate_ids(self, flt: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """ Sorted ids matching the filter: OR within a field, AND across fields. None means no filter. """
+        if flt is None or flt.is_empty():
+            return None
+        key = (
+            tuple(sorted(str(y) for y in flt.years)),
+            tuple(sorted(_norm(o) for o in flt.organisations)),
+            tuple(sorted(_norm(r) for r in flt.ratings)),
+        )
+        with self._candidates_lock:
+            if key in self._candidates:
+                self._candidates.move_to_end(key)
+                return self._candidates[key]
+
+        result = self._candidate_ids(*key)
+        with self._candidates_lock:
+            self._candidates[key] = result
+            while len(self._candidates) > CANDIDATE_CACHE_SIZE:
+                _, evicted = self._candidates.popitem(last=False)
+                self._bitmaps.pop(id(evicted), None)
+        return result
+
+    def bitmap(self, ids: np.ndarray, n_total: int) -> np.ndarray:
+        """ id_bitmap of a candidate set, built once per set while candidate_ids keeps it cached. """
+        with self._candidates_lock:
+            cached = self._bitmaps.get(id(ids))
+        if cached is not None and cached[0] is ids and cached[1] == n_total:
+            return cached[2]
+
+        bitmap = id_bitmap(ids, n_total)
+        bitmap.flags.writeable = False
+        with self._candidates_lock:
+            # Only sets still in the LRU, anything else would never be evicted
+            if any(cached_ids is ids for cached_ids in self._candidates.values()):
+                self._bitmaps[id(ids)] = (ids, n_total, bitmap)
+        return bitmap
+
+    def _candidate_ids(self, years: Tuple[str, ...], organisations: Tuple[str, ...], ratings: Tuple[str, ...]) -> np.ndarray:
+        result = None
+        for field, values in (("year", years), ("organisation", organisations), ("rating", ratings)):
+            if not values:
+                continue
+            lists = [self.postings[field].get(v) for v in values]
+            ids = np.unique(np.concatenate([l for l in lists if l is not None] or [np.empty(0, dtype=np.int64)]))
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+        result.flags.writeable = False
+        return result
+
+# ────────────────────────────────────────────────────────────
+# FAISS SELECTOR
+# ────────────────────────────────────────────────────────────
+def id_bitmap(ids: np.ndarray, n_total: int) -> np.ndarray:
+    """ Bit i set when id i is a candidate, the layout faiss.IDSelectorBitmap reads. """
+    mask = np.zeros(n_total, dtype=bool)
+    mask[ids[ids < n_total]] = True
+    return np.packbits(mask, bitorder="little")
+
+def bitmap_selector(bitmap: np.ndarray):
+    """ IDSelectorBitmap over a packed bitmap. The caller keeps bitmap alive while searching. """
+    return faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
@@ -0,0 +1,14 @@
+""" The metadata filter model, importable without FAISS (src/metadata_filter.py builds and searches the id lists). """
+
+from typing import List
+
+from pydantic import BaseModel, Field
+
+class MetadataFilter(BaseModel):
+    years: List[int] = Field(default_factory=list, description="Publication years to keep")
+    organisations: List[str] = Field(default_factory=list, description="Fact-checking organisations to keep")
+    ratings: List[str] = Field(default_factory=list, description="Ratings / verdicts to keep")
+    strict: bool = Field(False, description="If False, an empty filtered result falls back to unfiltered search")
+
+    def is_empty(self) -> bool:
+        return not (self.years or self.organisations or self.ratings)
@@ -0,0 +1,106 @@
+""" Coalesce retrieval requests from concurrent sessions into one batched encode and search. """
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, List, Sequence, Tuple
+
+# (queries, keyword arguments) of one retrieve_batch call
+Request = Tuple[List[str], dict]
+
+class MicroBatcher:
+    """ Collect requests for up to max_wait_ms and process them together on one worker thread.
+
+    process_batch receives a list of requests and returns one result per request; an exception
+    instance as a result fails only that request. A batch is dispatched once max_batch_size
+    queries are waiting or max_wait_ms after its first request. submit() returns a concurrent
+    Future, so callers on any thread or event loop can wait on it. The queue holds at most
+    max_queue requests, submit() raises RuntimeError when it stays full (at once with block=False).
+    Cancelling a returned future before its batch starts drops the request.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[Sequence[Request]], List[Any]],
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 64,
+        max_queue: int = 256,
+        submit_timeout: float = 5.0,
+    ):
+        self.process_batch = process_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.submit_timeout = submit_timeout
+        self._queue: "queue.Queue[Tuple[Request, Future]]" = queue.Queue(maxsize=max_queue)
+
+        # Histograms: queue depth seen by each arriving request, and queries per dispatched batch
+        self.queue_depths: Counter = Counter()
+        self.batch_sizes: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def submit(self, queries: List[str], block: bool = True, **kwargs) -> Future:
+        future: Future = Future()
+        with self._stats_lock:
+            self.queue_depths[self._queue.qsize()] += 1
+        try:
+            self._queue.put(((list(queries), kwargs), future), block=block, timeout=self.submit_timeout)
+        except queue.Full:
+            raise RuntimeError("Retrieval queue is full, try again later") from None
+        return future
+
+    def _collect(self) -> List[Tuple[Request, Future]]:
+        batch = [self._queue.get()]
+        n_queries = len(batch[0][0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n_queries < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_queries += len(item[0][0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # Requests whose caller already gave up (e.g. a cancelled wrap_future) are dropped,
+            # the others can no longer be cancelled once they are marked running
+            batch = [(request, future) for request, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self._stats_lock:
+                self.batch_sizes[sum(len(request[0]) for request, _ in batch)] += 1
+
+            try:
+                results = self.process_batch([request for request, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                self._deliver(future, result)
+
+    @staticmethod
+    def _deliver(future: Future, result: Any) -> None:
+        """ Resolve one caller's future, a future in a bad state must not end the worker loop. """
+        try:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def stats(self) -> dict:
+        """ Queue-depth and batch-size histograms as {value: count}, sorted by value. """
+        with self._stats_lock:
+            return {
+                "queue_depth": dict(sorted(self.queue_depths.items())),
+                "batch_size": dict(sorted(self.batch_sizes.items())),
+                "pending": self._queue.qsize(),
+            }
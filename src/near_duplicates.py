@@ -0,0 +1,132 @@
+""" MinHash / LSH clustering of near-duplicate documents, the cluster id is stored in the docstore metadata. """
+
+import hashlib
+import os
+import sqlite3
+import zlib
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from bm25 import tokenize
+from exact_match import CLAIM_LINE_RE, claim_line
+
+NEAR_DUP_FILE = "near_duplicates.sqlite"
+
+# 64 hash functions in 8 bands of 8 rows: pairs above ~0.77 Jaccard similarity (word 3-grams) share a band
+NUM_PERM = 64
+BANDS = 8
+SHINGLE_SIZE = 3
+
+# Universal hashing (a * x + b) mod p with the Mersenne prime 2^31 - 1: x, a and b are below p,
+# so a * x + b < 2^62 never overflows uint64. Fixed seed so builds and ingests agree.
+_PRIME = np.uint64(2**31 - 1)
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 2**31 - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 2**31 - 1, size=NUM_PERM, dtype=np.uint64)
+
+# Stored in the LSH tables, clusters signed with another version are rebuilt instead of appended to
+SIGNATURE_VERSION = 3
+
+def minhash_signature(text: str) -> np.ndarray:
+    """ NUM_PERM minimum hash values over the word shingles of text. """
+    tokens = tokenize(text)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((np.outer(hashes % _PRIME, _A) + _B) % _PRIME).min(axis=0)
+
+def signed_text(page_content: str) -> str:
+    """ The claim of a fact-check page, the Title / Author / Verdict lines would make every page alike.
+
+    Chunks without a claim line are signed on their own text. A page whose claim line is
+    empty gives "", it has nothing to compare and is not clustered.
+    """
+    if CLAIM_LINE_RE.search(page_content or "") is None:
+        return page_content
+    return claim_line(page_content)
+
+def band_keys(signature: np.ndarray) -> List[bytes]:
+    rows = NUM_PERM // BANDS
+    return [hashlib.blake2b(signature[b * rows:(b + 1) * rows].tobytes(), digest_size=8).digest() for b in range(BANDS)]
+
+# ────────────────────────────────────────────────────────────
+# BUILD / APPEND
+# ────────────────────────────────────────────────────────────
+def add_to_near_duplicates(path: str, docstore_path: str, docs: Iterable[Tuple[int, str]]) -> int:
+    """ Cluster (position, page_content) documents against everything in path and store their cluster ids.
+
+    A document joins the cluster of the first earlier document it shares an LSH band with,
+    otherwise it starts a cluster named after its own position. The id is written to the
+    LSH tables and to the 'cluster_id' field of the document metadata in the docstore.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS bands ("
+        " band INTEGER NOT NULL, key BLOB NOT NULL, cluster INTEGER NOT NULL,"
+        " PRIMARY KEY (band, key))"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS clusters (position INTEGER PRIMARY KEY, cluster INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('signature_version', ?)", (SIGNATURE_VERSION,))
+
+    assignments = []
+    with conn:
+        for position, text in docs:
+            signed = signed_text(text)
+            if not tokenize(signed):
+                # No shingles to compare, the document is its own cluster
+                assignments.append((int(position), int(position)))
+                continue
+            keys = band_keys(minhash_signature(signed))
+            matches = [
+                row[0] for row in (
+                    conn.execute("SELECT cluster FROM bands WHERE band = ? AND key = ?", (b, key)).fetchone()
+                    for b, key in enumerate(keys)
+                ) if row is not None
+            ]
+            cluster = min(matches) if matches else int(position)
+            conn.executemany(
+                "INSERT OR IGNORE INTO bands (band, key, cluster) VALUES (?, ?, ?)",
+                [(b, key, cluster) for b, key in enumerate(keys)],
+            )
+            assignments.append((cluster, int(position)))
+        conn.executemany("INSERT OR REPLACE INTO clusters (cluster, position) VALUES (?, ?)", assignments)
+    conn.close()
+
+    store = sqlite3.connect(docstore_path)
+    with store:
+        store.executemany(
+            "UPDATE docs SET metadata = json_set(metadata, '$.cluster_id', ?) WHERE position = ?", assignments
+        )
+    store.close()
+    return len(assignments)
+
+def near_duplicate_doc_count(path: str) -> int:
+    """ Number of clustered documents, 0 if the file does not exist or was signed with another version. """
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    has_meta = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta'").fetchone()
+    version = has_meta and conn.execute("SELECT value FROM meta WHERE key = 'signature_version'").fetchone()
+    count = conn.execute("SELECT COUNT(*) FROM clusters").fetchone()[0] if version and version[0] == SIGNATURE_VERSION else 0
+    conn.close()
+    return count
+
+def build_near_duplicates_from_docstore(docstore_path: str, out_path: str, batch_size: int = 10_000) -> int:
+    """ (Re)cluster every document in a SQLite docstore. """
+    if os.path.exists(out_path):
+        os.remove(out_path)
+
+    # Read in keyed pages, an open cursor would hold a read lock while the cluster ids are written
+    source = sqlite3.connect(f"file:{docstore_path}?mode=ro", uri=True)
+    total, after = 0, -1
+    while True:
+        rows = source.execute(
+            "SELECT position, page_content FROM docs WHERE position > ? ORDER BY position LIMIT ?", (after, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        total += add_to_near_duplicates(out_path, docstore_path, rows)
+        after = rows[-1][0]
+    source.close()
+    return total
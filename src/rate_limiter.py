@@ -0,0 +1,281 @@
+""" Process-wide request scheduler for a rate-limited provider: RPM/TPM token buckets, fair per-session queues and AIMD concurrency. """
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from llm_cache import prompt_text
+
+CHARS_PER_TOKEN = 4          # rough size of a token for English prompts, the bucket is corrected with the real usage when known
+DEFAULT_RETRY_AFTER = 1.0    # seconds to pause after a 429 without a Retry-After header
+
+# ────────────────────────────────────────────────────────────
+# TOKEN ESTIMATES AND RESPONSES
+# ────────────────────────────────────────────────────────────
+def estimate_tokens(prompt: Any) -> int:
+    """ Input tokens of a prompt string or message list, estimated before sending. """
+    return len(prompt_text(prompt)) // CHARS_PER_TOKEN + 1
+
+def used_tokens(result: Any) -> Optional[int]:
+    """ Total tokens reported by the provider, None when the result carries no usage (structured output). """
+    usage = getattr(result, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+def rate_limit_retry_after(error: Exception) -> Optional[float]:
+    """ Seconds to wait for a 429 error (its Retry-After header), None for any other error. """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", DEFAULT_RETRY_AFTER))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+# ────────────────────────────────────────────────────────────
+# SCHEDULER
+# ────────────────────────────────────────────────────────────
+class TokenBucket:
+    """ per_minute units, refilled continuously. Not thread-safe, the scheduler's lock guards it. """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """ Seconds until amount can be taken (a request larger than the bucket waits for a full one). """
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """ Correct an earlier take by amount (negative refunds), the level may go into debt. """
+        self.level = min(self.capacity, self.level - amount)
+
+class RateLimitScheduler:
+    """ Grant requests to one provider so that its RPM and TPM limits hold across all sessions.
+
+    Every session (event loop) has its own queue and sessions take turns, so one busy
+    session cannot starve the others. The head request waits until both buckets can
+    pay for it: one request and its estimated tokens. The number of requests in flight
+    follows AIMD: +1 per window of successes, halved on a 429, after which nothing is
+    sent until Retry-After has passed.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int, min_concurrency: int = 1):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max_concurrency)
+        self.active = 0
+        self.paused_until = 0.0
+        self.granted = 0
+        self.rate_limited = 0
+        self.waited_s = 0.0
+        self._queues: "OrderedDict[Any, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._wake_at: Optional[float] = None
+
+    async def acquire(self, tokens: int, session: Any) -> None:
+        """ Wait until the request may be sent, then the caller must call release() exactly once. """
+        future = Future()
+        with self._lock:
+            self._queues.setdefault(session, deque()).append((future, tokens, time.monotonic()))
+            self._dispatch()
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = future.done() and not future.cancelled()
+                if not granted:
+                    self._drop(session, future)
+            # Granted just as the caller was cancelled (e.g. a losing hedge): nothing was sent, give it back
+            if granted:
+                self.release(tokens, used=0, refund_request=True)
+            raise
+
+    def release(
+        self,
+        tokens: int,
+        used: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        failed: bool = False,
+        refund_request: bool = False,
+    ) -> None:
+        """ Finish a granted request: correct the token estimate with the real usage and adapt concurrency. """
+        now = time.monotonic()
+        with self._lock:
+            self.active -= 1
+            if used is not None:
+                self.tokens.adjust(used - tokens)
+            if refund_request:
+                self.requests.adjust(-1)
+            if retry_after is not None:
+                self.rate_limited += 1
+                # One burst of 429s halves the window once, not once per rejected request
+                if now >= self.paused_until:
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                self.paused_until = max(self.paused_until, now + retry_after)
+            elif not failed and not refund_request:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._dispatch()
+
+    def throttled(self) -> bool:
+        """ Requests are queued or sending is paused after a 429. """
+        with self._lock:
+            return bool(self._queues) or time.monotonic() < self.paused_until
+
+    def _drop(self, session: Any, future: Future) -> None:
+        """ Remove a cancelled request from its queue, so it does not hold up the line. Called with the lock held. """
+        queue = self._queues.get(session)
+        if queue is None:
+            return
+        for entry in queue:
+            if entry[0] is future:
+                queue.remove(entry)
+                break
+        if not queue:
+            del self._queues[session]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """ Grant queued requests while a slot and both buckets allow it. Called with the lock held. """
+        now = time.monotonic()
+        while self._queues and self.active < int(self.concurrency):
+            if now < self.paused_until:
+                self._wake(self.paused_until)
+                return
+
+            session, queue = next(iter(self._queues.items()))
+            future, tokens, queued_at = queue[0]
+            if not future.cancelled():
+                # Strictly the head of the line, a large request is not overtaken by smaller ones
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if wait > 0:
+                    self._wake(now + wait)
+                    return
+
+            # Round robin: this session goes to the back of the line
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.active += 1
+            self.granted += 1
+            self.waited_s += now - queued_at
+            future.set_result(None)
+
+    def _wake(self, at: float) -> None:
+        """ Dispatch again at monotonic time at, unless an earlier wake-up is already set. """
+        if self._wake_at is not None and self._wake_at <= at:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._wake_at = at
+        self._timer = threading.Timer(max(0.0, at - time.monotonic()), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._wake_at = None
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency": round(self.concurrency, 2),
+                "active": self.active,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "sessions_waiting": len(self._queues),
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "mean_wait_s": round(self.waited_s / self.granted, 3) if self.granted else 0.0,
+                "request_bucket": round(self.requests.level, 1),
+                "token_bucket": round(self.tokens.level, 1),
+            }
+
+class ScheduledRunnable:
+    """ A runnable whose async calls are granted by a RateLimitScheduler; 429s are retried through it.
+
+    The session is the caller's event loop, one per Streamlit session.
+    """
+
+    def __init__(self, runnable, scheduler: RateLimitScheduler, expected_output_tokens: int = 300, max_retries: int = 2):
+        self.runnable = runnable
+        self.scheduler = scheduler
+        self.expected_output_tokens = expected_output_tokens
+        self.max_retries = max_retries
+
+    def _estimate(self, prompt: Any) -> int:
+        return estimate_tokens(prompt) + self.expected_output_tokens
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs):
+        return (await self.ainvoke_timed(prompt, *args, **kwargs))[0]
+
+    async def ainvoke_timed(self, prompt: Any, *args, **kwargs) -> Tuple[Any, float]:
+        """ (result, seconds) where seconds is the granted call only, without queueing or 429 retries. """
+        tokens = self._estimate(prompt)
+        session = id(asyncio.get_running_loop())
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.acquire(tokens, session)
+            start = time.perf_counter()
+            try:
+                result = await self.runnable.ainvoke(prompt, *args, **kwargs)
+            except asyncio.CancelledError:
+                self.scheduler.release(tokens, failed=True)
+                raise
+            except Exception as e:
+                retry_after = rate_limit_retry_after(e)
+                self.scheduler.release(tokens, retry_after=retry_after, failed=retry_after is None)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                continue
+            seconds = time.perf_counter() - start
+            self.scheduler.release(tokens, used=used_tokens(result))
+            return result, seconds
+
+    def throttled(self) -> bool:
+        return self.scheduler.throttled()
+
+    @staticmethod
+    def is_throttled_error(error: Exception) -> bool:
+        return rate_limit_retry_after(error) is not None
+
+    async def astream(self, prompt: Any, *args, **kwargs):
+        tokens = self._estimate(prompt)
+        await self.scheduler.acquire(tokens, id(asyncio.get_running_loop()))
+        used = None
+        try:
+            async for chunk in self.runnable.astream(prompt, *args, **kwargs):
+                used = used_tokens(chunk) or used
+                yield chunk
+        except BaseException as e:
+            retry_after = rate_limit_retry_after(e) if isinstance(e, Exception) else None
+            self.scheduler.release(tokens, retry_after=retry_after, failed=retry_after is None)
+            raise
+        self.scheduler.release(tokens, used=used)
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.runnable, attr)
@@ -0,0 +1,118 @@
+""" Cross-encoder re-ranking of retrieved claims under a fixed latency budget. """
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Pairs scored before any latency estimate exists, small enough to stay inside the budget
+FIRST_BATCH_SIZE = 4
+
+# A retrieved chunk is about 700 characters, the warm-up pairs are that long
+WARM_UP_TEXT = " ".join(["fact-check"] * 70)
+
+def _key(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+class CrossEncoderReranker:
+    """ Score (claim, candidate) pairs in batches on CPU and keep the top-N.
+
+    Scores are cached per (claim, candidate). Scoring stops before a batch that would
+    push the call past budget_ms; candidates left unscored keep their retrieval order
+    behind the scored ones, so the stage degrades to plain retrieval instead of stalling.
+    The cost per pair is seeded by a warm-up batch at load time; without it the first
+    batch is capped at FIRST_BATCH_SIZE pairs.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        budget_ms: float = 150.0,
+        batch_size: int = 16,
+        cache_size: int = 20_000,
+        device: str = "cpu",
+        warm_up: bool = True,
+    ):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device=device, max_length=512)
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Running estimate of the cost of one pair, learned from every batch
+        self._ms_per_pair: Optional[float] = None
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self) -> None:
+        """ Score one full batch of chunk-sized pairs twice, the second (warm) run seeds the cost per pair. """
+        pairs = [("warm up", WARM_UP_TEXT)] * self.batch_size
+        self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        start = time.perf_counter()
+        self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        self._ms_per_pair = (time.perf_counter() - start) * 1000 / len(pairs)
+
+    # ────────────────────────────────────────────────────────────
+    # SCORE CACHE
+    # ────────────────────────────────────────────────────────────
+    def _cached(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, key: Tuple[str, str], score: float) -> None:
+        with self._lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ────────────────────────────────────────────────────────────
+    # RERANK
+    # ────────────────────────────────────────────────────────────
+    def rerank(self, claim: str, docs: List[Document], top_n: int = 5) -> List[Document]:
+        """ Return the top_n docs by cross-encoder score, within the time budget. """
+        if len(docs) <= 1 or not claim:
+            return docs[:top_n]
+
+        start = time.perf_counter()
+        claim_key = _key(claim)
+        keys = [(claim_key, _key(d.page_content)) for d in docs]
+        scores: List[Optional[float]] = [self._cached(k) for k in keys]
+
+        pending = [i for i, s in enumerate(scores) if s is None]
+        while pending:
+            # Without an estimate, a small first batch measures the cost before committing to more
+            size = self.batch_size if self._ms_per_pair is not None else min(self.batch_size, FIRST_BATCH_SIZE)
+            batch, pending = pending[:size], pending[size:]
+
+            # Skip the batch if the estimate says it would overrun the budget
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if self._ms_per_pair is not None and elapsed_ms + self._ms_per_pair * len(batch) > self.budget_ms:
+                break
+
+            batch_start = time.perf_counter()
+            batch_scores = self.model.predict(
+                [(claim, docs[i].page_content) for i in batch], batch_size=self.batch_size, show_progress_bar=False
+            )
+            per_pair = (time.perf_counter() - batch_start) * 1000 / len(batch)
+            self._ms_per_pair = per_pair if self._ms_per_pair is None else 0.8 * self._ms_per_pair + 0.2 * per_pair
+
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self._store(keys[i], scores[i])
+
+        # Scored candidates by score, then the unscored ones in retrieval order
+        scored = sorted((i for i, s in enumerate(scores) if s is not None), key=lambda i: scores[i], reverse=True)
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        return [docs[i] for i in (scored + unscored)[:top_n]]
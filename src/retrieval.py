@@ -0,0 +1,282 @@
+""" Batched dense / hybrid search over the verified-claims vector store. """
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from bm25 import BM25Index, reciprocal_rank_fusion
+from index_factory import search_parameters
+from metadata_filter import MetadataFilter, MetadataIndex, bitmap_selector, id_bitmap
+from scatter_gather import ScatterGatherSearcher
+from semantic_cache import SemanticQueryCache
+from shards import ShardRouter
+
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+# Collapsed retrieval fetches this many times k, so k distinct claims remain after dropping duplicates
+COLLAPSE_FETCH_MULTIPLIER = 3
+
+# Candidate sets up to this size are scored exactly on their own vectors instead of through the index
+SUBSET_SCAN_MAX = 8192
+
+def collapse_duplicates(docs: List[Document], k: int) -> List[Document]:
+    """ Keep the best-ranked document per near-duplicate cluster and per URL, up to k documents. """
+    seen, kept = set(), []
+    for doc in docs:
+        keys = set()
+        url = (doc.metadata.get("url") or "").strip().rstrip("/").lower()
+        if url:
+            keys.add(("url", url))
+        if doc.metadata.get("cluster_id") is not None:
+            keys.add(("cluster", doc.metadata["cluster_id"]))
+        keys = keys or {("text", doc.page_content)}
+
+        if keys & seen:
+            continue
+        seen |= keys
+        kept.append(doc)
+        if len(kept) == k:
+            break
+    return kept
+
+class ClaimRetriever:
+    """ Search the FAISS vectorstore for many queries at once, optionally fused with BM25.
+
+    embeddings must offer embed_queries (see CachedQueryEmbeddings) so a batch is one encode.
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        embeddings,
+        bm25: Optional[BM25Index] = None,
+        mode: str = "dense",
+        fetch_multiplier: int = 4,
+        metadata: Optional[MetadataIndex] = None,
+        semantic_cache: Optional[SemanticQueryCache] = None,
+        collapse: bool = True,
+        shards: Optional[ShardRouter] = None,
+        partitions: Optional[ScatterGatherSearcher] = None,
+    ):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {RETRIEVAL_MODES}")
+        if mode == "hybrid" and bm25 is None:
+            raise ValueError("Hybrid retrieval needs a BM25 index, build it with src/build_index.py")
+
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings
+        self.bm25 = bm25
+        self.mode = mode
+        self.fetch_multiplier = fetch_multiplier
+        self.metadata = metadata
+        self.semantic_cache = semantic_cache
+        self.collapse = collapse
+        self.shards = shards
+        self.partitions = partitions
+
+        # Cached rankings belong to this retriever's index: a searcher still on a swapped-out
+        # version writes under its own token, which the new version never looks up
+        self._cache_token = object()
+
+        # BM25 runs on its own thread while the encoder and FAISS run on the caller's
+        self._lexical_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bm25") if bm25 else None
+
+    # ────────────────────────────────────────────────────────────
+    # SEARCH
+    # ────────────────────────────────────────────────────────────
+    def dense_positions(
+        self,
+        queries: List[str],
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        candidates: Optional[np.ndarray] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """ One batched encode and one matrix index.search, returns a (len(queries), k) id array.
+
+        candidates restricts the search to these ids (a metadata filter), vectors skips the encode.
+        """
+        if vectors is None:
+            vectors = np.asarray(self.embeddings.embed_queries(queries), dtype=np.float32)
+        index = self.vectorstore.index
+
+        if candidates is None:
+            # Unfiltered searches fan out to the partition workers while they hold the whole index
+            if self.partitions is not None and self.partitions.ntotal == index.ntotal:
+                try:
+                    return self.partitions.search(vectors, k, nprobe, ef_search)
+                except TimeoutError as e:
+                    print(f"{e}, searching the full index")
+            params = search_parameters(index, nprobe=nprobe, ef_search=ef_search)
+            _, indices = index.search(vectors, k, params=params)
+            return indices
+
+        if len(candidates) == 0:
+            return np.full((len(queries), k), -1, dtype=np.int64)
+
+        # Small candidate sets: copy out and score just their vectors, cheaper than any full search
+        if len(candidates) <= SUBSET_SCAN_MAX:
+            try:
+                subset = index.reconstruct_batch(candidates)
+            except RuntimeError:
+                # IVF indexes cannot reconstruct without a direct map, use the selector instead
+                subset = None
+            if subset is not None:
+                _, local = faiss.knn(vectors, subset, min(k, len(candidates)))
+                indices = np.full((len(queries), k), -1, dtype=np.int64)
+                indices[:, :local.shape[1]] = np.where(local >= 0, candidates[local], -1)
+                return indices
+
+        # Larger sets: a precomputed bitmap selector inside the index search, no vectors are copied.
+        # Sets from the metadata index reuse the bitmap cached next to them
+        bitmap = self.metadata.bitmap(candidates, index.ntotal) if self.metadata else id_bitmap(candidates, index.ntotal)
+        sel = bitmap_selector(bitmap)
+        target = faiss.downcast_index(index)
+        if isinstance(target, faiss.IndexRefine):
+            # The binary first pass does not take a selector, scan the exact rescoring vectors instead
+            target = faiss.downcast_index(target.refine_index)
+        params = search_parameters(target, nprobe=nprobe, ef_search=ef_search, sel=sel)
+        _, indices = target.search(vectors, k, params=params)
+        return indices
+
+    def search_positions(
+        self,
+        queries: List[str],
+        k: int = 4,
+        mode: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[List[int]]:
+        """ Ranked index positions per query, dense only or dense + BM25 fused with RRF.
+
+        With a semantic cache, queries close to an earlier query of the same search reuse its ranking.
+        """
+        mode = mode or self.mode
+        candidates = self.metadata.candidate_ids(filters) if self.metadata else None
+
+        # Filters on the shard field alone search only the matching shards
+        shard_values = self.shards.route(filters) if self.shards else None
+
+        if self.semantic_cache is None:
+            return self._search_positions(queries, k, mode, nprobe, ef_search, candidates, shard_values=shard_values)
+
+        vectors = np.asarray(self.embeddings.embed_queries(queries), dtype=np.float32)
+
+        # Rankings are only comparable for the same search settings on the same index
+        context = (
+            self._cache_token, mode, k, nprobe, ef_search, self.vectorstore.index.ntotal,
+            filters.model_dump_json() if filters is not None else None,
+        )
+        results = [self.semantic_cache.get(context, v) for v in vectors]
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            fresh = self._search_positions(
+                [queries[i] for i in missing], k, mode, nprobe, ef_search, candidates, vectors[missing], shard_values
+            )
+            for i, positions in zip(missing, fresh):
+                results[i] = positions
+                self.semantic_cache.put(context, vectors[i], positions)
+        return results
+
+    def _search_positions(
+        self,
+        queries: List[str],
+        k: int,
+        mode: str,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        candidates: Optional[np.ndarray],
+        vectors: Optional[np.ndarray] = None,
+        shard_values: Optional[List[str]] = None,
+    ) -> List[List[int]]:
+        if mode == "dense" or self.bm25 is None:
+            dense = self._dense(queries, k, nprobe, ef_search, candidates, vectors, shard_values)
+            return [[int(i) for i in row if i != -1] for row in dense]
+
+        # Both searches fetch deeper than k, so fusion has candidates to re-order
+        fetch_k = k * self.fetch_multiplier
+        lexical = self._lexical_pool.submit(lambda: [self.bm25.search(q, fetch_k, candidates) for q in queries])
+        dense = self._dense(queries, fetch_k, nprobe, ef_search, candidates, vectors, shard_values)
+
+        return [
+            reciprocal_rank_fusion([list(d), lex], limit=k)
+            for d, lex in zip(dense, lexical.result())
+        ]
+
+    def _dense(self, queries, k, nprobe, ef_search, candidates, vectors, shard_values) -> np.ndarray:
+        """ Dense search on the full index, or on the routed shards only. """
+        if shard_values is None:
+            return self.dense_positions(queries, k, nprobe, ef_search, candidates, vectors)
+        if vectors is None:
+            vectors = np.asarray(self.embeddings.embed_queries(queries), dtype=np.float32)
+        return self.shards.search(vectors, k, shard_values, nprobe, ef_search)
+
+    def warm_up(self) -> None:
+        """ One dummy encode and search, so lazy kernels and index pages load before the first real query. """
+        vectors = np.asarray(self.embeddings.embed_documents(["warm-up"]), dtype=np.float32)
+        self.dense_positions(["warm-up"], 1, vectors=vectors)
+
+    def invalidate_caches(self) -> None:
+        """ Forget cached rankings, frees the slots of a rebuilt or swapped-out index. """
+        if self.semantic_cache is not None:
+            self.semantic_cache.invalidate()
+
+    def close(self) -> None:
+        """ Stop the BM25 thread and the partition workers, once no search uses this retriever any more. """
+        if self._lexical_pool is not None:
+            self._lexical_pool.shutdown(wait=False)
+        if self.partitions is not None:
+            self.partitions.close()
+
+    # ────────────────────────────────────────────────────────────
+    # DOCUMENTS
+    # ────────────────────────────────────────────────────────────
+    def documents(self, positions: List[int]) -> List[Document]:
+        """ Materialize the documents at these index positions, in order. """
+        docstore = self.vectorstore.docstore
+
+        # The SQLite docstore fetches all hits in one query
+        if hasattr(docstore, "documents_at"):
+            return [d for d in docstore.documents_at(list(positions)) if d is not None]
+
+        return [docstore.search(self.vectorstore.index_to_docstore_id[i]) for i in positions if i != -1]
+
+    def retrieve(
+        self,
+        queries: List[str],
+        subject: str = "",
+        k: int = 4,
+        filters: Optional[MetadataFilter] = None,
+        **search_kwargs,
+    ) -> List[List[Document]]:
+        """ Documents per query, falling back to the claim subject when a query finds nothing.
+
+        A non-strict filter that leaves a query without results is dropped for that query.
+        With collapse, near-duplicates (same cluster or URL) are dropped and k is filled
+        with distinct claims from a deeper search.
+        """
+        if not queries:
+            return []
+
+        fetch_k = k * COLLAPSE_FETCH_MULTIPLIER if self.collapse else k
+        positions = self.search_positions(queries, fetch_k, filters=filters, **search_kwargs)
+        if filters is not None and not filters.strict and not all(positions):
+            empty = [i for i, p in enumerate(positions) if not p]
+            unfiltered = self.search_positions([queries[i] for i in empty], fetch_k, **search_kwargs)
+            for i, p in zip(empty, unfiltered):
+                positions[i] = p
+
+        results = [self.documents(p) for p in positions]
+        if subject and not all(results):
+            fallback = self.documents(self.search_positions([subject], fetch_k, filters=filters, **search_kwargs)[0])
+            results = [docs or fallback for docs in results]
+
+        if self.collapse:
+            return [collapse_duplicates(docs, k) for docs in results]
+        return results
@@ -0,0 +1,194 @@
+"""
+Shared local retrieval server: one process owns the embedding model and the
+FAISS index, every app worker talks to it over a Unix socket or localhost TCP.
+
+Without a server every Streamlit worker loads its own copy of the model and
+index. With RETRIEVAL_SERVER set, tooling.retrieve_batch sends the request to
+the server over a kept-alive connection and falls back to in-process retrieval
+when the server is not running. Requests from all connections go through the
+server's micro-batcher, so concurrent clients share encodes and searches.
+
+Messages are length-prefixed JSON: a 4-byte big-endian length, then the body.
+{"admin": "swap_index", "version": ...} switches the server to another index
+version (see src/index_versions.py) without a restart.
+
+Run from the repository root:
+    python src/retrieval_server.py --address unix:/tmp/checkmate-retrieval.sock
+    RETRIEVAL_SERVER=unix:/tmp/checkmate-retrieval.sock streamlit run app.py
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import List, Optional, Tuple, Union
+
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# ────────────────────────────────────────────────────────────
+# WIRE FORMAT
+# ────────────────────────────────────────────────────────────
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """ 'unix:/path.sock', 'tcp:127.0.0.1:8765' or '127.0.0.1:8765' to (socket family, address). """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address[len("tcp:"):].rpartition(":") if address.startswith("tcp:") else address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    body = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+def recv_message(sock: socket.socket) -> dict:
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if length > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"Message of {length} bytes exceeds the limit")
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+# ────────────────────────────────────────────────────────────
+# CLIENT
+# ────────────────────────────────────────────────────────────
+class RetrievalClient:
+    """ Thin client for the retrieval server, one kept-alive connection per thread. """
+
+    def __init__(self, address: str, timeout: float = 30.0):
+        self.family, self.address = parse_address(address)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(self.family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            if self.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.sock = sock
+        return sock
+
+    def close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def retrieve_batch(self, queries: List[str], **kwargs) -> List[str]:
+        """ Same arguments and result as tooling.retrieve_batch, computed by the server. """
+        request = {"queries": queries, "kwargs": kwargs}
+
+        # A kept-alive connection may have been closed by a server restart, reconnect once
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_message(sock, request)
+                response = recv_message(sock)
+                break
+            except (ConnectionError, BrokenPipeError) as e:
+                self.close()
+                if attempt:
+                    raise ConnectionError(f"Retrieval server unavailable: {e!r}") from e
+            except OSError:
+                self.close()
+                raise
+
+        if "error" in response:
+            raise RuntimeError(f"Retrieval server error: {response['error']}")
+        return response["outputs"]
+
+    def swap_index(self, version: Optional[str] = None) -> Optional[str]:
+        """ Ask the server to switch index versions (see tooling.swap_index), returns its live version. """
+        sock = self._connection()
+        send_message(sock, {"admin": "swap_index", "version": version})
+        response = recv_message(sock)
+        if "error" in response:
+            raise RuntimeError(f"Retrieval server error: {response['error']}")
+        return response["version"]
+
+# ────────────────────────────────────────────────────────────
+# SERVER
+# ────────────────────────────────────────────────────────────
+class _RetrievalHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        from metadata_filter import MetadataFilter
+        from tooling import retrieve_batch, swap_index
+
+        # Serve requests on this connection until the client disconnects
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                if request.get("admin") == "swap_index":
+                    response = {"version": swap_index(request.get("version"))}
+                else:
+                    kwargs = dict(request.get("kwargs", {}))
+                    if kwargs.get("filters") is not None:
+                        kwargs["filters"] = MetadataFilter(**kwargs["filters"])
+                    response = {"outputs": retrieve_batch(request["queries"], **kwargs)}
+            except Exception as e:
+                response = {"error": repr(e)}
+
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(address: str) -> None:
+    """ Load the retrieval stack once and serve it until interrupted. """
+    family, bind = parse_address(address)
+    if family == socket.AF_UNIX and os.path.exists(bind):
+        os.remove(bind)
+
+    import tooling
+    tooling.claim_retriever.get()
+    if tooling.reranker is not None:
+        tooling.reranker.get()
+    tooling.start_index_watcher()
+
+    server = (_UnixServer if family == socket.AF_UNIX else _TCPServer)(bind, _RetrievalHandler)
+    print(f"Retrieval server listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(bind):
+            os.remove(bind)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=os.getenv("RETRIEVAL_SERVER", "unix:/tmp/checkmate-retrieval.sock"))
+    args = parser.parse_args()
+
+    # The server owns the index, it must never forward requests to itself
+    os.environ.pop("RETRIEVAL_SERVER", None)
+    serve(args.address)
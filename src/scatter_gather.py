@@ -0,0 +1,220 @@
+""" Scatter-gather dense search over N partitions of the index, each served by its own worker process.
+
+Positions are assigned to partitions by position % N, so a build and every later
+ingest agree on where a vector lives. Partition i is owned by worker i % workers;
+each worker process loads only its own partitions and searches them with its own
+FAISS threads. A search sends the query vectors to every partition, waits at most
+timeout_ms and merges the top-k of the partitions that answered.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+from index_factory import build_index
+from shards import merge_top_k, read_shard_files, search_shard, write_shard_files
+
+PARTITIONS_FILE = "partitions.json"
+PARTITION_DIR = "partitions"
+
+def partition_of(positions: np.ndarray, n_partitions: int) -> np.ndarray:
+    """ Partition of each index position, stable across builds and appends. """
+    return np.asarray(positions, dtype=np.int64) % n_partitions
+
+def _partition_file(partition: int) -> str:
+    return os.path.join(PARTITION_DIR, f"part-{partition:03d}")
+
+# ────────────────────────────────────────────────────────────
+# BUILD / APPEND
+# ────────────────────────────────────────────────────────────
+def _write_partitions_table(folder: str, table: Dict[str, Any]) -> None:
+    tmp = os.path.join(folder, PARTITIONS_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table, f, indent=2)
+    os.replace(tmp, os.path.join(folder, PARTITIONS_FILE))
+
+def build_partitions(
+    folder: str,
+    vectors: np.ndarray,
+    n_partitions: int,
+    index_type: str = "flat",
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """ Split the vectors of the full index into n_partitions indexes of the same type.
+
+    Each partition stores the global positions of its vectors, so the docstore stays shared.
+    Returns the partition table.
+    """
+    if n_partitions < 1:
+        raise ValueError("n_partitions must be at least 1")
+
+    table = {"n_partitions": n_partitions, "index_type": index_type, "params": params or {}, "partitions": []}
+    owner = partition_of(np.arange(len(vectors)), n_partitions)
+    for partition in range(n_partitions):
+        ids = np.flatnonzero(owner == partition).astype(np.int64)
+        index, _ = build_index(np.ascontiguousarray(vectors[ids], dtype=np.float32), index_type, params)
+        table["partitions"].append(write_shard_files(folder, _partition_file(partition), index, ids))
+
+    _write_partitions_table(folder, table)
+    return table
+
+def add_to_partitions(folder: str, vectors: np.ndarray, first: int) -> None:
+    """ Append vectors at positions first.. to the partitions they are assigned to.
+
+    Positions a partition file already holds are skipped, so repeating an interrupted append is safe.
+    """
+    table = read_partitions(folder)
+    if table is None:
+        return
+
+    positions = np.arange(first, first + len(vectors), dtype=np.int64)
+    owner = partition_of(positions, table["n_partitions"])
+    for partition, entry in enumerate(table["partitions"]):
+        held = np.load(os.path.join(folder, entry["path"] + ".ids.npy"))
+        ids = positions[owner == partition]
+        ids = ids[ids > held[-1]] if len(held) else ids
+        if not len(ids):
+            continue
+        index = faiss.read_index(os.path.join(folder, entry["path"] + ".faiss"))
+        index.add(np.ascontiguousarray(vectors[ids - first], dtype=np.float32))
+        ids = np.concatenate([held, ids])
+        table["partitions"][partition] = write_shard_files(folder, entry["path"], index, ids)
+
+    _write_partitions_table(folder, table)
+
+def partition_doc_count(folder: str) -> Optional[int]:
+    """ Index positions covered by the partitions, None if the index has no partitions. """
+    table = read_partitions(folder)
+    if table is None:
+        return None
+    return sum(entry["ntotal"] for entry in table["partitions"])
+
+def read_partitions(folder: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(folder, PARTITIONS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+# ────────────────────────────────────────────────────────────
+# WORKER PROCESS
+# ────────────────────────────────────────────────────────────
+_worker_partitions: Dict[int, Any] = {}
+
+def _init_worker(folder: str, owned: Dict[int, str], mmap: bool, search_defaults: dict, threads: int) -> None:
+    faiss.omp_set_num_threads(threads)
+    for partition, path in owned.items():
+        _worker_partitions[partition] = read_shard_files(folder, path, mmap, search_defaults)
+
+def _search_partition(partition: int, vectors: np.ndarray, k: int, nprobe: Optional[int], ef_search: Optional[int]):
+    index, ids = _worker_partitions[partition]
+    return search_shard(index, ids, vectors, k, nprobe, ef_search)
+
+# ────────────────────────────────────────────────────────────
+# SCATTER / GATHER
+# ────────────────────────────────────────────────────────────
+class ScatterGatherSearcher:
+    """ Fan a dense search out to the partition workers and merge their top-k. """
+
+    def __init__(
+        self,
+        folder: str,
+        table: Dict[str, Any],
+        workers: int,
+        timeout_ms: float = 250,
+        mmap: bool = True,
+        search_defaults: Optional[dict] = None,
+        threads_per_worker: int = 1,
+    ):
+        self.timeout = timeout_ms / 1000
+        self.workers = max(1, min(workers, table["n_partitions"]))
+        self.partitions = [
+            (partition, entry) for partition, entry in enumerate(table["partitions"]) if entry["ntotal"]
+        ]
+        self.ntotal = sum(entry["ntotal"] for _, entry in self.partitions)
+
+        # Worker w owns partitions w, w + workers, ... and is the only process that loads them
+        defaults = {**table.get("params", {}), **(search_defaults or {})}
+        self._owner = {partition: partition % self.workers for partition, _ in self.partitions}
+        context = multiprocessing.get_context("spawn")
+        self._pools = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(
+                    folder,
+                    {p: entry["path"] for p, entry in self.partitions if self._owner[p] == w},
+                    mmap, defaults, threads_per_worker,
+                ),
+            )
+            for w in range(self.workers)
+        ]
+
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "partial": 0, "timeouts": 0, "errors": 0}
+
+    @classmethod
+    def load(cls, folder: str, workers: int, **kwargs) -> Optional["ScatterGatherSearcher"]:
+        """ Start workers for the partitions of an index folder, None if it was built without --partitions. """
+        table = read_partitions(folder)
+        return cls(folder, table, workers, **kwargs) if table else None
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> np.ndarray:
+        """ (len(vectors), k) array of global positions from the partitions that answered in time.
+
+        A partition that misses the deadline or fails is left out of this search only, the
+        merged top-k is then computed over the remaining partitions. Raises TimeoutError
+        when no partition answered.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        futures = {
+            self._pools[self._owner[partition]].submit(_search_partition, partition, vectors, k, nprobe, ef_search): partition
+            for partition, _ in self.partitions
+        }
+        done, late = wait(futures, timeout=self.timeout)
+
+        distances, positions = [], []
+        errors = 0
+        for future in done:
+            try:
+                D, I = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"Partition {futures[future]} search failed: {e!r}")
+                continue
+            distances.append(D)
+            positions.append(I)
+
+        # Queued searches for a late partition are dropped, a running one finishes in the background
+        for future in late:
+            future.cancel()
+
+        with self._lock:
+            self._stats["searches"] += 1
+            self._stats["timeouts"] += len(late)
+            self._stats["errors"] += errors
+            self._stats["partial"] += bool(late or errors)
+        if not positions and self.partitions:
+            raise TimeoutError(f"No partition answered within {self.timeout * 1000:.0f} ms")
+        return merge_top_k(distances, positions, len(vectors), k)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "partitions": len(self.partitions), "workers": self.workers}
+
+    def close(self) -> None:
+        for pool in self._pools:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,97 @@
+""" In-memory semantic cache: near-identical query embeddings reuse the ranked ids of an earlier search. """
+
+import threading
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+class SemanticQueryCache:
+    """ Bounded cache of (query vector, ranked index positions) per search context.
+
+    A lookup hits when a cached vector of the same context (mode, k, filter, ...) lies within
+    max_distance cosine distance of the query vector. Full caches evict the least recently
+    used entry. Cached positions point into one index, so the context must identify it
+    (ClaimRetriever keys it per instance); invalidate() frees the entries of an old index.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_distance: float = 0.05):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vectors: Optional[np.ndarray] = None
+        self._contexts: List[Optional[Hashable]] = [None] * self.max_entries
+        self._positions: List[Optional[List[int]]] = [None] * self.max_entries
+        self._last_used = np.zeros(self.max_entries, dtype=np.int64)
+        self._clock = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # ────────────────────────────────────────────────────────────
+    # LOOKUP / STORE
+    # ────────────────────────────────────────────────────────────
+    def get(self, context: Hashable, vector) -> Optional[List[int]]:
+        """ Ranked positions of the closest cached query within max_distance, else None. """
+        query = self._unit(vector)
+        with self._lock:
+            slots = [i for i, c in enumerate(self._contexts) if c == context]
+            if self._vectors is None or not slots:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors[slots] @ query
+            best = int(np.argmax(similarities))
+            if 1.0 - float(similarities[best]) > self.max_distance:
+                self.misses += 1
+                return None
+
+            slot = slots[best]
+            self.hits += 1
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            return list(self._positions[slot])
+
+    def put(self, context: Hashable, vector, positions: List[int]) -> None:
+        """ Store the ranked positions of a query, evicting the least recently used entry when full. """
+        query = self._unit(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+
+            free = [i for i, c in enumerate(self._contexts) if c is None]
+            slot = free[0] if free else int(np.argmin(self._last_used))
+
+            self._vectors[slot] = query
+            self._contexts[slot] = context
+            self._positions[slot] = list(positions)
+            self._clock += 1
+            self._last_used[slot] = self._clock
+
+    # ────────────────────────────────────────────────────────────
+    # INVALIDATION
+    # ────────────────────────────────────────────────────────────
+    def invalidate(self) -> None:
+        """ Drop every entry, call this when the index is rebuilt or swapped. """
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict:
+        """ Hit/miss counters for this process plus the current number of stored queries. """
+        with self._lock:
+            size = sum(c is not None for c in self._contexts)
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,233 @@
+""" Per-year or per-organisation FAISS shards with a routing table, searched instead of the full index. """
+
+import json
+import os
+import re
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from docstore import read_index
+from index_factory import apply_search_defaults, build_index, min_training_points, search_parameters
+from metadata_filter import MetadataFilter, _norm, metadata_values
+
+SHARDS_FILE = "shards.json"
+SHARD_DIR = "shards"
+SHARD_FIELDS = ("year", "organisation")
+
+SAFE_NAME_RE = re.compile(r"[^\w.-]+")
+
+def _shard_file(field: str, value: str) -> str:
+    """ Path of a shard (without extension) relative to the index folder. """
+    return os.path.join(SHARD_DIR, f"{field}={SAFE_NAME_RE.sub('_', value) or '_'}")
+
+# ────────────────────────────────────────────────────────────
+# BUILD / APPEND
+# ────────────────────────────────────────────────────────────
+def _shard_values(docstore_path: str, field: str, positions: Optional[Iterable[int]] = None) -> Dict[str, List[int]]:
+    """ Index positions per value of field, optionally only for the given positions. """
+    conn = sqlite3.connect(f"file:{docstore_path}?mode=ro", uri=True)
+    if positions is None:
+        rows = conn.execute("SELECT position, metadata FROM docs ORDER BY position")
+    else:
+        wanted = list(positions)
+        rows = conn.execute(
+            "SELECT position, metadata FROM docs WHERE position BETWEEN ? AND ? ORDER BY position",
+            (min(wanted), max(wanted)),
+        )
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for position, metadata in rows:
+        groups[metadata_values(json.loads(metadata))[field]].append(position)
+    conn.close()
+    return groups
+
+def _write_shard(folder: str, field: str, value: str, index, ids: np.ndarray) -> Dict[str, Any]:
+    return write_shard_files(folder, _shard_file(field, value), index, ids)
+
+def _build_shard(vectors: np.ndarray, index_type: str, params: Optional[Dict[str, Any]]) -> Tuple[Any, Dict[str, Any]]:
+    """ Build a shard of the requested type, or flat when it has too few vectors to train one.
+
+    Returns the index and its routing entry fields (index_type and resolved params).
+    """
+    if len(vectors) < min_training_points(index_type, params):
+        index_type, params = "flat", {}
+    index, resolved = build_index(vectors, index_type, params)
+    return index, {"index_type": index_type, "params": resolved}
+
+def write_shard_files(folder: str, path: str, index, ids: np.ndarray) -> Dict[str, Any]:
+    """ Atomically write an index and its global positions to path.faiss / path.ids.npy under folder. """
+    os.makedirs(os.path.dirname(os.path.join(folder, path)), exist_ok=True)
+    faiss.write_index(index, os.path.join(folder, path + ".faiss.tmp"))
+    np.save(os.path.join(folder, path + ".ids.tmp.npy"), ids.astype(np.int64))
+    os.replace(os.path.join(folder, path + ".faiss.tmp"), os.path.join(folder, path + ".faiss"))
+    os.replace(os.path.join(folder, path + ".ids.tmp.npy"), os.path.join(folder, path + ".ids.npy"))
+    return {"path": path, "ntotal": int(index.ntotal)}
+
+def read_shard_files(folder: str, path: str, mmap: bool = True, search_defaults: Optional[dict] = None):
+    """ Load an index written by write_shard_files with its global positions. """
+    index = read_index(os.path.join(folder, path + ".faiss"), mmap=mmap)
+    apply_search_defaults(index, search_defaults or {})
+    ids = np.load(os.path.join(folder, path + ".ids.npy"), mmap_mode="r" if mmap else None)
+    return index, ids
+
+def _write_routing(folder: str, routing: Dict[str, Any]) -> None:
+    tmp = os.path.join(folder, SHARDS_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(routing, f, indent=2)
+    os.replace(tmp, os.path.join(folder, SHARDS_FILE))
+
+def build_shards(
+    folder: str,
+    vectors: np.ndarray,
+    docstore_path: str,
+    field: str,
+    index_type: str = "flat",
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """ One index per value of field (year or organisation) over the same vectors as the full index.
+
+    Each shard stores the global positions of its vectors, so the docstore stays shared.
+    Documents without a value go to the '' shard. Shards too small to train index_type
+    are flat, every shard records its own type. Returns the routing table.
+    """
+    if field not in SHARD_FIELDS:
+        raise ValueError(f"Unknown shard field {field!r}, expected one of {SHARD_FIELDS}")
+
+    routing = {"field": field, "index_type": index_type, "params": params or {}, "shards": {}}
+    for value, positions in sorted(_shard_values(docstore_path, field).items()):
+        ids = np.asarray(positions, dtype=np.int64)
+        index, built = _build_shard(vectors[ids], index_type, params)
+        routing["shards"][value] = {**_write_shard(folder, field, value, index, ids), **built}
+
+    _write_routing(folder, routing)
+    return routing
+
+def add_to_shards(folder: str, vectors: np.ndarray, first: int, docstore_path: str) -> None:
+    """ Append vectors at positions first.. to their shards, creating shards for new values.
+
+    Positions a shard file already holds are skipped, so repeating an append that stopped
+    halfway (some shard files written, shards.json not yet) adds nothing twice.
+    """
+    routing = read_routing(folder)
+    if routing is None:
+        return
+
+    positions = range(first, first + len(vectors))
+    for value, ids in _shard_values(docstore_path, routing["field"], positions).items():
+        ids = np.asarray(ids, dtype=np.int64)
+        entry = routing["shards"].get(value)
+        if entry is None:
+            index, built = _build_shard(
+                np.ascontiguousarray(vectors[ids - first], dtype=np.float32), routing["index_type"], routing["params"]
+            )
+        else:
+            # An existing shard keeps its type, a flat one is not retrained when it grows
+            held = np.load(os.path.join(folder, entry["path"] + ".ids.npy"))
+            ids = ids[ids > held[-1]] if len(held) else ids
+            if not len(ids):
+                continue
+            index = faiss.read_index(os.path.join(folder, entry["path"] + ".faiss"))
+            index.add(np.ascontiguousarray(vectors[ids - first], dtype=np.float32))
+            ids = np.concatenate([held, ids])
+            built = {k: entry[k] for k in ("index_type", "params") if k in entry}
+        routing["shards"][value] = {**_write_shard(folder, routing["field"], value, index, ids), **built}
+
+    _write_routing(folder, routing)
+
+def shard_doc_count(folder: str) -> Optional[int]:
+    """ Index positions covered by the shards (they are disjoint), None if the index has no shards. """
+    routing = read_routing(folder)
+    if routing is None:
+        return None
+    return sum(entry["ntotal"] for entry in routing["shards"].values())
+
+def read_routing(folder: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(folder, SHARDS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+# ────────────────────────────────────────────────────────────
+# ROUTE / SEARCH
+# ────────────────────────────────────────────────────────────
+def search_shard(
+    index,
+    ids: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """ Search one shard, returns distances (inf for missing hits) and global positions (-1). """
+    params = search_parameters(index, nprobe=nprobe, ef_search=ef_search)
+    D, I = index.search(vectors, min(k, index.ntotal), params=params)
+    return np.where(I >= 0, D, np.inf), np.where(I >= 0, np.asarray(ids)[np.maximum(I, 0)], -1)
+
+def merge_top_k(distances: List[np.ndarray], positions: List[np.ndarray], n_queries: int, k: int) -> np.ndarray:
+    """ Merge per-shard results into a (n_queries, k) array of global positions, -1 padded. """
+    result = np.full((n_queries, k), -1, dtype=np.int64)
+    if not positions:
+        return result
+
+    # Shards hold disjoint vectors and share the metric, so the global top-k is the best k distances
+    D, I = np.hstack(distances), np.hstack(positions)
+    order = np.argsort(D, axis=1, kind="stable")[:, :k]
+    merged = np.take_along_axis(I, order, axis=1)
+    result[:, :merged.shape[1]] = merged
+    return result
+
+class ShardRouter:
+    """ Route a metadata filter to the shards that can contain its matches and merge their top-k. """
+
+    def __init__(self, folder: str, routing: Dict[str, Any], mmap: bool = True, search_defaults: Optional[dict] = None):
+        self.field = routing["field"]
+        self.shards: Dict[str, Tuple[Any, np.ndarray]] = {}
+        for value, entry in routing["shards"].items():
+            # Shards written before per-shard types all have the routing type
+            defaults = {**entry.get("params", routing.get("params", {})), **(search_defaults or {})}
+            self.shards[value] = read_shard_files(folder, entry["path"], mmap, defaults)
+
+    @classmethod
+    def load(cls, folder: str, mmap: bool = True, search_defaults: Optional[dict] = None) -> Optional["ShardRouter"]:
+        """ Load the shards of an index folder, None if it was built without --shard-by. """
+        routing = read_routing(folder)
+        return cls(folder, routing, mmap, search_defaults) if routing else None
+
+    def route(self, flt: Optional[MetadataFilter]) -> Optional[List[str]]:
+        """ Shard values to search for this filter, None when the filter needs the full index.
+
+        Only filters on the shard field alone can be answered by shards, anything else
+        (no filter, or extra conditions on other fields) goes to the full index.
+        """
+        if flt is None or flt.is_empty():
+            return None
+        if self.field == "year":
+            values, others = [str(y) for y in flt.years], (flt.organisations, flt.ratings)
+        else:
+            values, others = [_norm(o) for o in flt.organisations], (flt.years, flt.ratings)
+        if not values or any(others):
+            return None
+        return [v for v in dict.fromkeys(values) if v in self.shards]
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        values: List[str],
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> np.ndarray:
+        """ Search the given shards and merge into a (len(vectors), k) array of global positions. """
+        distances, positions = [], []
+        for value in values:
+            index, ids = self.shards[value]
+            if not index.ntotal:
+                continue
+            D, I = search_shard(index, ids, vectors, k, nprobe, ef_search)
+            distances.append(D)
+            positions.append(I)
+        return merge_top_k(distances, positions, len(vectors), k)
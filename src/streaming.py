@@ -0,0 +1,80 @@
+""" Stream one graph turn as UI events: LLM tokens of selected nodes, and node messages as soon as a node finishes. """
+
+import re
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.utils.json import parse_partial_json
+
+THINK_RE = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+
+def partial_json(text: str) -> Optional[dict]:
+    """ The object parsed from a JSON-mode response that is still being generated, None before it starts. """
+    text = THINK_RE.sub("", text)
+    start = text.find("{")
+    if start < 0:
+        return None
+    try:
+        parsed = parse_partial_json(text[start:])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def _summary_preview(text: str) -> str:
+    return (partial_json(text) or {}).get("summary") or ""
+
+def _claim_matching_preview(text: str) -> str:
+    explanation = (partial_json(text) or {}).get("explanation") or ""
+    return f"### Claim Matching Analysis\n\n{explanation}" if explanation else ""
+
+def _text_preview(text: str) -> str:
+    return THINK_RE.sub("", text).strip()
+
+# Nodes whose LLM output is shown token by token, and how the tokens so far become chat text
+STREAMED_NODES: Dict[str, Callable[[str], str]] = {
+    "produce_summary": _summary_preview,
+    "reduce_claim_matching": _claim_matching_preview,
+    "critical_question": _text_preview,
+}
+
+def _ai_messages(value: Any):
+    value = getattr(value, "value", value)  # unwrap Overwrite
+    if value is None:
+        return []
+    return [m for m in (value if isinstance(value, list) else [value]) if isinstance(m, AIMessage)]
+
+async def stream_graph(graph, payload, config) -> AsyncIterator[Tuple[str, str, str]]:
+    """ Run one turn of the graph and yield (kind, node, text) events while it runs.
+
+    kind is "partial" (the text so far of a node in STREAMED_NODES, replaces the previous
+    partial of that node, empty when a new LLM call of the node discards it), "message"
+    (an AI message the node added to messages), "critical" (one it added to
+    messages_critical) or "done" (the node finished).
+    """
+    # Per node the message id of the LLM call being streamed and its text so far. A node that
+    # calls the LLM again (a retry, a second pass) starts a new message and a new preview
+    tokens: Dict[str, Tuple[Optional[str], str]] = {}
+    async for mode, chunk in graph.astream(payload, config=config, stream_mode=["updates", "messages"]):
+        if mode == "messages":
+            message, metadata = chunk
+            node = metadata.get("langgraph_node")
+            if node in STREAMED_NODES and isinstance(message, AIMessageChunk) and isinstance(message.content, str):
+                run_id, text = tokens.get(node, (message.id, ""))
+                if run_id != message.id:
+                    if STREAMED_NODES[node](text):
+                        yield "partial", node, ""
+                    text = ""
+                tokens[node] = (message.id, text + message.content)
+                preview = STREAMED_NODES[node](tokens[node][1])
+                if preview:
+                    yield "partial", node, preview
+            continue
+
+        for node, update in chunk.items():
+            tokens.pop(node, None)
+            if isinstance(update, dict):
+                for m in _ai_messages(update.get("messages")):
+                    yield "message", node, m.content
+                for m in _ai_messages(update.get("messages_critical")):
+                    yield "critical", node, m.content
+            yield "done", node, ""
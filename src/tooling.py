@@ -1,45 +1,304 @@
 import os
+import json
+import asyncio
+from collections import defaultdict
+import threading
+import time
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from langchain.tools import tool
-from tavily import TavilyClient
-import json
+from typing import List, Optional
 from utils import format_docs
-from langchain_groq import ChatGroq
-from langchain_ollama import ChatOllama
 from state_scope import SearchResult, TavilySearchOutput
+from lazy_init import BACKGROUND_ERRORS, LazyResource, report_background_error, startup_report, timed_import
+from retrieval_server import RetrievalClient
+from micro_batcher import MicroBatcher
 
 
 load_dotenv(".env", override=True)
 
-#  Load the LLM
-llm_tuned = ChatOllama(model="mistral7b-q4km:latest", temperature=0.5, base_url="http://localhost:11434")
-llm = ChatGroq(model_name="qwen/qwen3-32b", temperature=0.1)
-#qwen3:1.7b was also tested, but did not provide explanation in the retrieve information node
-#llm = ChatOllama(model="qwen3:4b", temperature=0.3, base_url="http://localhost:11434")
+# Heavy clients and models load on background threads from here on, and block only at their first use.
+# The names below stand in for the loaded objects, e.g. llm.ainvoke(...) waits for the client if needed.
+
+#  Load the LLM, models, timeouts and concurrency limits per provider are configured in src/llm_registry.py
+from llm_registry import LLMRegistry
+
+llm_registry = LLMRegistry()
+
+def _load_llm_tuned():
+    return llm_registry.chat("llm_tuned")
+
+def _load_llm():
+    return llm_registry.chat("llm")
+
 # Load Tavily
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY", ""))
+def _load_tavily():
+    TavilyClient = timed_import("tavily").TavilyClient
+    return TavilyClient(api_key=os.getenv("TAVILY_API_KEY", ""))
+
+llm_tuned = LazyResource("llm_tuned", _load_llm_tuned)
+llm = LazyResource("llm", _load_llm)
+tavily_client = LazyResource("tavily_client", _load_tavily)
+
+# Structured responses are cached on disk by model, temperature, schema and prompt, LLM_CACHE_ENABLED=0 turns it off.
+# Nodes listed in LLM_CACHE_BYPASS (comma-separated node names) always call the model.
+from llm_cache import CachedStructuredLLM, LLMResponseCache
+
+llm_response_cache = LLMResponseCache(
+    path=os.getenv("LLM_CACHE_PATH", "cache/llm_responses.sqlite"),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000")),
+) if os.getenv("LLM_CACHE_ENABLED", "1") == "1" else None
+llm_cache_bypass = {n.strip() for n in os.getenv("LLM_CACHE_BYPASS", "").split(",") if n.strip()}
+
+def structured_output(schema, node: str = ""):
+    """llm.with_structured_output(schema, method="json_mode") behind the response cache, for the named node.
+
+    The structured runnable itself is prebuilt once by the registry and shares its pooled connections.
+    """
+    return CachedStructuredLLM(
+        llm, schema, llm_response_cache, node=node, bypass=node in llm_cache_bypass,
+        runnable=llm_registry.structured("llm", schema),
+    )
+
+def chat_model(name: str):
+    """The registry's chat model called name ("llm" or "llm_tuned"), behind its provider's concurrency limit."""
+    return llm_registry.limited(name)
 
 # ───────────────────────────────────────────────────────────────────────
 # LOAD FAISS DATABASE WITH VERIFIED CLAIMS
 # ───────────────────────────────────────────────────────────────────────
 
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+# The filter model only, metadata_filter itself imports FAISS
+from metadata_schema import MetadataFilter
 
-# Load existing FAISS index
 model_name = "sentence-transformers/all-mpnet-base-v2"
-model_kwargs = {'device': 'cuda'}
-encode_kwargs = {'normalize_embeddings': False}
-embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs=model_kwargs,
-    encode_kwargs=encode_kwargs
-)
-vectorstore = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-
-# Set up retriever
-retriever = vectorstore.as_retriever()
+index_dir = os.getenv("INDEX_DIR", "faiss_index")
+
+def _load_claim_retriever():
+    # FAISS and the embedding model are the slow imports, time them for the startup report
+    timed_import("langchain_community.vectorstores")
+    timed_import("faiss")
+    from embedding_backends import load_embeddings, resolve_backend
+    from embedding_cache import CachedQueryEmbeddings, QueryEmbeddingCache
+    from index_versions import VersionedRetriever, resolve_index_dir
+    from semantic_cache import SemanticQueryCache
+
+    # Load the embedding model, backend is auto (GPU PyTorch, else ONNX on CPU), torch, onnx or onnx-int8
+    embed_backend = resolve_backend(os.getenv("EMBED_BACKEND", "auto"))
+    if embed_backend == "torch":
+        timed_import("torch")
+    embeddings = load_embeddings(
+        backend=embed_backend,
+        model_name=model_name,
+        onnx_dir=os.getenv("EMBED_ONNX_DIR", "models/all-mpnet-base-v2-onnx"),
+    )
+
+    # Cache query embeddings on disk, so repeated queries skip the transformer forward pass
+    query_cache = QueryEmbeddingCache(
+        path=os.getenv("EMBED_CACHE_PATH", "cache/query_embeddings.sqlite"),
+        max_entries=int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "50000")),
+    )
+    # Vectors differ slightly per backend (int8 especially), so the backend is part of the cache key
+    cached_embeddings = CachedQueryEmbeddings(embeddings, model_name=f"{model_name}@{embed_backend}", cache=query_cache)
+
+    # Queries within SEMANTIC_CACHE_MAX_DISTANCE (cosine) of an earlier query reuse its ranking, 0 disables it
+    semantic_cache_distance = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.05"))
+    semantic_cache = SemanticQueryCache(
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048")),
+        max_distance=semantic_cache_distance,
+    ) if semantic_cache_distance > 0 else None
+
+    # INDEX_DIR is a plain index folder, or a root of versions (see src/index_versions.py) that can be swapped live
+    version, folder = resolve_index_dir(index_dir)
+    return VersionedRetriever(version, _open_claim_retriever(folder, cached_embeddings, semantic_cache))
+
+def _open_claim_retriever(folder, cached_embeddings, semantic_cache):
+    """Everything that depends on one index folder; the embedding model and caches are shared across versions."""
+    from docstore import load_vectorstore
+    from index_factory import apply_search_defaults, read_index_config
+    from bm25 import BM25_FILE, BM25Index
+    from metadata_filter import MetadataIndex
+    from retrieval import ClaimRetriever
+    from scatter_gather import ScatterGatherSearcher
+    from shards import ShardRouter
+
+    # "mmap" shares the index pages between worker processes, "ram" reads the index into memory.
+    # Documents always come from docstore.sqlite: no builder writes index.pkl any more, convert an
+    # old FAISS.save_local folder once with python src/docstore.py <folder>
+    load_mode = os.getenv("INDEX_LOAD_MODE", "mmap")
+    if load_mode not in ("mmap", "ram"):
+        raise ValueError(f"INDEX_LOAD_MODE must be 'mmap' or 'ram', got {load_mode!r}")
+    vectorstore = load_vectorstore(folder, cached_embeddings, mmap=load_mode == "mmap")
+
+    # Approximate indexes (IVF / HNSW / binary) store their parameters next to the index, env vars override them
+    index_config = read_index_config(folder)
+    search_defaults = dict(index_config.get("params", {}))
+    if os.getenv("INDEX_NPROBE"):
+        search_defaults["nprobe"] = int(os.getenv("INDEX_NPROBE"))
+    if os.getenv("INDEX_EF_SEARCH"):
+        search_defaults["ef_search"] = int(os.getenv("INDEX_EF_SEARCH"))
+    if os.getenv("INDEX_K_FACTOR"):
+        search_defaults["k_factor"] = float(os.getenv("INDEX_K_FACTOR"))
+    apply_search_defaults(vectorstore.index, search_defaults)
+
+    # Set up retriever, RETRIEVAL_MODE is "dense" or "hybrid" (dense + BM25 fused with reciprocal rank fusion)
+    bm25_path = os.path.join(folder, BM25_FILE)
+    bm25_index = BM25Index(bm25_path) if os.path.exists(bm25_path) else None
+    retriever = ClaimRetriever(
+        vectorstore,
+        cached_embeddings,
+        bm25=bm25_index,
+        mode=os.getenv("RETRIEVAL_MODE", "dense"),
+        metadata=MetadataIndex.load(folder),
+        semantic_cache=semantic_cache,
+        # One result per near-duplicate cluster / URL, RETRIEVAL_COLLAPSE=0 keeps every chunk
+        collapse=os.getenv("RETRIEVAL_COLLAPSE", "1") == "1",
+        # Indexes built with --shard-by search only the year / organisation shards a filter selects
+        shards=ShardRouter.load(folder, mmap=load_mode == "mmap", search_defaults=search_defaults),
+        # Indexes built with --partitions N fan unfiltered searches out to SHARD_WORKERS processes, 0 disables it
+        partitions=ScatterGatherSearcher.load(
+            folder,
+            workers=int(os.getenv("SHARD_WORKERS", "0")),
+            timeout_ms=float(os.getenv("SHARD_TIMEOUT_MS", "250")),
+            search_defaults=search_defaults,
+        ) if int(os.getenv("SHARD_WORKERS", "0")) > 0 else None,
+    )
+
+    # One dummy encode and search, so the first real query does not pay for cold kernels and index pages
+    if os.getenv("RETRIEVAL_WARMUP", "1") == "1":
+        retriever.warm_up()
+    return retriever
+
+# With RETRIEVAL_SERVER set (see src/retrieval_server.py) searches go to the shared server and the
+# local retrieval stack only loads if the server turns out to be unreachable
+retrieval_server = os.getenv("RETRIEVAL_SERVER", "")
+retrieval_client = RetrievalClient(retrieval_server) if retrieval_server else None
+SERVER_RETRY_SECONDS = 30.0
+_server_down_until = 0.0
+
+claim_retriever = LazyResource("claim_retriever", _load_claim_retriever, start=retrieval_client is None)
+
+# Optional cross-encoder re-ranking on CPU, only the top RERANK_TOP_N candidates reach the claim-matching prompt.
+# RERANK_BUDGET_MS caps the latency the stage may add, RERANK_DEPTH is the number of candidates per query.
+def _load_reranker():
+    from reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+    return CrossEncoderReranker(
+        model_name=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+        budget_ms=float(os.getenv("RERANK_BUDGET_MS", "150")),
+    )
+
+reranker = LazyResource("reranker", _load_reranker, start=retrieval_client is None) if os.getenv("RERANK_ENABLED", "0") == "1" else None
+rerank_top_n = int(os.getenv("RERANK_TOP_N", "5"))
+rerank_depth = int(os.getenv("RERANK_DEPTH", "10"))
+
+# Claims and URLs that were fact-checked verbatim skip retrieval entirely, EXACT_MATCH_ENABLED=0 turns it off
+from exact_match import ExactMatchIndex
+from index_versions import activate_version, resolve_index_dir
+exact_match_enabled = os.getenv("EXACT_MATCH_ENABLED", "1") == "1"
+exact_match_version = None
+
+def _load_exact_match():
+    global exact_match_version
+    version, folder = resolve_index_dir(index_dir)
+    index = ExactMatchIndex.load(folder)
+    exact_match_version = version
+    return index
+
+exact_match_index = LazyResource("exact_match_index", _load_exact_match) if exact_match_enabled else None
+
+def find_exact_match(claim: str = "", url: str = "") -> Optional[dict]:
+    """Known fact-check (claim, title, url, organisation, verdict, rating) for this exact claim or URL, else None."""
+    # A failed load only loses the shortcut, the claim goes through retrieval
+    if exact_match_index is None or not exact_match_index.wait():
+        return None
+    index = exact_match_index.get()
+    if index is None:
+        return None
+    return (url and index.by_url(url)) or (claim and index.by_claim(claim)) or None
+
+# ───────────────────────────────────────────────────────────────────────
+# INDEX VERSIONS
+# ───────────────────────────────────────────────────────────────────────
+_swap_lock = threading.Lock()
+
+def swap_index(version: Optional[str] = None) -> Optional[str]:
+    """Admin call: switch to the current index version (or activate version first), returns the live version.
+
+    The new version is loaded and warmed up on the calling thread while searches keep using the
+    old one, then the reference flips; the old version is closed when its last search returns.
+    """
+    global exact_match_index, exact_match_version
+
+    with _swap_lock:
+        if version is not None:
+            activate_version(index_dir, version)
+        version, folder = resolve_index_dir(index_dir)
+
+        # Same for the exact-match index: loaded here, then the reference flips
+        if exact_match_index is not None and exact_match_index.ready() and exact_match_version != version:
+            index = ExactMatchIndex.load(folder)
+            exact_match_index = LazyResource("exact_match_index", lambda: index)
+            exact_match_version = version
+
+        # A retriever that is still loading (or lives on the retrieval server) is left alone
+        if claim_retriever.ready() and claim_retriever.version != version:
+            live = claim_retriever.get()
+            live.swap(version, _open_claim_retriever(folder, live.embeddings, live.semantic_cache))
+        return version
+
+# Every INDEX_WATCH_SECONDS the version manifest is checked and a newly published version is swapped in,
+# 0 leaves swapping to explicit swap_index() calls. Failures go to the startup report (lazy_init)
+index_watch_seconds = float(os.getenv("INDEX_WATCH_SECONDS", "10"))
+_index_watcher: Optional[threading.Thread] = None
+_index_watcher_lock = threading.Lock()
+
+def _watch_index_versions(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            swap_index()
+        except Exception as e:
+            report_background_error("index_watcher", e)
+        else:
+            report_background_error("index_watcher", None)
+
+def start_index_watcher() -> None:
+    """Start the index watcher once per process, called by the app and the retrieval server at startup."""
+    global _index_watcher
+    with _index_watcher_lock:
+        if _index_watcher is not None or index_watch_seconds <= 0:
+            return
+        _index_watcher = threading.Thread(
+            target=_watch_index_versions, args=(index_watch_seconds,), name="index-watcher", daemon=True
+        )
+        _index_watcher.start()
+
+# ───────────────────────────────────────────────────────────────────────
+# READINESS
+# ───────────────────────────────────────────────────────────────────────
+local_retrieval = (claim_retriever, reranker) if retrieval_client is None else ()
+resources = {r.name: r for r in (llm, llm_tuned, tavily_client, exact_match_index, *local_retrieval) if r is not None}
+
+def readiness() -> dict:
+    """Readiness probe: which background resources are loaded, without blocking, and failing background tasks."""
+    status = {name: r.ready() for name, r in resources.items()}
+    return {"ready": all(status.values()), "resources": status, "errors": dict(BACKGROUND_ERRORS)}
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until every resource is loaded (or timeout seconds pass), e.g. before serving traffic."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    return all(
+        r.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        for r in resources.values()
+    )
+
+# STARTUP_REPORT=1 prints the seconds spent per heavy import and resource once everything is loaded
+def _print_startup_report():
+    wait_until_ready()
+    print(startup_report(resources))
+
+if os.getenv("STARTUP_REPORT", "0") == "1":
+    threading.Thread(target=_print_startup_report, name="startup-report", daemon=True).start()
 
 # ───────────────────────────────────────────────────────────────────────
 # TOOLS
@@ -76,15 +335,8 @@ def tavily_search(query: str, max_results: int = 10) -> TavilySearchOutput:
     )
 
 
-@tool
-def retriever_tool(query: str, subject: str = "") -> str:
-    """Search the FACTors dataset and return summarized context + allowed URLs."""
-    docs = retriever.invoke(query)
-
-    # Fallback logic stays the same
-    if not docs and subject:
-        docs = retriever.invoke(subject)
-        
+def _format_retrieval(docs) -> str:
+    """Turn retrieved documents into the context block + allowed URLs the nodes expect."""
     if not docs:
         return "No relevant claims found in the database for this topic."
 
@@ -100,6 +352,189 @@ def retriever_tool(query: str, subject: str = "") -> str:
         "ALLOWED_URLS:\n" + json.dumps(allowed)
     )
 
+
+@tool
+def retriever_tool(query: str, subject: str = "", time_period: str = "", geography: str = "") -> str:
+    """Search the FACTors dataset and return summarized context + allowed URLs.
+
+    time_period and geography (as in DetailsClaim) narrow the search to matching fact-checks.
+    """
+    return retrieve_batch([query], subject, time_period=time_period, geography=geography)[0]
+
+
+def retrieve_batch(
+    queries: List[str],
+    subject: str = "",
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    time_period: str = "",
+    geography: str = "",
+    filters: Optional[MetadataFilter] = None,
+    rerank_claim: str = "",
+) -> List[str]:
+    """Search the FACTors dataset for several queries, on the shared retrieval server if configured.
+
+    Arguments and result are those of retrieve_batch_local, which runs when no server is reachable.
+    """
+    global _server_down_until
+
+    if retrieval_client is not None and time.monotonic() >= _server_down_until:
+        try:
+            return retrieval_client.retrieve_batch(
+                queries, subject=subject, k=k, nprobe=nprobe, ef_search=ef_search,
+                time_period=time_period, geography=geography,
+                filters=filters.model_dump() if filters is not None else None,
+                rerank_claim=rerank_claim,
+            )
+        except OSError as e:
+            # Do not pay the connect attempt on every call while the server is down
+            print("retrieve_batch: retrieval server unavailable, searching in-process:", repr(e))
+            _server_down_until = time.monotonic() + SERVER_RETRY_SECONDS
+
+    kwargs = dict(
+        k=k, nprobe=nprobe, ef_search=ef_search, time_period=time_period,
+        geography=geography, filters=filters, rerank_claim=rerank_claim,
+    )
+    if retrieval_batcher is not None:
+        return retrieval_batcher.submit(queries, subject=subject, **kwargs).result()
+    return retrieve_batch_local(queries, subject, **kwargs)
+
+
+async def aretrieve_batch(queries: List[str], subject: str = "", **kwargs) -> List[str]:
+    """Async retrieve_batch, awaits the micro-batcher directly instead of blocking a thread on it."""
+    if retrieval_batcher is not None and (retrieval_client is None or time.monotonic() < _server_down_until):
+        # Never block the session's event loop on a full queue, fail fast instead
+        return await asyncio.wrap_future(retrieval_batcher.submit(queries, block=False, subject=subject, **kwargs))
+    return await asyncio.to_thread(retrieve_batch, queries, subject, **kwargs)
+
+
+def retrieve_batch_local(
+    queries: List[str],
+    subject: str = "",
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    time_period: str = "",
+    geography: str = "",
+    filters: Optional[MetadataFilter] = None,
+    rerank_claim: str = "",
+) -> List[str]:
+    """Search the FACTors dataset for several queries with one encode and one index search.
+
+    Returns one output string per query, identical to what retriever_tool gives for that query.
+    nprobe (IVF) and ef_search (HNSW) trade recall for speed for this call only.
+    filters restricts candidates explicitly, otherwise time_period / geography give a soft filter.
+    rerank_claim (the claim summary) re-ranks the pooled candidates of all queries with the
+    cross-encoder, when enabled, and keeps only the top RERANK_TOP_N of them.
+    """
+    # The whole search runs on one index version, even if a swap happens meanwhile
+    with claim_retriever.acquire() as retriever:
+        search = _search_arguments(retriever, k, nprobe, ef_search, time_period, geography, filters, rerank_claim)
+        results = retriever.retrieve(queries, subject, **search)
+    return _finish_retrieval(results, rerank_claim)
+
+
+def _search_arguments(
+    retriever,
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    time_period: str = "",
+    geography: str = "",
+    filters: Optional[MetadataFilter] = None,
+    rerank_claim: str = "",
+) -> dict:
+    """retriever.retrieve arguments of one request: the filter resolved from time_period / geography and the depth to fetch."""
+    if filters is None and retriever.metadata is not None and (time_period or geography):
+        filters = retriever.metadata.filter_from_claim(time_period, geography)
+    rerank = reranker is not None and bool(rerank_claim)
+    return {"k": max(k, rerank_depth) if rerank else k, "filters": filters, "nprobe": nprobe, "ef_search": ef_search}
+
+
+def _finish_retrieval(results, rerank_claim: str = "") -> List[str]:
+    """Re-rank against the claim when enabled, then format each query's documents."""
+    if reranker is not None and rerank_claim:
+        results = _rerank_results(rerank_claim, results)
+    return [_format_retrieval(docs) for docs in results]
+
+
+def _rerank_results(claim: str, results):
+    """Re-rank the distinct documents of all queries against the claim, each query keeps its survivors."""
+    pooled = list({d.page_content: d for docs in results for d in docs}.values())
+    kept = reranker.rerank(claim, pooled, top_n=rerank_top_n)
+    rank = {d.page_content: i for i, d in enumerate(kept)}
+    return [
+        sorted((d for d in docs if d.page_content in rank), key=lambda d: rank[d.page_content])
+        for docs in results
+    ]
+
+def _process_retrieval_batch(requests):
+    """One encode for all queries of a micro-batch, then one search per distinct filter and depth.
+
+    Subjects, claims and the like differ per session, so they are applied per request after the
+    shared search: the subject fallback for queries that found nothing, and the re-ranking.
+    A failing search only fails the requests of its own group.
+    """
+    results = [None] * len(requests)
+    with claim_retriever.acquire() as retriever:
+        # Fills the query-embedding cache, so the searches below find every vector there
+        retriever.embeddings.embed_queries([q for queries, _ in requests for q in queries])
+
+        groups, searches = defaultdict(list), {}
+        for i, (_, kwargs) in enumerate(requests):
+            try:
+                search = _search_arguments(retriever, **{n: v for n, v in kwargs.items() if n != "subject"})
+            except Exception as e:
+                results[i] = e
+                continue
+            key = json.dumps(
+                {name: v.model_dump() if isinstance(v, MetadataFilter) else v for name, v in search.items()},
+                sort_keys=True,
+            )
+            searches[key] = search
+            groups[key].append(i)
+
+        for key, indices in groups.items():
+            try:
+                outputs = retriever.retrieve([q for i in indices for q in requests[i][0]], **searches[key])
+                docs = {}
+                for i in indices:
+                    n = len(requests[i][0])
+                    docs[i], outputs = outputs[:n], outputs[n:]
+
+                # As in retrieve(): the claim subject stands in for queries that found nothing
+                missing = [i for i in indices if requests[i][1].get("subject") and not all(docs[i])]
+                if missing:
+                    fallbacks = retriever.retrieve([requests[i][1]["subject"] for i in missing], **searches[key])
+                    for i, fallback in zip(missing, fallbacks):
+                        docs[i] = [d or fallback for d in docs[i]]
+            except Exception as e:
+                for i in indices:
+                    results[i] = e
+                continue
+            for i in indices:
+                results[i] = docs[i]
+
+    for i, (_, kwargs) in enumerate(requests):
+        if isinstance(results[i], Exception):
+            continue
+        try:
+            results[i] = _finish_retrieval(results[i], kwargs.get("rerank_claim", ""))
+        except Exception as e:
+            results[i] = e
+    return results
+
+# Searches arriving within RETRIEVAL_BATCH_WAIT_MS of each other (from any session) share one encode and
+# one index search, 0 disables micro-batching
+batch_wait_ms = float(os.getenv("RETRIEVAL_BATCH_WAIT_MS", "5"))
+retrieval_batcher = MicroBatcher(
+    _process_retrieval_batch,
+    max_wait_ms=batch_wait_ms,
+    max_batch_size=int(os.getenv("RETRIEVAL_BATCH_MAX", "64")),
+    max_queue=int(os.getenv("RETRIEVAL_QUEUE_MAX", "256")),
+) if batch_wait_ms > 0 else None
+
 tools = [retriever_tool, tavily_search]
-llm_tools = llm.bind_tools(tools)
+llm_tools = LazyResource("llm_tools", lambda: llm.get().bind_tools(tools), start=False)
 tools_dict = {t.name: t for t in tools}
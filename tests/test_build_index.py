@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("pandas")
+pytest.importorskip("langchain_text_splitters")
+
+from build_index import build, check_settings, read_progress
+
+SETTINGS = {"schema": "factors", "model_name": "m", "backend": "onnx", "chunk_size": 700, "chunk_overlap": 100}
+
+def test_build_refuses_a_versioned_root(tmp_path):
+    (tmp_path / "versions.json").write_text('{"current": null, "versions": {}}')
+    with pytest.raises(ValueError, match="index_versions.py publish"):
+        build("unused.csv", str(tmp_path))
+
+def test_resume_with_other_settings_is_refused(tmp_path):
+    progress = read_progress(str(tmp_path))
+    check_settings(progress, SETTINGS, str(tmp_path))
+    progress["chunks_done"] = 10
+
+    check_settings(progress, dict(SETTINGS), str(tmp_path))
+    with pytest.raises(ValueError, match="chunk_size 700 -> 500"):
+        check_settings(progress, {**SETTINGS, "chunk_size": 500}, str(tmp_path))
@@ -0,0 +1,99 @@
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")  # exact_match tokenizes with bm25
+
+from exact_match import (
+    ExactMatchIndex,
+    add_to_exact_match,
+    build_exact_match_from_docstore,
+    canonical_url,
+    claim_line,
+    exact_match_doc_count,
+    normalize_claim,
+)
+
+def page(claim):
+    return f"Title: A fact-check\nClaim: {claim}\nOrganisation: Snopes\nOriginal Verdict: False"
+
+METADATA = {
+    "title": "A fact-check",
+    "url": "https://www.snopes.com/fact-check/moon-studio/",
+    "organisation": "Snopes",
+    "verdict": "False",
+    "rating": "false",
+}
+
+# ────────────────────────────────────────────────────────────
+# NORMALIZATION
+# ────────────────────────────────────────────────────────────
+def test_normalize_claim_ignores_case_quotes_and_whitespace():
+    assert normalize_claim("  The Moon landing was “FAKED”! ") == normalize_claim("the moon landing was faked")
+
+def test_canonical_url_drops_scheme_www_slash_and_tracking():
+    assert canonical_url("http://www.Snopes.com/fact-check/x/?utm_source=tw&b=2&a=1") == "snopes.com/fact-check/x?a=1&b=2"
+    assert canonical_url("snopes.com/fact-check/x") == "snopes.com/fact-check/x"
+    assert canonical_url("https://snopes.com:8080/x") == "snopes.com:8080/x"
+    assert canonical_url("") == ""
+
+def test_empty_claim_line_does_not_capture_the_next_line():
+    assert claim_line("Title: A blog post\nClaim: \nDate published: 2019") == ""
+    assert claim_line("Title: A blog post\nClaim:\nDate published: 2019") == ""
+    assert claim_line("Claim:\tThe moon is cheese \nDate published: 2019") == "The moon is cheese"
+
+# ────────────────────────────────────────────────────────────
+# INDEX
+# ────────────────────────────────────────────────────────────
+def test_lookup_by_claim_and_url(tmp_path):
+    path = str(tmp_path / "exact_match.sqlite")
+    assert add_to_exact_match(path, [(0, page("The moon landing was faked."), METADATA)]) == 1
+
+    index = ExactMatchIndex(path)
+    match = index.by_claim("the MOON landing was faked")
+    assert match["claim"] == "The moon landing was faked." and match["rating"] == "false"
+    assert index.by_url("snopes.com/fact-check/moon-studio?utm_campaign=share")["url"] == METADATA["url"]
+    assert index.by_claim("the moon landing was real") is None
+    assert index.by_claim("") is None
+
+def test_first_document_per_key_wins_and_counts_add_up(tmp_path):
+    path = str(tmp_path / "exact_match.sqlite")
+    add_to_exact_match(path, [(0, page("Same claim"), {**METADATA, "rating": "false"})])
+    # A later chunk without a claim line only adds its URL
+    add_to_exact_match(path, [
+        (1, page("Same claim"), {**METADATA, "rating": "true", "url": "https://example.org/other"}),
+        (2, "a chunk of body text", {**METADATA, "url": "https://example.org/body"}),
+    ])
+
+    index = ExactMatchIndex(path)
+    assert index.by_claim("same claim")["rating"] == "false"
+    assert index.by_url("example.org/body") is not None
+    assert exact_match_doc_count(path) == 3
+
+def test_pages_with_an_empty_claim_are_only_indexed_by_url(tmp_path):
+    path = str(tmp_path / "exact_match.sqlite")
+    add_to_exact_match(path, [
+        (0, "Title: One\nClaim: \nDate published: 2019", {**METADATA, "url": "https://example.org/one"}),
+        (1, "Title: Two\nClaim: \nDate published: 2019", {**METADATA, "url": "https://example.org/two"}),
+    ])
+
+    index = ExactMatchIndex(path)
+    assert index.by_claim("Date published: 2019") is None
+    assert index.by_url("example.org/two")["title"] == METADATA["title"]
+
+def test_build_from_docstore(tmp_path):
+    docstore = str(tmp_path / "docstore.sqlite")
+    conn = sqlite3.connect(docstore)
+    conn.execute("CREATE TABLE docs (position INTEGER PRIMARY KEY, page_content TEXT, metadata TEXT)")
+    conn.executemany(
+        "INSERT INTO docs VALUES (?, ?, ?)",
+        [(i, page(f"claim number {i}"), json.dumps(METADATA)) for i in range(3)],
+    )
+    conn.commit()
+    conn.close()
+
+    out = str(tmp_path / "exact_match.sqlite")
+    assert build_exact_match_from_docstore(docstore, out) == 3
+    assert ExactMatchIndex.load(str(tmp_path)).by_claim("Claim number 2")["claim"] == "claim number 2"
+    assert ExactMatchIndex.load(str(tmp_path / "missing")) is None
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from index_versions import VersionedRetriever, activate_version, publish_version, read_versions, resolve_index_dir
+from retrieval import ClaimRetriever
+from semantic_cache import SemanticQueryCache
+
+QUERY = np.array([[1.0, 0.0]], dtype=np.float32)
+
+class FakeStore:
+    def __init__(self, vectors):
+        self.index = faiss.IndexFlatL2(2)
+        self.index.add(np.asarray(vectors, dtype=np.float32))
+
+class FakeEmbeddings:
+    def embed_queries(self, queries):
+        return np.repeat(QUERY, len(queries), axis=0)
+
+def retriever(vectors, cache):
+    return ClaimRetriever(FakeStore(vectors), FakeEmbeddings(), semantic_cache=cache)
+
+def test_search_on_a_retired_version_does_not_feed_the_new_one():
+    cache = SemanticQueryCache()
+    # Same size, different contents: the query's nearest vector is position 0 in v1, 1 in v2
+    old = retriever([[1.0, 0.0], [0.0, 1.0]], cache)
+    new = retriever([[0.0, 1.0], [1.0, 0.0]], cache)
+    versioned = VersionedRetriever("v1", old)
+
+    with versioned.acquire() as searching:
+        versioned.swap("v2", new)
+        # A search that started on v1 finishes on it and caches its ranking after the swap
+        assert searching.search_positions(["q"], k=1) == [[0]]
+
+    with versioned.acquire() as live:
+        assert live.search_positions(["q"], k=1) == [[1]]
+    assert versioned.stats()["retired"] == {}
+
+def make_index_folder(path, ntotal):
+    os.makedirs(path)
+    with open(os.path.join(path, "index.faiss"), "w") as f:
+        f.write("index")
+    with open(os.path.join(path, "index_config.json"), "w") as f:
+        f.write('{"ntotal": %d}' % ntotal)
+
+def test_publish_keeps_the_plain_folder_as_the_initial_version(tmp_path):
+    root, new = str(tmp_path / "faiss_index"), str(tmp_path / "faiss_index.new")
+    make_index_folder(root, 1)
+    make_index_folder(new, 2)
+
+    version = publish_version(root, new, version="v2")
+    assert resolve_index_dir(root) == ("v2", os.path.join(root, "versions", "v2"))
+    assert set(read_versions(root)["versions"]) == {"initial", "v2"}
+
+    activate_version(root, "initial")
+    assert resolve_index_dir(root)[0] == "initial"
+    with pytest.raises(ValueError):
+        publish_version(root, str(tmp_path / "missing"), version=version)
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from pydantic import BaseModel
+
+from llm_cache import CachedStructuredLLM, LLMResponseCache
+
+class Verdict(BaseModel):
+    label: str
+
+class FakeLLM:
+    model_name = "primary-model"
+    temperature = 0.1
+
+class FakeStructured:
+    """ A structured runnable; from_fallback mimics ResilientRunnable.ainvoke_tracked. """
+
+    def __init__(self, from_fallback=False, delay=0.0):
+        self.from_fallback = from_fallback
+        self.delay = delay
+        self.calls = 0
+
+    async def ainvoke_tracked(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return Verdict(label=f"{prompt}:{self.calls}"), self.from_fallback
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_primary_answers_are_cached(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"))
+    runnable = FakeStructured()
+    llm = CachedStructuredLLM(FakeLLM(), Verdict, cache, runnable=runnable)
+
+    first = run(llm.ainvoke("claim"))
+    second = run(llm.ainvoke("claim"))
+    assert first.label == second.label == "claim:1"
+    assert runnable.calls == 1
+
+def test_fallback_answers_are_not_cached(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"))
+    runnable = FakeStructured(from_fallback=True)
+    llm = CachedStructuredLLM(FakeLLM(), Verdict, cache, runnable=runnable)
+
+    run(llm.ainvoke("claim"))
+    assert run(llm.ainvoke("claim")).label == "claim:2"
+    assert cache.stats()["size"] == 0
+
+def test_concurrent_identical_requests_share_one_call(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"))
+    runnable = FakeStructured(delay=0.05)
+    llm = CachedStructuredLLM(FakeLLM(), Verdict, cache, runnable=runnable)
+
+    async def five():
+        return await asyncio.gather(*[llm.ainvoke("claim") for _ in range(5)])
+
+    assert {v.label for v in run(five())} == {"claim:1"}
+    assert runnable.calls == 1
+    assert cache.stats()["shared"] == 4
+
+def test_expired_entries_are_recomputed(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"), ttl_seconds=-1)
+    cache.put("key", "old")
+    assert cache.get("key") is None
+
+def test_lru_eviction_keeps_max_entries(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    assert cache.stats()["size"] == 2
+    assert cache.get("a") is None
+
+def test_follower_takes_over_when_the_leader_is_cancelled(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"))
+    runnable = FakeStructured(delay=0.05)
+    llm = CachedStructuredLLM(FakeLLM(), Verdict, cache, runnable=runnable)
+
+    async def cancel_leader():
+        leader = asyncio.ensure_future(llm.ainvoke("claim"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(llm.ainvoke("claim"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run(cancel_leader()).label == "claim:2"
+    assert runnable.calls == 2
+
+def test_cancelled_follower_does_not_cancel_the_leader(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite"))
+    runnable = FakeStructured(delay=0.05)
+    llm = CachedStructuredLLM(FakeLLM(), Verdict, cache, runnable=runnable)
+
+    async def cancel_follower():
+        leader = asyncio.ensure_future(llm.ainvoke("claim"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(llm.ainvoke("claim"))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert run(cancel_follower()).label == "claim:1"
+    assert cache.stats()["size"] == 1
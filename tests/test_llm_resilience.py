@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+
+from llm_resilience import CircuitBreaker, CircuitOpenError, LatencyStats, ProviderHealth, ResilientRunnable
+
+class FakeModel:
+    """ ainvoke sleeps delay(call number) seconds, then fails when fail(call number) is true. """
+
+    def __init__(self, delay=lambda n: 0.0, fail=lambda n: False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.configs = []
+
+    async def ainvoke(self, prompt, config=None):
+        self.calls += 1
+        n = self.calls
+        self.configs.append(config)
+        await asyncio.sleep(self.delay(n))
+        if self.fail(n):
+            raise RuntimeError(f"call {n} failed")
+        return f"{prompt}:{n}"
+
+def run(coro):
+    return asyncio.run(coro)
+
+# ────────────────────────────────────────────────────────────
+# LATENCY STATISTICS AND CIRCUIT BREAKER
+# ────────────────────────────────────────────────────────────
+def test_percentile_needs_min_samples():
+    stats = LatencyStats(window=10)
+    for seconds in range(1, 6):
+        stats.record(seconds)
+    assert stats.percentile(95, min_samples=6) is None
+    assert stats.percentile(50, min_samples=5) == 3
+    assert stats.percentile(100) == 5
+
+def test_latency_window_keeps_recent_calls():
+    stats = LatencyStats(window=3)
+    for seconds in (100, 1, 1, 1):
+        stats.record(seconds)
+    assert stats.percentile(100) == 1
+    assert stats.stats()["calls"] == 4
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()          # the single trial call
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_cancelled_trial_lets_the_next_call_probe():
+    primary = FakeModel(delay=lambda n: 10.0)
+    health = ProviderHealth(failure_threshold=1, reset_seconds=0.01)
+    health.breaker.record_failure()
+    time.sleep(0.02)
+    runnable = ResilientRunnable(primary, health, fallback=FakeModel(), fallback_health=ProviderHealth())
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(runnable.ainvoke("q"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(cancel_trial())
+    assert health.breaker.allow()
+
+# ────────────────────────────────────────────────────────────
+# FAILOVER AND HEDGING
+# ────────────────────────────────────────────────────────────
+def test_fails_over_when_primary_fails():
+    primary = FakeModel(fail=lambda n: True)
+    fallback = FakeModel()
+    health = ProviderHealth(failure_threshold=2, reset_seconds=60)
+    runnable = ResilientRunnable(primary, health, fallback=fallback, fallback_health=ProviderHealth())
+
+    assert run(runnable.ainvoke("q")) == "q:1"
+    assert run(runnable.ainvoke("q")) == "q:2"
+    # The circuit is open now, the primary is not called any more
+    assert run(runnable.ainvoke("q")) == "q:3"
+    assert primary.calls == 2
+    assert health.latency.stats()["failovers"] == 3
+
+def test_open_circuit_without_fallback_fails_fast():
+    health = ProviderHealth(failure_threshold=1, reset_seconds=60)
+    runnable = ResilientRunnable(FakeModel(fail=lambda n: True), health)
+    with pytest.raises(RuntimeError):
+        run(runnable.ainvoke("q"))
+    with pytest.raises(CircuitOpenError):
+        run(runnable.ainvoke("q"))
+
+def test_no_hedge_before_min_samples():
+    primary = FakeModel(delay=lambda n: 0.05)
+    runnable = ResilientRunnable(primary, ProviderHealth(), hedge_min_samples=5, hedge_floor=0.0)
+    run(runnable.ainvoke("q"))
+    assert primary.calls == 1
+
+def test_slow_call_is_hedged_and_the_duplicate_wins():
+    # 20 fast calls teach the p95, then call 21 stalls and its duplicate (call 22) is fast
+    primary = FakeModel(delay=lambda n: 1.0 if n == 21 else 0.001)
+    health = ProviderHealth()
+    runnable = ResilientRunnable(primary, health, hedge_min_samples=20, hedge_floor=0.01)
+
+    async def calls():
+        for _ in range(20):
+            await runnable.ainvoke("q")
+        start = time.perf_counter()
+        result = await runnable.ainvoke("q", config={"callbacks": ["ui"]})
+        return result, time.perf_counter() - start
+
+    result, seconds = run(calls())
+    assert result == "q:22"
+    assert seconds < 0.5
+    assert primary.configs[-1] == {"callbacks": []}
+    stats = health.latency.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+def test_no_hedge_while_the_gate_is_throttled():
+    class ThrottledModel(FakeModel):
+        def throttled(self):
+            return True
+
+    primary = ThrottledModel(delay=lambda n: 0.05 if n == 21 else 0.001)
+    health = ProviderHealth()
+    runnable = ResilientRunnable(primary, health, hedge_min_samples=20, hedge_floor=0.01)
+
+    async def calls():
+        for _ in range(21):
+            await runnable.ainvoke("q")
+
+    run(calls())
+    assert primary.calls == 21
+    assert health.latency.stats()["hedges"] == 0
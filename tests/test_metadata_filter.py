@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("pydantic")
+
+import metadata_filter
+from metadata_filter import MetadataIndex, add_to_metadata_index, id_bitmap
+from metadata_schema import MetadataFilter
+
+def make_index(tmp_path):
+    path = str(tmp_path / "metadata.sqlite")
+    add_to_metadata_index(path, [
+        (i, {"date_published": f"{2018 + i % 3}-05-01", "organisation": "Snopes", "rating": "false"})
+        for i in range(10)
+    ])
+    return MetadataIndex(path)
+
+def test_bitmap_is_built_once_per_cached_candidate_set(tmp_path):
+    index = make_index(tmp_path)
+    candidates = index.candidate_ids(MetadataFilter(years=[2019]))
+    assert candidates.tolist() == [1, 4, 7]
+
+    bitmap = index.bitmap(candidates, 10)
+    assert bitmap.tolist() == id_bitmap(candidates, 10).tolist()
+    assert index.bitmap(index.candidate_ids(MetadataFilter(years=[2019])), 10) is bitmap
+    # The index grew, the old bitmap is too short
+    assert index.bitmap(candidates, 20) is not bitmap
+
+def test_bitmap_is_evicted_with_its_candidate_set(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_filter, "CANDIDATE_CACHE_SIZE", 1)
+    index = make_index(tmp_path)
+    candidates = index.candidate_ids(MetadataFilter(years=[2019]))
+    index.bitmap(candidates, 10)
+
+    index.candidate_ids(MetadataFilter(years=[2020]))
+    assert id(candidates) not in index._bitmaps
+    # A set that is not cached gets a bitmap but does not keep one
+    index.bitmap(np.array([0, 1], dtype=np.int64), 10)
+    assert len(index._bitmaps) == 0
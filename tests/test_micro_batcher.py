@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+def test_concurrent_requests_share_one_batch():
+    batches = []
+
+    def process(requests):
+        batches.append(requests)
+        return [[q.upper() for q in queries] for queries, _ in requests]
+
+    batcher = MicroBatcher(process, max_wait_ms=50)
+    futures = [batcher.submit([f"q{i}", f"r{i}"], k=4) for i in range(3)]
+    assert [f.result(timeout=2) for f in futures] == [["Q0", "R0"], ["Q1", "R1"], ["Q2", "R2"]]
+    assert len(batches) == 1
+    assert batches[0][0] == (["q0", "r0"], {"k": 4})
+    assert batcher.stats()["batch_size"] == {6: 1}
+
+def test_batch_is_dispatched_at_max_batch_size():
+    batches = []
+
+    def process(requests):
+        batches.append(len(requests))
+        return [None] * len(requests)
+
+    batcher = MicroBatcher(process, max_wait_ms=10_000, max_batch_size=2)
+    start = time.monotonic()
+    futures = [batcher.submit(["q"]) for _ in range(2)]
+    for f in futures:
+        f.result(timeout=2)
+    assert time.monotonic() - start < 1
+    assert batches == [2]
+
+def test_exception_result_fails_only_its_request():
+    def process(requests):
+        return [ValueError("bad filter") if kwargs.get("bad") else queries for queries, kwargs in requests]
+
+    batcher = MicroBatcher(process, max_wait_ms=50)
+    good, bad = batcher.submit(["q"]), batcher.submit(["q"], bad=True)
+    assert good.result(timeout=2) == ["q"]
+    with pytest.raises(ValueError):
+        bad.result(timeout=2)
+
+def test_raising_batch_fails_every_request():
+    def process(requests):
+        raise RuntimeError("index unavailable")
+
+    batcher = MicroBatcher(process, max_wait_ms=50)
+    futures = [batcher.submit(["q"]) for _ in range(2)]
+    for f in futures:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=2)
+
+def test_full_queue_fails_fast_without_blocking():
+    started, release = threading.Event(), threading.Event()
+
+    def process(requests):
+        started.set()
+        release.wait(timeout=5)
+        return [None] * len(requests)
+
+    batcher = MicroBatcher(process, max_wait_ms=0, max_queue=1, submit_timeout=5)
+    first = batcher.submit(["q"])
+    assert started.wait(timeout=2)
+    second = batcher.submit(["q"])          # waits in the queue
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        batcher.submit(["q"], block=False)
+    assert time.monotonic() - start < 0.5
+
+    release.set()
+    first.result(timeout=2)
+    second.result(timeout=2)
+
+def test_cancelled_request_is_dropped_and_the_worker_keeps_running():
+    batches = []
+
+    def process(requests):
+        batches.append([queries for queries, _ in requests])
+        return [queries for queries, _ in requests]
+
+    batcher = MicroBatcher(process, max_wait_ms=100)
+    cancelled, kept = batcher.submit(["gone"]), batcher.submit(["kept"])
+    assert cancelled.cancel()
+    assert kept.result(timeout=2) == ["kept"]
+    assert batches == [[["kept"]]]
+
+    # The worker thread survived, a later request is still served
+    assert batcher.submit(["next"]).result(timeout=2) == ["next"]
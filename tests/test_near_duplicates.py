@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import zlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bm25 import tokenize
+from near_duplicates import (
+    NUM_PERM,
+    SHINGLE_SIZE,
+    _A,
+    _B,
+    _PRIME,
+    add_to_near_duplicates,
+    minhash_signature,
+    near_duplicate_doc_count,
+)
+
+def page(claim, organisation="Snopes", verdict="False"):
+    return (
+        "Title: A fact-check\n"
+        f"Claim: {claim}\n"
+        "Date published: 2024-01-01\n"
+        "Author: Jane Doe\n"
+        f"Organisation: {organisation}\n"
+        f"Original Verdict: {verdict}\n"
+        "Normalized Rating: False"
+    )
+
+def make_docstore(path, pages):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE docs (position INTEGER PRIMARY KEY, page_content TEXT, metadata TEXT)")
+    conn.executemany("INSERT INTO docs VALUES (?, ?, ?)", [(i, p, json.dumps({})) for i, p in enumerate(pages)])
+    conn.commit()
+    conn.close()
+
+def cluster_ids(docstore_path):
+    conn = sqlite3.connect(docstore_path)
+    rows = conn.execute("SELECT json_extract(metadata, '$.cluster_id') FROM docs ORDER BY position").fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+def test_signature_matches_exact_integer_hashing():
+    text = "the moon landing was filmed in a studio in nevada"
+    tokens = tokenize(text)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    p = int(_PRIME)
+    expected = [
+        min((int(a) * (zlib.crc32(s.encode("utf-8")) % p) + int(b)) % p for s in shingles)
+        for a, b in zip(_A, _B)
+    ]
+    signature = minhash_signature(text)
+    assert len(signature) == NUM_PERM
+    assert signature.tolist() == expected
+
+def test_copies_of_a_claim_cluster_across_organisations(tmp_path):
+    claim = "Drinking hot water every morning cures the common cold within three days"
+    pages = [page(claim), page(claim + ".", organisation="PolitiFact", verdict="Pants on Fire")]
+    docstore = str(tmp_path / "docstore.sqlite")
+    make_docstore(docstore, pages)
+
+    add_to_near_duplicates(str(tmp_path / "near.sqlite"), docstore, enumerate(pages))
+    assert cluster_ids(docstore) == [0, 0]
+
+def test_different_claims_with_the_same_header_stay_apart(tmp_path):
+    pages = [
+        page("Drinking hot water every morning cures the common cold within three days"),
+        page("The city council voted to ban bicycles from every bridge in the region"),
+    ]
+    docstore = str(tmp_path / "docstore.sqlite")
+    make_docstore(docstore, pages)
+
+    add_to_near_duplicates(str(tmp_path / "near.sqlite"), docstore, enumerate(pages))
+    assert cluster_ids(docstore) == [0, 1]
+
+def test_tables_from_another_signature_version_count_as_empty(tmp_path):
+    docstore = str(tmp_path / "docstore.sqlite")
+    make_docstore(docstore, [page("a claim about the weather tomorrow")])
+    path = str(tmp_path / "near.sqlite")
+    add_to_near_duplicates(path, docstore, [(0, page("a claim about the weather tomorrow"))])
+    assert near_duplicate_doc_count(path) == 1
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE meta SET value = value - 1 WHERE key = 'signature_version'")
+    conn.close()
+    assert near_duplicate_doc_count(path) == 0
+
+def test_empty_claims_with_the_same_date_stay_apart(tmp_path):
+    pages = [
+        "Title: First blog post\nClaim: \nDate published: 2019\nOrganisation: EUfactcheck",
+        "Title: Second blog post\nClaim: \nDate published: 2019\nOrganisation: EUfactcheck",
+    ]
+    docstore = str(tmp_path / "docstore.sqlite")
+    make_docstore(docstore, pages)
+
+    add_to_near_duplicates(str(tmp_path / "near.sqlite"), docstore, enumerate(pages))
+    assert cluster_ids(docstore) == [0, 1]
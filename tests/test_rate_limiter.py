@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("pydantic")  # rate_limiter reads prompts through llm_cache
+
+from llm_resilience import ProviderHealth, ResilientRunnable
+from rate_limiter import RateLimitScheduler, ScheduledRunnable, TokenBucket, estimate_tokens, rate_limit_retry_after
+
+class RateLimitError(Exception):
+    """ Shaped like the groq SDK's 429 error. """
+
+    def __init__(self, retry_after="0.05"):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after}})()
+
+class FakeModel:
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return prompt
+
+def run(coro):
+    return asyncio.run(coro)
+
+# ────────────────────────────────────────────────────────────
+# BUCKETS AND ESTIMATES
+# ────────────────────────────────────────────────────────────
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(per_minute=600)            # 10 per second
+    now = bucket.updated
+    assert bucket.wait_time(600, now) == 0
+    bucket.take(600)
+    assert bucket.wait_time(10, now) == pytest.approx(1.0)
+    assert bucket.wait_time(10, now + 1.0) == pytest.approx(0.0)
+    # Larger than the bucket: waits for a full bucket instead of forever
+    assert bucket.wait_time(10_000, now + 1.0) == pytest.approx(59.0)
+
+def test_token_bucket_adjust_refunds_and_goes_into_debt():
+    bucket = TokenBucket(per_minute=100)
+    bucket.take(50)
+    bucket.adjust(-80)
+    assert bucket.level == 100
+    bucket.adjust(150)
+    assert bucket.level == -50
+
+def test_estimate_tokens_from_prompt_length():
+    assert estimate_tokens("x" * 400) == 101
+
+def test_rate_limit_retry_after():
+    assert rate_limit_retry_after(RateLimitError("2.5")) == 2.5
+    assert rate_limit_retry_after(RuntimeError("boom")) is None
+
+# ────────────────────────────────────────────────────────────
+# SCHEDULER
+# ────────────────────────────────────────────────────────────
+def test_token_budget_paces_requests():
+    scheduler = RateLimitScheduler(rpm=1000, tpm=1000, max_concurrency=4)
+
+    async def two_requests():
+        start = time.monotonic()
+        for _ in range(2):
+            await scheduler.acquire(501, "session")
+            scheduler.release(501)
+        return time.monotonic() - start
+
+    # The second request waits for 2 tokens at 1000/60 per second
+    assert run(two_requests()) == pytest.approx(0.12, abs=0.08)
+
+def test_sessions_take_turns():
+    scheduler = RateLimitScheduler(rpm=1000, tpm=100_000, max_concurrency=1)
+    order = []
+
+    async def request(name):
+        await scheduler.acquire(1, name)
+        order.append(name)
+        await asyncio.sleep(0)
+        scheduler.release(1)
+
+    async def both():
+        # Hold the only slot while session a queues four requests and then b one
+        await scheduler.acquire(1, "a")
+        tasks = [asyncio.ensure_future(request("a")) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(request("b")))
+        await asyncio.sleep(0)
+        scheduler.release(1)
+        await asyncio.gather(*tasks)
+
+    run(both())
+    assert order == ["a", "b", "a", "a", "a"]
+
+def test_rate_limit_halves_concurrency_once_per_burst_and_pauses():
+    scheduler = RateLimitScheduler(rpm=1000, tpm=100_000, max_concurrency=8)
+
+    async def burst():
+        for _ in range(3):
+            await scheduler.acquire(1, "session")
+        for _ in range(3):
+            scheduler.release(1, retry_after=0.2)
+
+    run(burst())
+    assert scheduler.concurrency == 4
+    assert scheduler.throttled()
+    assert scheduler.stats()["rate_limited"] == 3
+
+def test_successes_grow_concurrency_additively():
+    scheduler = RateLimitScheduler(rpm=1000, tpm=100_000, max_concurrency=8)
+    scheduler.concurrency = 2.0
+
+    async def calls():
+        for _ in range(2):
+            await scheduler.acquire(1, "session")
+            scheduler.release(1)
+
+    run(calls())
+    assert 2.5 < scheduler.concurrency < 3.5
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = RateLimitScheduler(rpm=1000, tpm=1000, max_concurrency=4)
+
+    async def cancel_waiting():
+        await scheduler.acquire(1000, "a")
+        waiting = asyncio.ensure_future(scheduler.acquire(1000, "a"))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        scheduler.release(1000)
+
+    run(cancel_waiting())
+    stats = scheduler.stats()
+    assert stats["queued"] == 0 and stats["active"] == 0
+
+# ────────────────────────────────────────────────────────────
+# SCHEDULED RUNNABLE
+# ────────────────────────────────────────────────────────────
+def test_429_is_retried_through_the_scheduler():
+    model = FakeModel(errors=[RateLimitError()])
+    scheduler = RateLimitScheduler(rpm=1000, tpm=100_000, max_concurrency=4)
+    runnable = ScheduledRunnable(model, scheduler, expected_output_tokens=10)
+
+    assert run(runnable.ainvoke("hello")) == "hello"
+    assert model.calls == 2
+    assert scheduler.stats()["rate_limited"] == 1
+
+def test_429s_do_not_open_the_breaker():
+    model = FakeModel(errors=[RateLimitError("0.01") for _ in range(6)])
+    scheduler = RateLimitScheduler(rpm=1000, tpm=100_000, max_concurrency=4)
+    health = ProviderHealth(failure_threshold=1, reset_seconds=60)
+    runnable = ResilientRunnable(ScheduledRunnable(model, scheduler, max_retries=2), health)
+
+    for _ in range(2):
+        with pytest.raises(RateLimitError):
+            run(runnable.ainvoke("hello"))
+    assert health.breaker.state == "closed"
+    assert health.latency.stats()["errors"] == 0
+
+def test_latency_leaves_out_the_queue():
+    model = FakeModel(delay=0.01)
+    scheduler = RateLimitScheduler(rpm=1000, tpm=1000, max_concurrency=4)
+    health = ProviderHealth()
+    runnable = ResilientRunnable(ScheduledRunnable(model, scheduler, expected_output_tokens=500), health)
+
+    async def two_calls():
+        await runnable.ainvoke("x")
+        await runnable.ainvoke("x")         # queues about 0.1 s for tokens
+
+    run(two_calls())
+    assert health.latency.percentile(100) < 0.1
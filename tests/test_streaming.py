@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from streaming import stream_graph
+
+class FakeGraph:
+    def __init__(self, events):
+        self.events = events
+
+    async def astream(self, payload, config=None, stream_mode=None):
+        for event in self.events:
+            yield event
+
+def token(text, run, node="critical_question"):
+    return "messages", (AIMessageChunk(content=text, id=run), {"langgraph_node": node})
+
+def collect(events):
+    async def run():
+        return [e async for e in stream_graph(FakeGraph(events), {}, {})]
+    return asyncio.run(run())
+
+def test_a_second_llm_call_of_a_node_starts_a_new_preview():
+    events = collect([
+        token("Is the ", "run-1"),
+        token("source known?", "run-1"),
+        # The node retries, its first answer must not be prefixed to the second one
+        token("Who ", "run-2"),
+        token("said it?", "run-2"),
+        ("updates", {"critical_question": {"messages_critical": [AIMessage(content="Who said it?")]}}),
+    ])
+    assert events == [
+        ("partial", "critical_question", "Is the"),
+        ("partial", "critical_question", "Is the source known?"),
+        ("partial", "critical_question", ""),
+        ("partial", "critical_question", "Who"),
+        ("partial", "critical_question", "Who said it?"),
+        ("critical", "critical_question", "Who said it?"),
+        ("done", "critical_question", ""),
+    ]
+
+def test_a_finished_node_starts_its_next_preview_empty():
+    events = collect([
+        token("First", "run-1"),
+        ("updates", {"critical_question": None}),
+        token("Second", "run-2"),
+    ])
+    assert events == [
+        ("partial", "critical_question", "First"),
+        ("done", "critical_question", ""),
+        ("partial", "critical_question", "Second"),
+    ]